@@ -0,0 +1,200 @@
+import asyncio
+import gc
+import os
+import resource
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.stub_model import StubModel
+from galadriel import AgentInput
+from galadriel import AgentOutput
+from galadriel import AgentRuntime
+from galadriel import CodeAgent
+from galadriel.entities import Message
+from galadriel.entities import Proof
+from galadriel.entities import PushOnlyQueue
+from galadriel.memory.memory_store import MemoryStore
+from galadriel.state.agent_state_repository import InMemoryStateBackend
+from galadriel.telemetry.tracing import get_percentile
+
+EMBEDDING_SIZE = 64
+LOOP_LAG_SAMPLE_INTERVAL_SECONDS = 0.01
+# A request without a final response after this long counts as failed
+REQUEST_TIMEOUT_SECONDS = 120
+
+
+@dataclass
+class Scenario:
+    concurrency: int
+    requests: int
+    long_term_memories: int
+    stream: bool
+    model_latency_seconds: float
+    output_tokens: int
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    completed_requests: int
+    failed_requests: int
+    duration_seconds: float
+    throughput_rps: float
+    latency_ms: Dict[str, float]
+    loop_lag_ms: Dict[str, float]
+    memory_growth_bytes: int
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class LatencyRecorder(AgentOutput):
+    """Output recording when the final response of each request arrives."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self._started: Dict[str, float] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+
+    def expect(self, request: Message) -> asyncio.Event:
+        self._started[request.id] = time.perf_counter()
+        done = self._done[request.id] = asyncio.Event()
+        return done
+
+    async def send(self, request: Message, response: Message, proof: Optional[Proof] = None) -> None:
+        if not response.final or request.id not in self._started:
+            return
+        self.latencies.append(time.perf_counter() - self._started.pop(request.id))
+        self._done.pop(request.id).set()
+
+
+class SyntheticInput(AgentInput):
+    """Input simulating concurrent clients, each sending its next request once the previous one is answered."""
+
+    def __init__(self, recorder: LatencyRecorder, concurrency: int, requests: int):
+        self.recorder = recorder
+        self.concurrency = concurrency
+        self.requests = requests
+        self.failed_requests = 0
+        self._sent_requests = 0
+
+    async def start(self, queue: PushOnlyQueue) -> None:
+        await asyncio.gather(*(self._run_client(queue, i) for i in range(self.concurrency)))
+
+    async def _run_client(self, queue: PushOnlyQueue, client_index: int) -> None:
+        while self._sent_requests < self.requests:
+            self._sent_requests += 1
+            request = Message(
+                content=f"Benchmark question {self._sent_requests}",
+                conversation_id=f"client-{client_index}",
+            )
+            done = self.recorder.expect(request)
+            await queue.put(request)
+            try:
+                await asyncio.wait_for(done.wait(), REQUEST_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.failed_requests += 1
+
+
+async def run_scenario(scenario: Scenario) -> ScenarioResult:
+    """Drive a fresh AgentRuntime through one scenario and measure it."""
+    recorder = LatencyRecorder()
+    synthetic_input = SyntheticInput(recorder, scenario.concurrency, scenario.requests)
+    runtime = AgentRuntime(
+        inputs=[synthetic_input],
+        outputs=[recorder],
+        agent=CodeAgent(
+            model=StubModel(scenario.model_latency_seconds, scenario.output_tokens),
+            tools=[],
+            verbosity_level=0,
+        ),
+        memory_store=_make_memory_store(scenario.long_term_memories),
+        enable_logs=False,
+        state_backend=InMemoryStateBackend(),
+    )
+
+    gc.collect()
+    rss_before = _get_rss_bytes()
+    loop_lags: List[float] = []
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(_sample_loop_lag(loop_lags, stop_sampling))
+    started = time.perf_counter()
+    runtime_task = asyncio.create_task(runtime.run(stream=scenario.stream))
+    # The runtime polls its queue, so the time of the last response is the end of the run
+    while len(recorder.latencies) + synthetic_input.failed_requests < scenario.requests:
+        await asyncio.sleep(LOOP_LAG_SAMPLE_INTERVAL_SECONDS)
+    duration = time.perf_counter() - started
+    stop_sampling.set()
+    await sampler
+    await runtime_task
+    gc.collect()
+    memory_growth = _get_rss_bytes() - rss_before
+
+    return ScenarioResult(
+        scenario=scenario,
+        completed_requests=len(recorder.latencies),
+        failed_requests=synthetic_input.failed_requests,
+        duration_seconds=duration,
+        throughput_rps=len(recorder.latencies) / duration if duration else 0.0,
+        latency_ms=_summarize(recorder.latencies),
+        loop_lag_ms=_summarize(loop_lags),
+        memory_growth_bytes=memory_growth,
+    )
+
+
+def _make_memory_store(long_term_memories: int) -> MemoryStore:
+    """Memory store with a long-term memory of the given size, using fake embeddings instead of OpenAI."""
+    memory_store = MemoryStore()
+    if long_term_memories:
+        vector_store = FAISS(
+            embedding_function=DeterministicFakeEmbedding(size=EMBEDDING_SIZE),
+            index=faiss.IndexFlatL2(EMBEDDING_SIZE),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        vector_store.add_texts(
+            [f"User: question {i}\n Assistant: answer {i}" for i in range(long_term_memories)],
+            metadatas=[
+                {"conversation_id": f"client-{i % 16}", "date": "2025-01-01 00:00"} for i in range(long_term_memories)
+            ],
+        )
+        memory_store.vector_store = vector_store  # type: ignore
+    return memory_store
+
+
+async def _sample_loop_lag(lags: List[float], stop: asyncio.Event) -> None:
+    """Measure how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_SAMPLE_INTERVAL_SECONDS)
+        lags.append(max(0.0, loop.time() - started - LOOP_LAG_SAMPLE_INTERVAL_SECONDS))
+
+
+def _summarize(values_seconds: List[float]) -> Dict[str, float]:
+    if not values_seconds:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values_seconds)
+    return {
+        "p50": get_percentile(values, 50) * 1000,
+        "p99": get_percentile(values, 99) * 1000,
+        "max": values[-1] * 1000,
+    }
+
+
+def _get_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Not Linux, fall back to the peak resident set size (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
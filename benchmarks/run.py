@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+import json
+import platform
+import time
+from importlib import metadata
+from typing import List
+
+import click
+
+from benchmarks.harness import Scenario
+from benchmarks.harness import run_scenario
+
+
+def _parse_ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+@click.command()
+@click.option("--concurrency", default="1,4,16", show_default=True, help="Comma separated concurrent client counts")
+@click.option(
+    "--memory-sizes",
+    default="0,1000",
+    show_default=True,
+    help="Comma separated long-term memory sizes",
+)
+@click.option("--stream/--no-stream", "stream_only", default=None, help="Only run with streaming on or off")
+@click.option("--requests", default=50, show_default=True, help="Requests per scenario")
+@click.option("--model-latency", default=0.05, show_default=True, help="Stub LLM latency per call in seconds")
+@click.option("--output-tokens", default=100, show_default=True, help="Stub LLM tokens per answer")
+@click.option("--output", "output_path", default=None, help="Write the JSON report to this file instead of stdout")
+def main(
+    concurrency: str,
+    memory_sizes: str,
+    stream_only: bool,
+    requests: int,
+    model_latency: float,
+    output_tokens: int,
+    output_path: str,
+):
+    """Benchmark AgentRuntime with a stub LLM and report the results as JSON."""
+    streams = [False, True] if stream_only is None else [stream_only]
+    scenarios = [
+        Scenario(
+            concurrency=clients,
+            requests=requests,
+            long_term_memories=memories,
+            stream=stream,
+            model_latency_seconds=model_latency,
+            output_tokens=output_tokens,
+        )
+        for clients, memories, stream in itertools.product(_parse_ints(concurrency), _parse_ints(memory_sizes), streams)
+    ]
+    results = []
+    for scenario in scenarios:
+        result = asyncio.run(run_scenario(scenario))
+        click.echo(
+            f"concurrency={scenario.concurrency} memories={scenario.long_term_memories} stream={scenario.stream}: "
+            f"{result.throughput_rps:.1f} req/s, p50 {result.latency_ms['p50']:.1f} ms, "
+            f"p99 {result.latency_ms['p99']:.1f} ms, loop lag p99 {result.loop_lag_ms['p99']:.1f} ms",
+            err=True,
+        )
+        results.append(result.to_dict())
+
+    report = json.dumps(
+        {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "galadriel": metadata.version("galadriel"),
+            "results": results,
+        },
+        indent=2,
+    )
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+    else:
+        click.echo(report)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+import time
+from typing import List
+
+import click
+from smolagents import ActionStep
+from smolagents import ToolCall
+
+from galadriel.domain.extract_step_logs import pull_messages_from_step
+
+STEP_LOGS_PATH = os.path.join(os.path.dirname(__file__), "data", "step_logs.json")
+
+
+def load_steps(path: str, scale: int) -> List[ActionStep]:
+    """Load recorded CodeAgent steps, with the model output repeated scale times to mimic long outputs."""
+    with open(path, "r", encoding="utf-8") as file:
+        records = json.load(file)
+    return [
+        ActionStep(
+            step_number=record["step_number"],
+            model_output="\n".join([record["model_output"]] * scale),
+            tool_calls=[ToolCall(**tool_call) for tool_call in record["tool_calls"]],
+            observations=record["observations"],
+            start_time=0,
+            end_time=record["duration"],
+            duration=record["duration"],
+        )
+        for record in records
+    ]
+
+
+async def _pull_all(steps: List[ActionStep], iterations: int, **options) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for step in steps:
+            async for _message in pull_messages_from_step(
+                step, conversation_id="benchmark", additional_kwargs={"author": "benchmark"}, **options
+            ):
+                pass
+    return time.perf_counter() - started
+
+
+@click.command()
+@click.option("--iterations", default=2000, show_default=True, help="Passes over the recorded steps")
+@click.option("--repeat", default=5, show_default=True, help="Runs of the iterations, the fastest one is reported")
+@click.option("--scale", default=1, show_default=True, help="Repeat every model output this many times")
+@click.option("--step-logs", "step_logs_path", default=STEP_LOGS_PATH, help="Recorded step logs JSON file")
+def main(iterations: int, repeat: int, scale: int, step_logs_path: str):
+    """Micro-benchmark pull_messages_from_step over recorded step logs."""
+    steps = load_steps(step_logs_path, scale)
+    for name, options in [
+        ("default", {}),
+        ("show everything", {"show_tool_code": True, "show_execution_logs": True, "show_code_in_thinking": True}),
+    ]:
+        # The fastest run is the least disturbed by the rest of the machine, like timeit
+        elapsed = min(asyncio.run(_pull_all(steps, iterations, **options)) for _ in range(repeat))
+        click.echo(f"{name}: {elapsed / (iterations * len(steps)) * 1_000_000:.1f} µs per step")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,42 @@
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from smolagents import Model
+from smolagents import Tool
+from smolagents.models import ChatMessage
+
+
+class StubModel(Model):
+    """Deterministic stand-in for an LLM.
+
+    Every call takes latency_seconds and answers with output_tokens words, wrapped in the code a
+    CodeAgent runs to give its final answer, so each request completes in a single agent step.
+    The wait blocks the calling thread, like the synchronous LLM clients smolagents calls.
+    """
+
+    def __init__(self, latency_seconds: float = 0.05, output_tokens: int = 100, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_seconds = latency_seconds
+        self.output_tokens = output_tokens
+        self.call_count = 0
+
+    def __call__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        self.call_count += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        answer = " ".join(f"token{i}" for i in range(self.output_tokens))
+        self.last_input_token_count = sum(len(str(message.get("content", "")).split()) for message in messages)
+        self.last_output_token_count = self.output_tokens
+        return ChatMessage(
+            role="assistant",
+            content=f'Thought: I know the answer.\nCode:\n```py\nfinal_answer("{answer}")\n```<end_code>',
+        )
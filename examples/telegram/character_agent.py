@@ -4,7 +4,7 @@ from typing import AsyncGenerator, Optional
 from rich.text import Text
 
 from galadriel import ToolCallingAgent, LogLevel, stream_agent_response
-from galadriel.domain.prompts.format_prompt import load_agent_template
+from galadriel.domain.prompts.format_prompt import CharacterTemplate
 from galadriel.entities import Message
 
 TELEGRAM_SYSTEM_PROMPT = """
@@ -36,8 +36,10 @@ class CharacterAgent(ToolCallingAgent):
         super().__init__(**kwargs)
         try:
             self.character_json_path = character_json_path
-            # validate content of character_json_path
-            _ = load_agent_template(TELEGRAM_SYSTEM_PROMPT, Path(self.character_json_path))
+            # Parsed once, reloaded when the file changes
+            self.character_template = CharacterTemplate(
+                TELEGRAM_SYSTEM_PROMPT, Path(self.character_json_path), watch=True
+            )
         except Exception as e:
             self.logger.log(Text(f"Error validating character file: {e}"), level=LogLevel.ERROR)
             raise e
@@ -46,13 +48,11 @@ class CharacterAgent(ToolCallingAgent):
         self, message: Message, memory: Optional[str] = None, stream: bool = False
     ) -> AsyncGenerator[Message, None]:
         try:
-            # Load the agent template on every execution to ensure randomness
-            character_prompt = load_agent_template(TELEGRAM_SYSTEM_PROMPT, Path(self.character_json_path))
-            task_message = character_prompt.replace("{{message}}", message.content).replace(
-                "{{user_name}}", message.additional_kwargs["author"]
-            )
+            # Character values are sampled on every execution to ensure randomness
+            prompt_state = {"message": message.content, "user_name": message.additional_kwargs["author"]}
             if memory:
-                task_message = task_message.replace("{{chat_history}}", memory)
+                prompt_state["chat_history"] = memory
+            task_message = self.character_template.render(prompt_state)
             if not stream:
                 answer = ToolCallingAgent.run(self, task=task_message)
                 yield Message(
@@ -12,6 +12,10 @@ from smolagents import (
     LiteLLMModel,
 )
 
+from .connectors.streaming_llm import RoutedLiteLLMModel
+from .connectors.streaming_llm import StreamingLiteLLMModel
+from .domain.response_cache import ResponseCache
+
 from smolagents.agents import LogLevel
 
 __all__ = [
@@ -23,6 +27,9 @@ __all__ = [
     "CodeAgent",
     "ToolCallingAgent",
     "LiteLLMModel",
+    "RoutedLiteLLMModel",
+    "StreamingLiteLLMModel",
     "LogLevel",
+    "ResponseCache",
     "stream_agent_response",
 ]
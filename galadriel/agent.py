@@ -1,10 +1,16 @@
 import asyncio
+import contextlib
+import contextvars
 import signal
+import threading
+import time
 from abc import ABC
 from abc import abstractmethod
 from pathlib import Path
-from typing import AsyncGenerator, Dict, List
+from typing import Any, AsyncGenerator, Dict, Iterator, List
+from typing import Awaitable
 from typing import Optional
+from typing import Tuple
 
 from dotenv import load_dotenv as _load_dotenv
 
@@ -12,9 +18,17 @@ from smolagents import CodeAgent as InternalCodeAgent
 from smolagents import ToolCallingAgent as InternalToolCallingAgent
 from smolagents import ActionStep
 
+from galadriel.connectors.prompt_caching import get_cached_tokens
+from galadriel.connectors.streaming_llm import StreamingLiteLLMModel
+from galadriel.domain.extract_step_logs import CodeBlockFilter
 from galadriel.domain.extract_step_logs import pull_messages_from_step
 from galadriel.domain.validate_solana_payment import SolanaPaymentValidator
+from galadriel.domain.validate_solana_payment import TaskAndPaymentSignatureResponse
 from galadriel.domain.prompts import format_prompt
+from galadriel.domain.response_cache import CacheLookup
+from galadriel.domain.response_cache import ResponseCache
+from galadriel.domain.spent_signature_store import SpentSignatureStore
+from galadriel.domain.streamed_replies import DELTA_MESSAGE_TYPE
 from galadriel.entities import Message, Proof
 from galadriel.entities import Pricing
 from galadriel.entities import PushOnlyQueue
@@ -24,18 +38,39 @@ from galadriel.logging_utils import get_agent_logger
 from galadriel.memory.memory_store import MemoryStore
 from galadriel.proof.prover import Prover
 from galadriel.state.agent_state_repository import AgentStateRepository
+from galadriel.state.state_backend import StateBackend
+from galadriel.state.checkpoint_scheduler import CheckpointScheduler
+from galadriel.state.checkpoint_scheduler import DEFAULT_CHECKPOINT_INTERVAL_MINUTES
+from galadriel.state.checkpoint_scheduler import DEFAULT_CHECKPOINT_MEMORY_THRESHOLD
+from galadriel.telemetry import metrics
+from galadriel.telemetry.loop_monitor import DEFAULT_BLOCKING_THRESHOLD_SECONDS
+from galadriel.telemetry.loop_monitor import EventLoopMonitor
+from galadriel.telemetry.server import TelemetryServer
+from galadriel.telemetry.tracing import REQUEST_SPAN_NAME
+from galadriel.telemetry.tracing import get_tracer
+from galadriel.telemetry.tracing import record_tool_calls
+from galadriel.telemetry.tracing import trace_tools
+from galadriel.telemetry.usage import AgentUsage
 
 logger = get_agent_logger()
 
+# The instructions come before the chat history and the request, so the prompt prefix stays the same
+# across requests and is read from the provider prompt cache
 DEFAULT_PROMPT_TEMPLATE = """
 You are a helpful chatbot assistant.
-Here is the chat history: \n\n {{chat_history}} \n
-Answer the following question: \n\n {{request}} \n
 Please remember the chat history and use it to answer the question, if relevant to the question.
 Maintain a natural conversation, don't add signatures at the end of your messages.
 Call the final_answer tool if you have a final answer to the question.
+Here is the chat history: \n\n {{chat_history}} \n
+Answer the following question: \n\n {{request}} \n
 """
 
+# Number of payments validated concurrently, ahead of the agent executing the requests
+DEFAULT_PAYMENT_VALIDATION_CONCURRENCY = 8
+PAYMENT_VALIDATION_ERROR_MESSAGE = "Payment validation failed due to an internal error. Please try again later."
+# Minimum time between two streamed chunks of model output, the deltas generated meanwhile are sent together
+DEFAULT_STREAM_COALESCE_SECONDS = 0.05
+
 
 class Agent(ABC):
     """Abstract base class defining the interface for all agent implementations.
@@ -103,6 +138,7 @@ class CodeAgent(Agent, InternalCodeAgent):
     def __init__(
         self,
         prompt_template: Optional[str] = None,
+        stream_coalesce_seconds: float = DEFAULT_STREAM_COALESCE_SECONDS,
         **kwargs,
     ):
         """Initialize the CodeAgent.
@@ -112,6 +148,8 @@ class CodeAgent(Agent, InternalCodeAgent):
                 The template should contain {{request}} where the input message should be inserted.
                 Example: "Answer the following question: {{request}}"
                 If not provided, defaults to "{{request}}"
+            stream_coalesce_seconds (float): Minimum time between two chunks of streamed model output,
+                when streaming with a StreamingLiteLLMModel
             flush_memory (Optional[bool]): If True, clears memory between requests. Defaults to False.
             **kwargs: Additional arguments passed to InternalCodeAgent
 
@@ -123,8 +161,13 @@ class CodeAgent(Agent, InternalCodeAgent):
             response = await agent.execute(Message(content="What is Python?"))
         """
         InternalCodeAgent.__init__(self, **kwargs)
+        # smolagents lists the authorized imports in set order, which changes between processes,
+        # sorted the system prompt is the same everywhere and its prompt cache is shared
+        self.authorized_imports = sorted(self.authorized_imports)  # type: ignore
+        trace_tools(self.tools)
         self.prompt_template = prompt_template or DEFAULT_PROMPT_TEMPLATE
         format_prompt.validate_prompt_template(self.prompt_template)
+        self.stream_coalesce_seconds = stream_coalesce_seconds
 
     async def execute(  # type: ignore
         self, request: Message, memory: Optional[str] = None, stream: bool = False
@@ -133,7 +176,7 @@ class CodeAgent(Agent, InternalCodeAgent):
         formatted_task = format_prompt.execute(self.prompt_template, request_dict)
 
         if not stream:
-            answer = InternalCodeAgent.run(self, task=formatted_task)
+            answer, usage = run_agent(InternalCodeAgent.run(self, task=formatted_task, stream=True), self.model)
 
             yield Message(
                 content=str(answer),
@@ -142,18 +185,22 @@ class CodeAgent(Agent, InternalCodeAgent):
                     **(request.additional_kwargs or {}),
                     "role": "assistant",
                     "type": "completion_message",
+                    "usage": usage.to_dict(),
                 },
                 final=True,
             )
             return
         # Stream is enabled
-        async for message in stream_agent_response(
+        messages = stream_agent_response(
             agent_run=InternalCodeAgent.run(self, task=formatted_task, stream=True),
             conversation_id=request.conversation_id,  # type: ignore
             additional_kwargs=request.additional_kwargs,
             model=self.model,
-        ):
-            yield message
+            coalesce_seconds=self.stream_coalesce_seconds,
+        )
+        async with contextlib.aclosing(messages):
+            async for message in messages:
+                yield message
 
 
 # pylint:disable=E0102
@@ -167,6 +214,7 @@ class ToolCallingAgent(Agent, InternalToolCallingAgent):
     def __init__(
         self,
         prompt_template: Optional[str] = None,
+        stream_coalesce_seconds: float = DEFAULT_STREAM_COALESCE_SECONDS,
         **kwargs,
     ):
         """
@@ -177,6 +225,8 @@ class ToolCallingAgent(Agent, InternalToolCallingAgent):
                 The template should contain {{request}} where the input message should be inserted.
                 Example: "Use available tools to answer: {{request}}"
                 If not provided, defaults to "{{request}}"
+            stream_coalesce_seconds (float): Minimum time between two chunks of streamed model output,
+                when streaming with a StreamingLiteLLMModel
             flush_memory (Optional[bool]): If True, clears memory between requests. Defaults to False.
             **kwargs: Additional arguments passed to InternalToolCallingAgent including available tools
 
@@ -188,8 +238,10 @@ class ToolCallingAgent(Agent, InternalToolCallingAgent):
             response = await agent.execute(Message(content="What's the weather in Paris?"))
         """
         InternalToolCallingAgent.__init__(self, **kwargs)
+        trace_tools(self.tools)
         self.prompt_template = prompt_template or DEFAULT_PROMPT_TEMPLATE
         format_prompt.validate_prompt_template(self.prompt_template)
+        self.stream_coalesce_seconds = stream_coalesce_seconds
 
     async def execute(  # type: ignore
         self, request: Message, memory: Optional[str] = None, stream: bool = False
@@ -198,7 +250,7 @@ class ToolCallingAgent(Agent, InternalToolCallingAgent):
         formatted_task = format_prompt.execute(self.prompt_template, request_dict)
 
         if not stream:
-            answer = InternalToolCallingAgent.run(self, task=formatted_task)
+            answer, usage = run_agent(InternalToolCallingAgent.run(self, task=formatted_task, stream=True), self.model)
             yield Message(
                 content=str(answer),
                 conversation_id=request.conversation_id,
@@ -206,18 +258,22 @@ class ToolCallingAgent(Agent, InternalToolCallingAgent):
                     **(request.additional_kwargs or {}),
                     "role": "assistant",
                     "type": "completion_message",
+                    "usage": usage.to_dict(),
                 },
                 final=True,
             )
             return
         # Stream is enabled
-        async for message in stream_agent_response(
+        messages = stream_agent_response(
             agent_run=InternalToolCallingAgent.run(self, task=formatted_task, stream=True),
             conversation_id=request.conversation_id,  # type: ignore
             additional_kwargs=request.additional_kwargs,
             model=self.model,
-        ):
-            yield message
+            coalesce_seconds=self.stream_coalesce_seconds,
+        )
+        async with contextlib.aclosing(messages):
+            async for message in messages:
+                yield message
 
 
 class AgentRuntime:
@@ -237,6 +293,15 @@ class AgentRuntime:
         memory_store: Optional[MemoryStore] = MemoryStore(),
         debug: bool = False,
         enable_logs: bool = True,
+        checkpoint_interval_minutes: float = DEFAULT_CHECKPOINT_INTERVAL_MINUTES,
+        checkpoint_memory_threshold: int = DEFAULT_CHECKPOINT_MEMORY_THRESHOLD,
+        state_backend: Optional[StateBackend] = None,
+        telemetry_port: Optional[int] = None,
+        telemetry_host: Optional[str] = None,
+        monitor_event_loop: bool = False,
+        blocking_threshold_seconds: float = DEFAULT_BLOCKING_THRESHOLD_SECONDS,
+        payment_validation_concurrency: int = DEFAULT_PAYMENT_VALIDATION_CONCURRENCY,
+        response_cache: Optional[ResponseCache] = None,
     ):
         """Initialize the AgentRuntime.
 
@@ -247,16 +312,49 @@ class AgentRuntime:
             solana_payment_validator (SolanaPaymentValidator): Payment validator
             debug (bool): Enable debug mode
             enable_logs (bool): Enable logging
+            checkpoint_interval_minutes (float): Maximum time between two background checkpoints of the agent state
+            checkpoint_memory_threshold (int): Number of new long-term memories that triggers a checkpoint early
+            state_backend (Optional[StateBackend]): Where the agent state is persisted when long-term memory
+                is enabled. Defaults to the Galadriel S3 storage.
+            telemetry_port (Optional[int]): Serve Prometheus metrics, per-stage latency stats and request traces
+                on this local port. Disabled by default.
+            telemetry_host (Optional[str]): Host the telemetry server binds to, e.g. "0.0.0.0" to scrape the
+                metrics from other hosts. Defaults to the TELEMETRY_HOST environment variable, or loopback only.
+            monitor_event_loop (bool): Diagnostic mode sampling the event-loop lag and logging the stack of
+                every call blocking the event loop, e.g. for soak tests. Disabled by default.
+            blocking_threshold_seconds (float): Minimum time a call has to hold the event loop to be reported
+                as blocking when monitor_event_loop is enabled
+            payment_validation_concurrency (int): Maximum number of payments validated at the same time when
+                pricing is set. Payments are validated as soon as requests are queued, while the agent executes
+                the earlier requests. It also bounds the number of requests taken ahead of the agent, which are
+                still executed on shutdown since their payments are spent.
+            response_cache (Optional[ResponseCache]): Reuse the final responses of earlier requests with the
+                same or a similar content, without executing the agent. Proofs and memories are still created
+                for cached responses. Disabled by default.
         """
         self.inputs = inputs
         self.outputs = outputs
         self.agent = agent
         self.solana_payment_validator = SolanaPaymentValidator(pricing)  # type: ignore
+        self.payment_validation_concurrency = payment_validation_concurrency
+        self._payment_validation_semaphore = asyncio.Semaphore(payment_validation_concurrency)
         self.memory_store = memory_store
+        self.response_cache = response_cache
         self.debug = debug
         self.enable_logs = enable_logs
         self.shutdown_event = asyncio.Event()
-        self.agent_state_repository = AgentStateRepository()
+        self._state_backend = state_backend
+        self.checkpoint_interval_minutes = checkpoint_interval_minutes
+        self.checkpoint_memory_threshold = checkpoint_memory_threshold
+        self.checkpoint_scheduler: Optional[CheckpointScheduler] = None
+        self.event_loop_monitor: Optional[EventLoopMonitor] = (
+            EventLoopMonitor(threshold_seconds=blocking_threshold_seconds) if monitor_event_loop else None
+        )
+        self.telemetry_server: Optional[TelemetryServer] = (
+            TelemetryServer(host=telemetry_host, port=telemetry_port, event_loop_monitor=self.event_loop_monitor)
+            if telemetry_port is not None
+            else None
+        )
         try:
             self.prover: Optional[Prover] = Prover()
         except Exception as e:
@@ -267,28 +365,61 @@ class AgentRuntime:
         # AgentConfig should have some settings for debug?
         if self.enable_logs:
             init_logging(self.prover, self.debug)
+        self._register_memory_store_metrics()
+
+    @property
+    def agent_state_repository(self) -> StateBackend:
+        """Backend the agent state is persisted to.
+
+        The default backend is created on first use, so agents without long-term memory
+        don't pay for setting up the S3 client.
+        """
+        if self._state_backend is None:
+            self._state_backend = AgentStateRepository()
+        return self._state_backend
+
+    @agent_state_repository.setter
+    def agent_state_repository(self, state_backend: StateBackend) -> None:
+        self._state_backend = state_backend
 
     async def run(self, stream: bool = False):
         """Start the agent runtime loop.
 
         Creates an single queue and continuously processes incoming requests.
         Al agent inputs receive the same instance of the queue and append requests to it.
+        Payment validation of queued requests starts right away, the agent then executes them in order.
         """
         logger.info("Agent runtime started")
         input_queue = asyncio.Queue()  # type: ignore
         push_only_queue = PushOnlyQueue(input_queue)
+        # Requests in arrival order, with their payment validation running in the background. Bounded, so
+        # the validation stage only takes as many requests ahead as it validates at the same time
+        validated_queue: asyncio.Queue[Tuple[Message, Optional[asyncio.Task]]] = asyncio.Queue(
+            maxsize=self.payment_validation_concurrency
+        )
+        validation_slots = asyncio.Semaphore(self.payment_validation_concurrency)
+        metrics.QUEUE_DEPTH.set_function(lambda: input_queue.qsize() + validated_queue.qsize())
 
         # Listen for shutdown event
         await self._listen_for_stop()
 
-        # Download agent state from S3 if long term memory is enabled
-        await self._load_agent_state()
+        if self.event_loop_monitor:
+            self.event_loop_monitor.start()
+        if self.telemetry_server:
+            await self.telemetry_server.start()
+
+        # Download agent state from S3 in the background if long term memory is enabled,
+        # until it is restored requests are served with the most recent memories only
+        state_restore_task = asyncio.create_task(self._restore_agent_state())
 
         # Start agent inputs
         # Create tasks for all inputs and track them
         input_tasks = [
             asyncio.create_task(self._safe_client_start(agent_input, push_only_queue)) for agent_input in self.inputs
         ]
+        validation_stage_task = asyncio.create_task(
+            self._run_payment_validation_stage(input_queue, validated_queue, validation_slots)
+        )
 
         while not self.shutdown_event.is_set():
             active_tasks = [task for task in input_tasks if not task.done()]
@@ -298,13 +429,27 @@ class AgentRuntime:
                 break
             # Get the next request from the queue
             try:
-                request = await asyncio.wait_for(input_queue.get(), timeout=1.0)
+                request, payment_validation = await asyncio.wait_for(validated_queue.get(), timeout=1.0)
             except asyncio.TimeoutError:
                 continue
+            validation_slots.release()
             # Process the request
-            await self._run_request(request, stream)
-
+            await self._run_request(request, stream, payment_validation)
+
+        validation_stage_task.cancel()
+        await asyncio.wait([validation_stage_task])
+        # A valid payment is spent as soon as it is validated, so the requests taken ahead by the validation
+        # stage are still executed, the ones left in the input queue were not charged
+        while not validated_queue.empty():
+            request, payment_validation = validated_queue.get_nowait()
+            await self._run_request(request, stream, payment_validation)
+        # Saving before the restore has finished would overwrite the stored state with a partial one
+        await state_restore_task
         await self._save_agent_state()
+        if self.telemetry_server:
+            await self.telemetry_server.stop()
+        if self.event_loop_monitor:
+            await self.event_loop_monitor.stop()
         logger.info("Agent runtime Stopped.")
 
     def stop(self):
@@ -322,60 +467,190 @@ class AgentRuntime:
             # Signal handling may not be supported on some platforms (e.g., Windows)
             logger.warning("SIGTERM signal handling is not supported on this platform.")
 
-    async def _run_request(self, request: Message, stream: bool):
+    async def _run_payment_validation_stage(
+        self,
+        input_queue: asyncio.Queue,
+        validated_queue: asyncio.Queue,
+        validation_slots: asyncio.Semaphore,
+    ) -> None:
+        """Start validating the payment of every request as soon as it is queued.
+
+        Requests are handed to the agent in arrival order, each with the task validating its payment,
+        so validation of the later requests overlaps with the execution of the earlier ones.
+
+        A request is only taken once there is a slot for it in validated_queue, so when the stage is
+        cancelled every started validation is in the queue, none is lost in between.
+        """
+        while True:
+            await validation_slots.acquire()
+            try:
+                request = await input_queue.get()
+            except asyncio.CancelledError:
+                validation_slots.release()
+                raise
+            payment_validation = None
+            if self.solana_payment_validator.pricing:
+                payment_validation = asyncio.create_task(self._validate_payment(request))
+            validated_queue.put_nowait((request, payment_validation))
+
+    async def _validate_payment(self, request: Message) -> Optional[TaskAndPaymentSignatureResponse]:
+        """Validate the payment for the request, rejections are answered to the outputs right away.
+
+        Returns:
+            The task and payment, or None if the payment is not valid
+        """
+        try:
+            async with self._payment_validation_semaphore:
+                with get_tracer().start_span("payment.validate", trace_id=request.id):
+                    task_and_payment = await self.solana_payment_validator.execute(request)
+            metrics.PAYMENT_VALIDATIONS.inc(outcome="valid")
+            return task_and_payment
+        except PaymentValidationError as e:
+            metrics.PAYMENT_VALIDATIONS.inc(outcome="invalid")
+            logger.error("Payment validation error", exc_info=True)
+            await self._send_rejection(request, str(e))
+        except Exception:
+            metrics.PAYMENT_VALIDATIONS.inc(outcome="error")
+            logger.error("Unexpected error during payment validation", exc_info=True)
+            await self._send_rejection(request, PAYMENT_VALIDATION_ERROR_MESSAGE)
+        return None
+
+    async def _send_rejection(self, request: Message, reason: str) -> None:
+        response = Message(
+            content=reason,
+            conversation_id=request.conversation_id,
+            additional_kwargs={
+                **(request.additional_kwargs or {}),
+                "role": "assistant",
+                "type": "error_message",
+            },
+            final=True,
+        )
+        for output in self.outputs:
+            try:
+                await output.send(request, response)
+            except Exception:
+                logger.error("Failed to send payment rejection via output", exc_info=True)
+
+    async def _run_request(
+        self,
+        request: Message,
+        stream: bool,
+        payment_validation: Optional[Awaitable[Optional[TaskAndPaymentSignatureResponse]]] = None,
+    ):
         """Process a single request through the agent pipeline.
 
         Handles payment validation, agent execution, and response delivery.
 
         Args:
             request (Message): The request to process
+            payment_validation (Optional[Awaitable]): Validation of the payment started ahead by the
+                validation stage. The payment is validated here if pricing is set and it is not given.
         """
-        task_and_payment, response = None, None
-        # Handle payment validation
-        if self.solana_payment_validator.pricing:
-            try:
-                task_and_payment = await self.solana_payment_validator.execute(request)
-                request.content = task_and_payment.task
-            except PaymentValidationError:
-                logger.error("Payment validation error", exc_info=True)
-            except Exception:
-                logger.error("Unexpected error during payment validation", exc_info=True)
-        # Run the agent if payment validation passed or not required
-        if task_and_payment or not self.solana_payment_validator.pricing:
-            memories = None
-            proof: Optional[Proof] = None
-            if self.memory_store:
-                try:
-                    memories = await self.memory_store.get_memories(prompt=request.content)
-                except Exception as e:
-                    logger.error(f"Error getting memories: {e}")
-            try:
-                async for response in self.agent.execute(request, memories, stream=stream):  # type: ignore
-                    if response.final and self.prover:
-                        try:
-                            proof = await self.prover.generate_proof(request, response)
-                        except Exception as e:
-                            logger.error(f"Error generating proof: {e}")
-                            raise e
-                    for output in self.outputs:
-                        try:
-                            await output.send(request, response, proof)
-                        except Exception:
-                            logger.error(
-                                "Failed to send streaming response via output",
-                                exc_info=True,
-                            )
-            except Exception:
-                logger.error("Error during agent execution", exc_info=True)
-        # Send the response to the outputs
-        if response:
-            if proof and self.prover:
-                await self.prover.publish_proof(request, response, proof)
-            if self.memory_store:
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self._run_traced_request(request, stream, payment_validation)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+
+    async def _run_traced_request(
+        self,
+        request: Message,
+        stream: bool,
+        payment_validation: Optional[Awaitable[Optional[TaskAndPaymentSignatureResponse]]],
+    ):
+        tracer = get_tracer()
+        started = time.monotonic()
+        # Every stage of the request is a span in the trace identified by the request id
+        with tracer.start_span(
+            REQUEST_SPAN_NAME,
+            trace_id=request.id,
+            attributes={"conversation_id": request.conversation_id, "stream": stream},
+        ):
+            task_and_payment, response = None, None
+            # Handle payment validation
+            if self.solana_payment_validator.pricing:
+                if payment_validation is None:
+                    payment_validation = self._validate_payment(request)
+                task_and_payment = await payment_validation
+                if task_and_payment:
+                    request.content = task_and_payment.task
+            # Run the agent if payment validation passed or not required
+            if task_and_payment or not self.solana_payment_validator.pricing:
+                memories = None
+                proof: Optional[Proof] = None
+                cache_lookup: Optional[CacheLookup] = None
+                if self.response_cache is not None:
+                    with tracer.start_span("response_cache.lookup"):
+                        cache_lookup = await self.response_cache.lookup(request)
+                cached_response = cache_lookup.response if cache_lookup else None
+                if self.memory_store and cached_response is None:
+                    try:
+                        memories = await self.memory_store.get_memories(prompt=request.content)
+                    except Exception as e:
+                        logger.error(f"Error getting memories: {e}")
                 try:
-                    await self.memory_store.add_memory(request=request, response=response)
-                except Exception as e:
-                    logger.error(f"Error adding memory: {e}")
+                    # The tool calls of the agent tell how long its response can be cached
+                    with (
+                        tracer.start_span("agent.execute" if cached_response is None else "response_cache.hit"),
+                        record_tool_calls() as tool_calls,
+                    ):
+                        if cached_response is not None:
+                            responses = _yield_message(cached_response)
+                        else:
+                            responses = self.agent.execute(request, memories, stream=stream)  # type: ignore
+                        is_first_response = True
+                        # Closed right away when a response fails, so the agent stops before the next request
+                        async with contextlib.aclosing(responses):
+                            async for response in responses:
+                                if is_first_response:
+                                    metrics.FIRST_RESPONSE_LATENCY.observe(time.monotonic() - started)
+                                    is_first_response = False
+                                if response.final and self.prover:
+                                    try:
+                                        proof = await self.prover.generate_proof(request, response)
+                                    except Exception as e:
+                                        logger.error(f"Error generating proof: {e}")
+                                        raise e
+                                for output in self.outputs:
+                                    try:
+                                        with tracer.start_span(
+                                            "output.send", attributes={"output": output.__class__.__name__}
+                                        ):
+                                            await output.send(request, response, proof)
+                                    except Exception:
+                                        logger.error(
+                                            "Failed to send streaming response via output",
+                                            exc_info=True,
+                                        )
+                    if cache_lookup is not None and cached_response is None:
+                        self.response_cache.put(  # type: ignore
+                            cache_lookup, response, [tool_call.tool_name for tool_call in tool_calls]
+                        )
+                except Exception:
+                    logger.error("Error during agent execution", exc_info=True)
+            # Send the response to the outputs
+            if response:
+                if proof and self.prover:
+                    is_published = await self.prover.publish_proof(request, response, proof)
+                    if not is_published:
+                        metrics.PROOF_PUBLISH_FAILURES.inc()
+                if self.memory_store:
+                    try:
+                        await self.memory_store.add_memory(request=request, response=response)
+                    except Exception as e:
+                        logger.error(f"Error adding memory: {e}")
+                    if self.checkpoint_scheduler:
+                        self.checkpoint_scheduler.on_memory_added()
+
+    def _register_memory_store_metrics(self) -> None:
+        memory_store = self.memory_store
+        if not memory_store:
+            return
+        metrics.SHORT_TERM_MEMORIES.set_function(lambda: len(memory_store.short_term_memory))
+        metrics.LONG_TERM_MEMORIES.set_function(
+            lambda: memory_store.vector_store.index.ntotal if memory_store.vector_store else 0
+        )
 
     async def _get_agent_memory(self) -> List[Dict[str, str]]:
         """Retrieve the current state of the agent's inner memory. This is not the chat memories.
@@ -402,21 +677,33 @@ class AgentRuntime:
             return self.memory_store.save_data_locally(file_name)
         return None
 
+    async def _restore_agent_state(self):
+        """Load agent state and start periodic checkpoints once it is in place."""
+        await self._load_agent_state()
+        self._start_checkpoint_scheduler()
+
     async def _load_agent_state(self):
-        """Load agent state from persistent storage if available."""
+        """Load agent state from persistent storage if available.
+
+        Downloading and deserializing the state happen off the event loop, so the runtime can keep
+        serving requests meanwhile.
+        """
         if not (self.memory_store and self.memory_store.vector_store):
             logger.debug("Skipping memory loading: vector store not configured")
             return False
 
         try:
             logger.info("Attempting to load agent state from storage")
-            agent_state = self.agent_state_repository.download_agent_state()
+            agent_state = await self.agent_state_repository.download_agent_state()
 
             if not agent_state:
                 logger.info("No existing agent state found in storage")
                 return False
 
-            self.memory_store.load_memory_from_folder(agent_state.memory_folder_path)
+            await self.memory_store.aload_memory_from_folder(agent_state.memory_folder_path)
+            spent_signature_store = self._get_spent_signature_store()
+            if spent_signature_store:
+                await asyncio.to_thread(spent_signature_store.load_from_folder, agent_state.memory_folder_path)
             logger.info(f"Successfully loaded agent memory from {agent_state.memory_folder_path}")
             return True
 
@@ -424,18 +711,55 @@ class AgentRuntime:
             logger.error(f"Failed to load agent memory: {e}", exc_info=self.debug)
             return False
 
+    def _start_checkpoint_scheduler(self) -> None:
+        """Start periodic background checkpoints of the agent state if vector store is configured."""
+        if not (self.memory_store and self.memory_store.vector_store):
+            return
+        self.checkpoint_scheduler = CheckpointScheduler(
+            self.memory_store,
+            self.agent_state_repository,
+            interval_minutes=self.checkpoint_interval_minutes,
+            memory_threshold=self.checkpoint_memory_threshold,
+            spent_signature_store=self._get_spent_signature_store(),
+        )
+        self.checkpoint_scheduler.start()
+
+    def _get_spent_signature_store(self) -> Optional[SpentSignatureStore]:
+        """Spent payment signatures to persist with the agent state, if the agent takes payments."""
+        if not self.solana_payment_validator.pricing:
+            return None
+        return self.solana_payment_validator.spent_signatures
+
     async def _save_agent_state(self):
-        """Save agent state to persistent storage if vector store is configured."""
+        """Save agent state to persistent storage if vector store is configured.
+
+        Periodic checkpoints already persist most of the state while the runtime is running, so on
+        shutdown only the memories added since the last checkpoint remain to be saved.
+        """
         if not (self.memory_store and self.memory_store.vector_store):
             logger.debug("Skipping state saving: vector store not configured")
             return False
 
+        if self.checkpoint_scheduler:
+            await self.checkpoint_scheduler.stop()
+            if not self.checkpoint_scheduler.is_dirty():
+                logger.info("Skipping state saving: no new memories since the last checkpoint")
+                return True
+
         try:
             state_folder_path = "/tmp/agent_state"
             logger.info(f"Saving agent state to {state_folder_path}")
 
+            memory_count = self.memory_store.long_term_memory_count
             self.memory_store.save_data_locally(state_folder_path)
-            self.agent_state_repository.upload_agent_state(state_folder_path)
+            spent_signature_store = self._get_spent_signature_store()
+            signature_change_count = None
+            if spent_signature_store:
+                signature_change_count = spent_signature_store.change_count
+                spent_signature_store.save_to_folder(state_folder_path)
+            key = await self.agent_state_repository.upload_agent_state(state_folder_path)
+            if key and self.checkpoint_scheduler:
+                self.checkpoint_scheduler.mark_checkpointed(memory_count, signature_change_count)
 
             logger.info("Successfully saved and uploaded agent state")
             return True
@@ -450,31 +774,45 @@ async def stream_agent_response(
     conversation_id: str,
     additional_kwargs: Optional[Dict] = None,
     model=None,
+    coalesce_seconds: float = DEFAULT_STREAM_COALESCE_SECONDS,
 ) -> AsyncGenerator[Message, None]:
     """Stream responses from an agent run.
 
+    With a StreamingLiteLLMModel the model output is streamed as it is generated, in "delta" messages
+    without the code blocks. Otherwise the messages of each step are streamed once it has finished.
+    The final message carries the usage of the run, see AgentUsage.to_dict.
+
     Args:
         agent_run: Iterator from agent.run(task, stream=True)
         conversation_id: ID to maintain conversation context
         additional_kwargs: Additional message parameters
         model: Optional model instance for token tracking
+        coalesce_seconds: Minimum time between two delta messages
     """
-    total_input_tokens = 0
-    total_output_tokens = 0
-    for step_log in agent_run:
-        # Track tokens if model provides them
-        if model and getattr(model, "last_input_token_count", None) is not None:
-            total_input_tokens += model.last_input_token_count
-            total_output_tokens += model.last_output_token_count
-            if isinstance(step_log, ActionStep):
-                step_log.input_token_count = model.last_input_token_count
-                step_log.output_token_count = model.last_output_token_count
-        async for message in pull_messages_from_step(
-            step_log,
-            conversation_id=conversation_id,
-            additional_kwargs=additional_kwargs,
-        ):
-            yield message
+    usage = AgentUsage(model=get_model_id(model))
+    started = time.monotonic()
+    # Closed right away when the consumer stops early, so the agent run is waited for
+    async with contextlib.aclosing(_get_agent_events(agent_run, model, coalesce_seconds)) as events:
+        async for event, value in events:
+            if event == _DELTA_EVENT:
+                yield Message(
+                    content=value,
+                    conversation_id=conversation_id,
+                    additional_kwargs={**(additional_kwargs or {}), "role": "assistant", "type": DELTA_MESSAGE_TYPE},
+                )
+                continue
+            step_log, input_tokens, cached_input_tokens, output_tokens, tool_seconds, is_streamed = value
+            trace_agent_step(step_log)
+            usage.add_step(step_log, input_tokens, output_tokens, tool_seconds, cached_input_tokens)
+            async for message in pull_messages_from_step(
+                step_log,
+                conversation_id=conversation_id,
+                additional_kwargs=additional_kwargs,
+                show_thinking=not is_streamed,
+            ):
+                yield message
+    usage.duration_seconds = time.monotonic() - started
+    usage.record_metrics()
     # final message
     yield Message(
         content=f"\n**Final answer:**\n{step_log.to_string()}\n",
@@ -483,6 +821,173 @@ async def stream_agent_response(
             **(additional_kwargs or {}),
             "role": "assistant",
             "type": "completion_message",
+            "usage": usage.to_dict(),
         },
         final=True,
     )
+
+
+def run_agent(agent_run, model=None) -> Tuple[Any, AgentUsage]:
+    """Run an agent to completion, tracing its steps and accounting their usage in the metrics.
+
+    Args:
+        agent_run: Iterator from agent.run(task, stream=True)
+        model: Optional model instance for token tracking
+
+    Returns:
+        The final answer and the usage of the run
+    """
+    usage = AgentUsage(model=get_model_id(model))
+    started = time.monotonic()
+    answer = None
+    for step_log, input_tokens, cached_input_tokens, output_tokens, tool_seconds in _run_steps(agent_run, model):
+        trace_agent_step(step_log)
+        usage.add_step(step_log, input_tokens, output_tokens, tool_seconds, cached_input_tokens)
+        answer = step_log
+    usage.duration_seconds = time.monotonic() - started
+    usage.record_metrics()
+    return answer, usage
+
+
+async def _yield_message(message: Message) -> AsyncGenerator[Message, None]:
+    yield message
+
+
+def get_model_id(model) -> Optional[str]:
+    model_id = getattr(model, "model_id", None)
+    return model_id if isinstance(model_id, str) else None
+
+
+_DELTA_EVENT = "delta"
+_STEP_EVENT = "step"
+_ERROR_EVENT = "error"
+_DONE_EVENT = "done"
+_END_OF_RUN = object()
+
+
+def _run_steps(agent_run, model) -> Iterator[Tuple[Any, int, int, int, float]]:
+    """Run the agent, yielding every step with its input, cached input and output tokens, and the time
+    spent in its tool calls."""
+    steps = iter(agent_run)
+    while True:
+        # A step runs synchronously within next(), so only its own tool calls are recorded
+        with record_tool_calls() as tool_calls:
+            step_log = next(steps, _END_OF_RUN)
+        if step_log is _END_OF_RUN:
+            return
+        input_tokens, cached_input_tokens, output_tokens = 0, 0, 0
+        # Track tokens if model provides them, the final answer yielded after the steps used none of its own
+        if isinstance(step_log, ActionStep) and model and getattr(model, "last_input_token_count", None) is not None:
+            input_tokens, output_tokens = model.last_input_token_count, model.last_output_token_count
+            cached_input_tokens = _get_cached_input_tokens(step_log, model)
+            step_log.input_token_count = input_tokens
+            step_log.output_token_count = output_tokens
+        tool_seconds = sum(tool_call.duration_seconds for tool_call in tool_calls)
+        yield step_log, input_tokens, cached_input_tokens, output_tokens, tool_seconds
+
+
+def _get_cached_input_tokens(step_log: ActionStep, model) -> int:
+    cached_input_tokens = getattr(model, "last_cached_input_token_count", None)
+    if isinstance(cached_input_tokens, int):
+        return cached_input_tokens
+    # Other LiteLLM models keep the response with its usage on the step output message
+    raw = getattr(step_log.model_output_message, "raw", None)
+    return get_cached_tokens(getattr(raw, "usage", None))
+
+
+async def _get_agent_events(agent_run, model, coalesce_seconds: float) -> AsyncGenerator[Tuple[str, Any], None]:
+    """Run the agent, yielding its finished steps and, with a StreamingLiteLLMModel, its output deltas.
+
+    A streaming model runs the agent in a worker thread, so the event loop sends the deltas while the
+    model generates them. Deltas are coalesced: the first one is yielded right away, the following ones
+    at most every coalesce_seconds.
+    """
+    if not isinstance(model, StreamingLiteLLMModel):
+        for step in _run_steps(agent_run, model):
+            yield _STEP_EVENT, (*step, False)
+        return
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue[Tuple[str, Any]] = asyncio.Queue()
+    stopped = threading.Event()
+
+    def emit(event: str, value: Any = None) -> None:
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, (event, value))
+        except RuntimeError:
+            # The event loop is closed, nobody is listening anymore
+            pass
+
+    def delta_callback(delta: str) -> None:
+        emit(_DELTA_EVENT, delta)
+
+    def run() -> None:
+        model.delta_callback = delta_callback
+        try:
+            for step in _run_steps(agent_run, model):
+                emit(_STEP_EVENT, step)
+                if stopped.is_set():
+                    break
+        except BaseException as e:
+            emit(_ERROR_EVENT, e)
+        finally:
+            # A later run may have installed its own callback already
+            if model.delta_callback is delta_callback:
+                model.delta_callback = None
+            emit(_DONE_EVENT)
+
+    # The context is copied, so tool calls are traced in the trace of the request
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), name="agent-run", daemon=True)
+    thread.start()
+    code_block_filter = CodeBlockFilter()
+    chunks: List[str] = []
+    is_streamed = False
+    last_flushed = float("-inf")
+    try:
+        while True:
+            timeout = max(0.0, last_flushed + coalesce_seconds - time.monotonic()) if chunks else None
+            try:
+                event, value = await asyncio.wait_for(events.get(), timeout)
+            except asyncio.TimeoutError:
+                event, value = "", None
+            if event == _DELTA_EVENT:
+                is_streamed = True
+                chunks.append(code_block_filter.feed(value))
+                if time.monotonic() - last_flushed < coalesce_seconds:
+                    continue
+            elif event:
+                # The output of the step is complete
+                chunks.append(code_block_filter.flush())
+                code_block_filter = CodeBlockFilter()
+            chunk = "".join(chunks)
+            chunks = []
+            if chunk:
+                last_flushed = time.monotonic()
+                yield _DELTA_EVENT, chunk
+            if event == _STEP_EVENT:
+                yield _STEP_EVENT, (*value, is_streamed)
+                is_streamed = False
+            elif event == _ERROR_EVENT:
+                raise value
+            elif event == _DONE_EVENT:
+                return
+    finally:
+        stopped.set()
+        # When the consumer stopped early, the current step is still running: the next run of the agent
+        # must not start while this one still changes the agent memory and the model
+        await asyncio.to_thread(thread.join)
+
+
+def trace_agent_step(step_log) -> None:
+    """Record a finished agent step as an "agent.step" span of the current trace.
+
+    Steps are timed by smolagents, so the span is recorded after the fact from the step timestamps.
+    """
+    if not isinstance(step_log, ActionStep) or step_log.start_time is None or step_log.end_time is None:
+        return
+    get_tracer().record_span(
+        "agent.step",
+        step_log.start_time,
+        step_log.end_time,
+        attributes={"step_number": step_log.step_number, "error": step_log.error is not None},
+    )
@@ -450,10 +450,6 @@ build-backend = "poetry.core.masonry.api"
         os.path.join(docker_files_dir, ".dockerignore"),
         os.path.join(agent_name, ".dockerignore"),
     )
-    shutil.copy(
-        os.path.join(docker_files_dir, "logrotate_logs"),
-        os.path.join(docker_dir, "logrotate_logs"),
-    )
 
     # copy template files from galadriel/templates to user current directory
     shutil.copy(
@@ -5,13 +5,17 @@ import time
 from typing import Dict, Optional, AsyncGenerator
 
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
 from galadriel import AgentInput, AgentOutput
+from galadriel.domain.streamed_replies import is_delta_message
 from galadriel.entities import Message, PushOnlyQueue, Proof
+from galadriel.telemetry.metrics import PROMETHEUS_CONTENT_TYPE
+from galadriel.telemetry.metrics import get_registry
 
 
 class ChatMessage(BaseModel):
@@ -35,6 +39,7 @@ class ChatUIClient(AgentInput, AgentOutput):
         host: str = "0.0.0.0",
         port: int = 8000,
         logger: Optional[logging.Logger] = None,
+        expose_metrics: bool = False,
     ):
         """Initialize the ChatUI client.
 
@@ -42,6 +47,7 @@ class ChatUIClient(AgentInput, AgentOutput):
             host (str): Host to bind the server to
             port (int): Port to bind the server to
             logger (Optional[logging.Logger]): Logger instance for tracking activities
+            expose_metrics (bool): Serve the agent runtime metrics for Prometheus on GET /metrics
         """
         self.app = FastAPI()
         self.queue: Optional[PushOnlyQueue] = None
@@ -63,6 +69,8 @@ class ChatUIClient(AgentInput, AgentOutput):
 
         # Register the chat endpoint
         self.app.post("/chat/completions")(self.chat_endpoint)
+        if expose_metrics:
+            self.app.get("/metrics")(self.metrics_endpoint)
 
     async def start(self, queue: PushOnlyQueue) -> None:
         """Start the ChatUI client and begin processing messages.
@@ -85,6 +93,10 @@ class ChatUIClient(AgentInput, AgentOutput):
         # Start the server - this will run until the server is stopped
         await server.serve()
 
+    async def metrics_endpoint(self) -> Response:
+        """Render the agent runtime metrics in the Prometheus text exposition format."""
+        return Response(content=get_registry().render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
     async def chat_endpoint(self, chat_request: ChatRequest):
         """Handle incoming chat requests via SSE."""
         if not self.queue:
@@ -265,6 +277,9 @@ class ChatUIClient(AgentInput, AgentOutput):
             }
             await self.active_connections[connection_type].put(final_message)
 
+        if is_delta_message(response):
+            # Streamed model output goes out as fast as it is generated
+            return
         self.logger.info(f"Response sent to {connection_type} connection")
         # Yield a small delay to that the response is picked up and sent to the client
         await asyncio.sleep(0.1)
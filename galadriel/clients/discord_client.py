@@ -7,9 +7,12 @@ from discord.ext import commands
 
 from galadriel import AgentInput
 from galadriel import AgentOutput
+from galadriel.domain.streamed_replies import StreamedReplies
 from galadriel.entities import Message, Proof
 from galadriel.entities import PushOnlyQueue
 
+DISCORD_MAX_MESSAGE_LENGTH = 2000
+
 
 class DiscordClient(commands.Bot, AgentInput, AgentOutput):
     """A Discord bot client that can both receive and send messages.
@@ -22,6 +25,7 @@ class DiscordClient(commands.Bot, AgentInput, AgentOutput):
         message_queue: Queue for storing received messages
         guild_id: ID of the Discord server the bot is connected to
         logger: Logger instance for tracking bot activities
+        streamed_replies: Streamed model output, shown in a Discord message edited in place
     """
 
     def __init__(self, guild_id: str, logger: Optional[logging.Logger] = None):
@@ -41,6 +45,7 @@ class DiscordClient(commands.Bot, AgentInput, AgentOutput):
         self.message_queue: Optional[PushOnlyQueue] = None
         self.guild_id = guild_id
         self.logger = logger or logging.getLogger("discord_client")
+        self.streamed_replies = StreamedReplies(max_length=DISCORD_MAX_MESSAGE_LENGTH)
 
     async def on_ready(self):
         """Event handler called when the bot successfully connects to Discord.
@@ -128,6 +133,13 @@ class DiscordClient(commands.Bot, AgentInput, AgentOutput):
             if response.conversation_id is None:
                 raise ValueError("conversation_id cannot be None")
             channel = self.get_channel(int(response.conversation_id))
+            if await self.streamed_replies.send(
+                request,
+                response,
+                channel.send,  # type: ignore[union-attr]
+                lambda message, text: message.edit(content=text),
+            ):
+                return
             await channel.send(response.content)  # type: ignore[union-attr]
         except Exception as e:
             self.logger.error(f"Failed to post output: {e}")
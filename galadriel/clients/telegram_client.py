@@ -7,9 +7,12 @@ from telebot.async_telebot import AsyncTeleBot
 
 from galadriel import AgentInput
 from galadriel import AgentOutput
+from galadriel.domain.streamed_replies import StreamedReplies
 from galadriel.entities import Message, Proof
 from galadriel.entities import PushOnlyQueue
 
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
 
 class TelegramClient(AgentInput, AgentOutput):
     """A Telegram bot client that handles bidirectional message communication.
@@ -23,6 +26,7 @@ class TelegramClient(AgentInput, AgentOutput):
         bot (AsyncTeleBot): The async Telegram bot instance
         queue (Optional[PushOnlyQueue]): Queue for storing incoming messages
         logger (logging.Logger): Logger instance for tracking bot activities
+        streamed_replies (StreamedReplies): Streamed model output, shown in a Telegram message edited in place
     """
 
     def __init__(self, token: str, logger: logging.Logger):
@@ -36,6 +40,7 @@ class TelegramClient(AgentInput, AgentOutput):
         self.bot = AsyncTeleBot(token)
         self.queue: Optional[PushOnlyQueue] = None
         self.logger = logger
+        self.streamed_replies = StreamedReplies(max_length=TELEGRAM_MAX_MESSAGE_LENGTH)
 
     async def start(self, queue: PushOnlyQueue) -> None:
         """Start the Telegram bot and begin processing messages.
@@ -108,5 +113,12 @@ class TelegramClient(AgentInput, AgentOutput):
 
         chat_id = response.conversation_id
 
+        if await self.streamed_replies.send(
+            request,
+            response,
+            lambda text: self.bot.send_message(chat_id, text),
+            lambda message, text: self.bot.edit_message_text(text, chat_id=chat_id, message_id=message.message_id),
+        ):
+            return
         await self.bot.send_message(chat_id, response.content)
         self.logger.info(f"Posted output to chat {chat_id}: {response.content}")
@@ -1,17 +1,33 @@
 import asyncio
 import os
+import time
+from typing import Any
+from typing import Dict
 from typing import Iterable
+from typing import List
 from typing import Optional
 
 from openai import AsyncOpenAI
 from openai.types.chat.chat_completion import ChatCompletion
 from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 
+from galadriel.connectors.llm_cache import LlmCache
+from galadriel.connectors.llm_resilience import DEFAULT_CIRCUIT_BREAKER_RESET_SECONDS
+from galadriel.connectors.llm_resilience import DEFAULT_CIRCUIT_BREAKER_THRESHOLD
+from galadriel.connectors.llm_resilience import INITIAL_BACKOFF_SECONDS
+from galadriel.connectors.llm_resilience import CircuitBreaker
+from galadriel.connectors.llm_resilience import get_backoff_seconds
+from galadriel.connectors.llm_resilience import get_retry_after_seconds
+from galadriel.connectors.llm_resilience import is_retryable
+from galadriel.connectors.llm_router import LlmRouter
 from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry import metrics
 
 logger = get_agent_logger()
 
 RETRY_COUNT: int = 3
+DEFAULT_DEADLINE_SECONDS = 60.0
+DEFAULT_MAX_CONCURRENCY_PER_MODEL = 8
 
 
 class LlmException(Exception):
@@ -21,7 +37,47 @@ class LlmException(Exception):
 class LlmClient:
     api_key: str
 
-    def __init__(self, _base_url: Optional[str] = None, _api_key: Optional[str] = None):
+    def __init__(
+        self,
+        _base_url: Optional[str] = None,
+        _api_key: Optional[str] = None,
+        cache: Optional[LlmCache] = None,
+        max_attempts: int = RETRY_COUNT,
+        deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+        max_concurrency_per_model: int = DEFAULT_MAX_CONCURRENCY_PER_MODEL,
+        circuit_breaker_threshold: int = DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+        circuit_breaker_reset_seconds: float = DEFAULT_CIRCUIT_BREAKER_RESET_SECONDS,
+        router: Optional[LlmRouter] = None,
+    ):
+        """
+        Args:
+            _base_url: Base URL of the OpenAI compatible API, defaults to LLM_BASE_URL or OpenAI
+            _api_key: API key, defaults to LLM_API_KEY
+            cache: Reuse completions of identical calls, and share the ones in flight
+            max_attempts: Maximum number of attempts of a completion call, failures with a retryable status
+                are retried with backoff
+            deadline_seconds: Time a completion call may take, over all its attempts and backoffs
+            max_concurrency_per_model: Maximum number of calls in flight per model, share the client so
+                concurrent callers don't overrun the provider rate limits
+            circuit_breaker_threshold: Number of consecutive failures of a model after which its calls fail fast
+            circuit_breaker_reset_seconds: Time before a trial call is made to a model failing fast
+            router: Spread the calls over several endpoints and API keys instead, base URL and API key
+                are not used then
+        """
+        self.router = router
+        self.client: Optional[AsyncOpenAI] = None
+        if router is None:
+            self.client = self._create_client(_base_url, _api_key)
+        self.cache = cache
+        self.max_attempts = max_attempts
+        self.deadline_seconds = deadline_seconds
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.circuit_breaker_threshold = circuit_breaker_threshold
+        self.circuit_breaker_reset_seconds = circuit_breaker_reset_seconds
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+    def _create_client(self, _base_url: Optional[str], _api_key: Optional[str]) -> AsyncOpenAI:
         if _base_url:
             base_url = _base_url
         else:
@@ -39,18 +95,118 @@ class LlmClient:
                 raise LlmException("Missing LLM API key, in constructor and/or LLM_API_KEY environment variable")
         if not api_key:
             raise LlmException("Missing LLM base_url, in constructor and/or LLM_BASE_URL environment variable")
-        self.client = AsyncOpenAI(
+        return AsyncOpenAI(
             base_url=base_url,
             api_key=api_key,
+            # Retries are made by completion(), within the deadline of the call
+            max_retries=0,
+        )
+
+    async def completion(
+        self,
+        model: str,
+        messages: Iterable[ChatCompletionMessageParam],
+        deadline_seconds: Optional[float] = None,
+        hedge_after_seconds: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Optional[ChatCompletion]:
+        """Create a chat completion.
+
+        Args:
+            model: Model to use
+            messages: Messages of the conversation
+            deadline_seconds: Time the call may take over all its attempts, defaults to the one of the client
+            hedge_after_seconds: With a router, also call the next endpoint when the first one did not answer
+                in this time, defaults to the one of the router
+            **kwargs: Other parameters of the completion call, e.g. temperature
+
+        Returns:
+            The completion, None if the call failed, ran out of time or the model is failing fast
+        """
+        messages = list(messages)
+        deadline = time.monotonic() + (deadline_seconds if deadline_seconds is not None else self.deadline_seconds)
+        if self.cache is None:
+            return await self._create_completion(model, messages, kwargs, deadline, hedge_after_seconds)
+        return await self.cache.get_or_create(
+            model,
+            messages,
+            kwargs,
+            lambda: self._create_completion(model, messages, kwargs, deadline, hedge_after_seconds),
         )
-        # Configurations?
 
-    async def completion(self, model: str, messages: Iterable[ChatCompletionMessageParam]) -> Optional[ChatCompletion]:
-        for i in range(RETRY_COUNT):
+    async def _create_completion(
+        self,
+        model: str,
+        messages: List[ChatCompletionMessageParam],
+        params: Dict[str, Any],
+        deadline: float,
+        hedge_after_seconds: Optional[float],
+    ) -> Optional[ChatCompletion]:
+        circuit_breaker = self._get_circuit_breaker(model)
+        backoff_seconds = INITIAL_BACKOFF_SECONDS
+        for attempt in range(1, self.max_attempts + 1):
+            if not circuit_breaker.allow_request():
+                logger.error(f"LLM calls to {model} are failing, not calling it until the circuit breaker resets")
+                metrics.LLM_CALLS.inc(model=model, outcome="circuit_open")
+                return None
             try:
-                return await self.client.chat.completions.create(model=model, messages=messages)
+                # The wait for a free slot counts towards the deadline too
+                completion = await asyncio.wait_for(
+                    self._send(model, messages, params, hedge_after_seconds),
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+            except asyncio.TimeoutError:
+                circuit_breaker.record_failure()
+                metrics.LLM_CALLS.inc(model=model, outcome="timeout")
+                logger.error(f"LLM call to {model} ran out of time in attempt {attempt}")
+                return None
             except Exception as e:
-                logger.error("Error calling Galadriel completions API", e)
-            # Retry after 4 * i seconds
-            await asyncio.sleep(int(min(60, 4**i)))
+                if not is_retryable(e):
+                    # The provider answered, the request itself is wrong
+                    circuit_breaker.record_success()
+                    metrics.LLM_CALLS.inc(model=model, outcome="error")
+                    logger.error(f"LLM call to {model} failed: {e}")
+                    return None
+                circuit_breaker.record_failure()
+                metrics.LLM_CALLS.inc(model=model, outcome="retryable_error")
+                logger.error(f"LLM call to {model} failed in attempt {attempt}/{self.max_attempts}: {e}")
+                if attempt == self.max_attempts:
+                    break
+                backoff_seconds = get_backoff_seconds(backoff_seconds)
+                delay_seconds = max(backoff_seconds, get_retry_after_seconds(e) or 0.0)
+                if time.monotonic() + delay_seconds >= deadline:
+                    logger.error(f"LLM call to {model} has no time left to wait {delay_seconds:.1f}s for a retry")
+                    break
+                await asyncio.sleep(delay_seconds)
+            else:
+                circuit_breaker.record_success()
+                metrics.LLM_CALLS.inc(model=model, outcome="ok")
+                return completion
         return None
+
+    async def _send(
+        self,
+        model: str,
+        messages: List[ChatCompletionMessageParam],
+        params: Dict[str, Any],
+        hedge_after_seconds: Optional[float],
+    ) -> ChatCompletion:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._semaphores[model] = asyncio.Semaphore(self.max_concurrency_per_model)
+        async with semaphore:
+            if self.router is not None:
+                return await self.router.call(
+                    lambda endpoint: endpoint.create_completion(model, messages, **params), hedge_after_seconds
+                )
+            return await self.client.chat.completions.create(  # type: ignore
+                model=model, messages=messages, **params
+            )
+
+    def _get_circuit_breaker(self, model: str) -> CircuitBreaker:
+        circuit_breaker = self._circuit_breakers.get(model)
+        if circuit_breaker is None:
+            circuit_breaker = self._circuit_breakers[model] = CircuitBreaker(
+                self.circuit_breaker_threshold, self.circuit_breaker_reset_seconds
+            )
+        return circuit_breaker
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from openai.types.chat.chat_completion import ChatCompletion
+
+from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry import metrics
+
+logger = get_agent_logger()
+
+DEFAULT_LLM_CACHE_TTL_SECONDS = 60 * 60
+DEFAULT_MAX_CACHED_COMPLETIONS = 1024
+
+
+class _CreationCancelled(Exception):
+    """The call creating a completion was cancelled, its waiters create the completion themselves."""
+
+
+def get_cache_key(model: str, messages: Any, params: Dict[str, Any]) -> str:
+    """Canonical hash of a completion call, equal for calls with the same model, messages and parameters."""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(params: Dict[str, Any]) -> bool:
+    """Whether a completion call with these parameters is expected to always return the same completion."""
+    return params.get("temperature") == 0
+
+
+class LlmCache:
+    """Completions of earlier LLM calls, kept in memory and optionally on disk.
+
+    Concurrent identical calls are de-duplicated: the first one calls the LLM, the others wait for
+    its completion. If the first call is cancelled, one of the others calls the LLM instead.
+
+    Only completions of deterministic calls, with temperature 0, are stored unless
+    cache_non_deterministic is set.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_LLM_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_CACHED_COMPLETIONS,
+        directory: Optional[str] = None,
+        cache_non_deterministic: bool = False,
+    ):
+        """
+        Args:
+            ttl_seconds: Time a completion is reused for
+            max_entries: Maximum number of completions kept in memory, the least recently used are evicted
+            directory: Also store the completions in this directory, so they are reused after a restart
+            cache_non_deterministic: Store the completions of calls with a non-zero temperature too
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.directory = directory
+        self.cache_non_deterministic = cache_non_deterministic
+        # Completions with their expiry, as a wall clock time, so entries read from disk compare too
+        self._entries: OrderedDict[str, Tuple[ChatCompletion, float]] = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def get_or_create(
+        self,
+        model: str,
+        messages: Any,
+        params: Dict[str, Any],
+        create: Callable[[], Awaitable[Optional[ChatCompletion]]],
+    ) -> Optional[ChatCompletion]:
+        """Return the cached completion of a call, or create it, sharing the creation with concurrent identical calls.
+
+        Args:
+            model: Model of the call
+            messages: Messages of the call
+            params: Other parameters of the call
+            create: Calls the LLM, a None completion is not stored
+
+        Returns:
+            The completion
+        """
+        key = get_cache_key(model, messages, params)
+        is_stored = self.cache_non_deterministic or is_deterministic(params)
+        if is_stored:
+            completion = await self.get(key)
+            if completion is not None:
+                metrics.LLM_CACHE_LOOKUPS.inc(result="hit")
+                return completion
+        while (in_flight := self._in_flight.get(key)) is not None:
+            metrics.LLM_CACHE_LOOKUPS.inc(result="coalesced")
+            try:
+                # Shielded, so a cancelled waiter doesn't cancel the call for the others
+                return await asyncio.shield(in_flight)
+            except _CreationCancelled:
+                # Only the creating call was cancelled, the first waiter to get here creates the completion
+                continue
+        metrics.LLM_CACHE_LOOKUPS.inc(result="miss")
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception retrieved, the call may have no other waiters
+        future.add_done_callback(lambda f: f.exception())
+        self._in_flight[key] = future
+        try:
+            completion = await create()
+            if completion is not None and is_stored:
+                await self.put(key, completion)
+        except asyncio.CancelledError:
+            future.set_exception(_CreationCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(completion)
+        finally:
+            del self._in_flight[key]
+        return completion
+
+    async def get(self, key: str) -> Optional[ChatCompletion]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            completion, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return completion
+            del self._entries[key]
+        if not self.directory:
+            return None
+        entry = await asyncio.to_thread(self._read_file, key, now)
+        if entry is None:
+            return None
+        self._add_entry(key, *entry)
+        return entry[0]
+
+    async def put(self, key: str, completion: ChatCompletion) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._add_entry(key, completion, expires_at)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write_file, key, completion, expires_at)
+            except Exception as e:
+                logger.error(f"Error writing completion to the LLM cache directory: {e}")
+
+    def clear(self) -> None:
+        """Drop the completions kept in memory, the ones on disk are kept."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _add_entry(self, key: str, completion: ChatCompletion, expires_at: float) -> None:
+        self._entries[key] = (completion, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")  # type: ignore
+
+    def _read_file(self, key: str, now: float) -> Optional[Tuple[ChatCompletion, float]]:
+        path = self._get_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            completion, expires_at = ChatCompletion.model_validate(data["completion"]), data["expires_at"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading completion from the LLM cache directory: {e}")
+            return None
+        if expires_at <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return completion, expires_at
+
+    def _write_file(self, key: str, completion: ChatCompletion, expires_at: float) -> None:
+        path = self._get_path(key)
+        # Written to a temporary file first, so readers never see a partial file
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "completion": completion.model_dump(mode="json")}, f)
+        os.replace(temporary_path, path)
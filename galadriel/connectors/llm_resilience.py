@@ -0,0 +1,95 @@
+import asyncio
+import email.utils
+import random
+import time
+from typing import Optional
+
+import httpx
+import openai
+
+INITIAL_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 20.0
+# Request timeouts, conflicts, rate limits and server errors are worth another attempt
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+DEFAULT_CIRCUIT_BREAKER_RESET_SECONDS = 30.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed LLM call may succeed when made again, unlike e.g. an invalid request."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+
+def get_retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Time the provider asked to wait before the next call, from the Retry-After headers of the error response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def get_backoff_seconds(previous_backoff_seconds: float) -> float:
+    """Backoff with decorrelated jitter: random up to three times the previous backoff, so retries spread out."""
+    return min(MAX_BACKOFF_SECONDS, random.uniform(INITIAL_BACKOFF_SECONDS, previous_backoff_seconds * 3))
+
+
+class CircuitBreaker:
+    """Fails calls fast while a provider is down, instead of piling up retries on it.
+
+    Opens after failure_threshold consecutive failures. Once open, one trial call is let through every
+    reset_timeout_seconds: its success closes the breaker again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+        reset_timeout_seconds: float = DEFAULT_CIRCUIT_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_timeout_seconds:
+            return False
+        # Let a trial call through, the next one only after another timeout
+        self._opened_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,342 @@
+import asyncio
+import concurrent.futures
+import math
+import random
+import time
+from collections import deque
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import TypeVar
+
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat.chat_completion import ChatCompletion
+
+from galadriel.connectors.llm_resilience import get_retry_after_seconds
+from galadriel.connectors.llm_resilience import is_retryable
+from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry import metrics
+
+logger = get_agent_logger()
+
+# Weight of the latest call in the latency average, older calls fade out exponentially
+LATENCY_DECAY = 0.3
+# Weight of the latest call in the error rate, which also halves every ERROR_RATE_HALF_LIFE_SECONDS
+# so endpoints that failed get another chance
+ERROR_RATE_DECAY = 0.3
+ERROR_RATE_HALF_LIFE_SECONDS = 60.0
+# Provider rate limits are mostly per minute, older rate limit headers are not trusted
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+# Keeps the cost of fast, untried or nearly exhausted endpoints finite and comparable
+MIN_LATENCY_SECONDS = 0.01
+MIN_FACTOR = 0.05
+# Invalid or revoked API keys fail on one endpoint only, other endpoints may still succeed
+ENDPOINT_ERROR_STATUS_CODES = frozenset({401, 403})
+# Rate limit header pairs, as sent by OpenAI compatible APIs, and by LiteLLM with a prefix
+RATE_LIMIT_HEADERS = (
+    ("x-ratelimit-remaining-requests", "x-ratelimit-limit-requests"),
+    ("x-ratelimit-remaining-tokens", "x-ratelimit-limit-tokens"),
+)
+LITELLM_HEADER_PREFIX = "llm_provider-"
+
+T = TypeVar("T")
+
+
+class LlmRouterError(Exception):
+    pass
+
+
+def is_endpoint_error(error: BaseException) -> bool:
+    """Whether a failed call may succeed on another endpoint."""
+    if isinstance(error, openai.APIStatusError) and error.status_code in ENDPOINT_ERROR_STATUS_CODES:
+        return True
+    return is_retryable(error)
+
+
+class LlmEndpoint:
+    """An OpenAI compatible endpoint and API key, with the latency, error rate and rate limit headroom
+    of its recent calls."""
+
+    def __init__(self, base_url: str, api_key: str, name: Optional[str] = None):
+        """
+        Args:
+            base_url: Base URL of the OpenAI compatible API
+            api_key: API key, several endpoints may share a base URL with different keys
+            name: Name in logs and metrics, defaults to the base URL
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.name = name or base_url
+        self.latency_seconds = 0.0
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.rate_limited_until = 0.0
+        self._rate_limit_headroom = 1.0
+        self._rate_limit_updated_at = -math.inf
+        self._error_rate_updated_at = 0.0
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            # Retries are made by the caller, failing over to other endpoints first
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def create_completion(self, model: str, messages: Any, **params: Any) -> ChatCompletion:
+        """Create a chat completion on this endpoint, reading its rate limit headroom from the response."""
+        response = await self.client.chat.completions.with_raw_response.create(model=model, messages=messages, **params)
+        self.update_rate_limits(response.headers)
+        return response.parse()
+
+    def get_error_rate(self, now: float) -> float:
+        return self.error_rate * 0.5 ** ((now - self._error_rate_updated_at) / ERROR_RATE_HALF_LIFE_SECONDS)
+
+    def get_rate_limit_headroom(self, now: float) -> float:
+        """Share of the rate limit left, 1.0 when unknown."""
+        if now - self._rate_limit_updated_at > RATE_LIMIT_WINDOW_SECONDS:
+            return 1.0
+        return self._rate_limit_headroom
+
+    def get_cost(self, now: float) -> float:
+        """Expected cost of a call, lower is better: the average latency, grown by the calls in flight,
+        the error rate and a low rate limit headroom. Untried endpoints are the cheapest."""
+        if now < self.rate_limited_until:
+            return math.inf
+        cost = (self.latency_seconds + MIN_LATENCY_SECONDS) * (1 + self.in_flight)
+        cost /= max(MIN_FACTOR, 1.0 - self.get_error_rate(now))
+        return cost / max(MIN_FACTOR, self.get_rate_limit_headroom(now))
+
+    def update_rate_limits(self, headers: Optional[Mapping[str, Any]]) -> None:
+        if not headers:
+            return
+        headrooms = []
+        for remaining_header, limit_header in RATE_LIMIT_HEADERS:
+            remaining = _get_header(headers, remaining_header)
+            limit = _get_header(headers, limit_header)
+            try:
+                if remaining is not None and limit is not None and float(limit) > 0:
+                    headrooms.append(max(0.0, float(remaining) / float(limit)))
+            except (TypeError, ValueError):
+                continue
+        if headrooms:
+            self._rate_limit_headroom = min(1.0, *headrooms)
+            self._rate_limit_updated_at = time.monotonic()
+
+    def record_success(self, latency_seconds: float) -> None:
+        if self.latency_seconds:
+            self.latency_seconds += LATENCY_DECAY * (latency_seconds - self.latency_seconds)
+        else:
+            self.latency_seconds = latency_seconds
+        self._update_error_rate(0.0)
+
+    def record_failure(self, error: BaseException) -> None:
+        self._update_error_rate(1.0)
+        if isinstance(error, openai.APIStatusError) and error.status_code == 429:
+            self._rate_limit_headroom = 0.0
+            self._rate_limit_updated_at = time.monotonic()
+        retry_after_seconds = get_retry_after_seconds(error)
+        if retry_after_seconds:
+            self.rate_limited_until = time.monotonic() + retry_after_seconds
+
+    def _update_error_rate(self, value: float) -> None:
+        now = time.monotonic()
+        error_rate = self.get_error_rate(now)
+        self.error_rate = error_rate + ERROR_RATE_DECAY * (value - error_rate)
+        self._error_rate_updated_at = now
+
+
+class LlmRouter:
+    """Spreads LLM calls over several OpenAI compatible endpoints and API keys.
+
+    Each call goes to the endpoint with the lowest expected cost, see LlmEndpoint.get_cost, and fails
+    over to the next one when the endpoint fails with a retryable error or rejects its API key. Calls
+    that failed on every endpoint raise the last error, other errors are raised as is.
+
+    Hedged calls, for tail latency sensitive callers, are also started on the next endpoint once the
+    first has not answered within hedge_after_seconds. The first answer wins, the other call is cancelled.
+    """
+
+    def __init__(self, endpoints: Sequence[LlmEndpoint], hedge_after_seconds: Optional[float] = None):
+        """
+        Args:
+            endpoints: The endpoints to route calls to
+            hedge_after_seconds: Default hedging delay of the calls, None to not hedge calls by default
+        """
+        if not endpoints:
+            raise LlmRouterError("LlmRouter needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.hedge_after_seconds = hedge_after_seconds
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def get_endpoints(self) -> List[LlmEndpoint]:
+        """The endpoints in order of preference, equally good ones in random order to spread the calls."""
+        now = time.monotonic()
+        return sorted(self.endpoints, key=lambda endpoint: (endpoint.get_cost(now), random.random()))
+
+    async def call(
+        self, operation: Callable[[LlmEndpoint], Awaitable[T]], hedge_after_seconds: Optional[float] = None
+    ) -> T:
+        """Run a call on the best endpoint, failing over and hedging it on the next ones.
+
+        Args:
+            operation: Makes the call on the given endpoint, e.g. lambda endpoint: endpoint.create_completion(...)
+            hedge_after_seconds: Hedging delay of this call, defaults to the one of the router
+
+        Returns:
+            The result of the first successful call
+        """
+        if hedge_after_seconds is None:
+            hedge_after_seconds = self.hedge_after_seconds
+        remaining = deque(self.get_endpoints())
+        pending: Dict[asyncio.Task, LlmEndpoint] = {}
+        last_error: Optional[BaseException] = None
+        try:
+            while remaining or pending:
+                if not pending:
+                    endpoint = remaining.popleft()
+                    pending[asyncio.create_task(self._call_endpoint(endpoint, operation))] = endpoint
+                timeout = _get_hedge_timeout(hedge_after_seconds, pending, remaining)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    endpoint = remaining.popleft()
+                    logger.debug(f"Hedging slow LLM call on {endpoint.name}")
+                    metrics.LLM_HEDGED_CALLS.inc()
+                    pending[asyncio.create_task(self._call_endpoint(endpoint, operation))] = endpoint
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not is_endpoint_error(error):
+                        raise error
+                    logger.debug(f"LLM call to {endpoint.name} failed, failing over: {error}")
+                    last_error = error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        raise last_error  # type: ignore
+
+    def call_sync(
+        self,
+        operation: Callable[[LlmEndpoint], T],
+        hedge_after_seconds: Optional[float] = None,
+        hedged: bool = True,
+    ) -> T:
+        """Blocking version of call(), for synchronous callers like smolagents models.
+
+        Hedged calls run in worker threads. A losing call can not be cancelled there, it runs to its end.
+
+        Args:
+            operation: Makes the call on the given endpoint
+            hedge_after_seconds: Hedging delay of this call, defaults to the one of the router
+            hedged: Whether the call may be hedged, calls with side effects like streamed output may not
+        """
+        if hedge_after_seconds is None:
+            hedge_after_seconds = self.hedge_after_seconds
+        remaining = deque(self.get_endpoints())
+        if not hedged or hedge_after_seconds is None or len(remaining) == 1:
+            return self._call_sync_without_hedging(operation, remaining)
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="llm_router")
+        pending: Dict[concurrent.futures.Future, LlmEndpoint] = {}
+        last_error: Optional[BaseException] = None
+        while remaining or pending:
+            if not pending:
+                endpoint = remaining.popleft()
+                pending[self._executor.submit(self._call_endpoint_sync, endpoint, operation)] = endpoint
+            timeout = _get_hedge_timeout(hedge_after_seconds, pending, remaining)
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                endpoint = remaining.popleft()
+                logger.debug(f"Hedging slow LLM call on {endpoint.name}")
+                metrics.LLM_HEDGED_CALLS.inc()
+                pending[self._executor.submit(self._call_endpoint_sync, endpoint, operation)] = endpoint
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if not is_endpoint_error(error):
+                    raise error
+                logger.debug(f"LLM call to {endpoint.name} failed, failing over: {error}")
+                last_error = error
+        raise last_error  # type: ignore
+
+    def _call_sync_without_hedging(self, operation: Callable[[LlmEndpoint], T], endpoints: Deque[LlmEndpoint]) -> T:
+        last_error: Optional[BaseException] = None
+        for endpoint in endpoints:
+            try:
+                return self._call_endpoint_sync(endpoint, operation)
+            except Exception as e:
+                if not is_endpoint_error(e):
+                    raise
+                logger.debug(f"LLM call to {endpoint.name} failed, failing over: {e}")
+                last_error = e
+        raise last_error  # type: ignore
+
+    async def _call_endpoint(self, endpoint: LlmEndpoint, operation: Callable[[LlmEndpoint], Awaitable[T]]) -> T:
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await operation(endpoint)
+        except asyncio.CancelledError:
+            # Lost to a hedged call, says nothing about the endpoint
+            metrics.LLM_ENDPOINT_CALLS.inc(endpoint=endpoint.name, outcome="cancelled")
+            raise
+        except Exception as e:
+            _record_failure(endpoint, e)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        endpoint.record_success(time.monotonic() - started)
+        metrics.LLM_ENDPOINT_CALLS.inc(endpoint=endpoint.name, outcome="ok")
+        return result
+
+    def _call_endpoint_sync(self, endpoint: LlmEndpoint, operation: Callable[[LlmEndpoint], T]) -> T:
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = operation(endpoint)
+        except Exception as e:
+            _record_failure(endpoint, e)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        endpoint.record_success(time.monotonic() - started)
+        metrics.LLM_ENDPOINT_CALLS.inc(endpoint=endpoint.name, outcome="ok")
+        return result
+
+
+def _record_failure(endpoint: LlmEndpoint, error: BaseException) -> None:
+    # Invalid requests fail on every endpoint, they are not held against this one
+    if is_endpoint_error(error):
+        endpoint.record_failure(error)
+        metrics.LLM_ENDPOINT_CALLS.inc(endpoint=endpoint.name, outcome="error")
+    else:
+        metrics.LLM_ENDPOINT_CALLS.inc(endpoint=endpoint.name, outcome="invalid_request")
+
+
+def _get_hedge_timeout(hedge_after_seconds: Optional[float], pending: Dict, remaining: Deque) -> Optional[float]:
+    # At most two calls are in flight, the hedged one and its hedge
+    if hedge_after_seconds is not None and len(pending) == 1 and remaining:
+        return hedge_after_seconds
+    return None
+
+
+def _get_header(headers: Mapping[str, Any], name: str) -> Optional[Any]:
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(LITELLM_HEADER_PREFIX + name)
+    return value
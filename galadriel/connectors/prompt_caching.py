@@ -0,0 +1,64 @@
+import copy
+from typing import Any
+from typing import Dict
+from typing import List
+
+from galadriel.logging_utils import get_agent_logger
+
+logger = get_agent_logger()
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Whether LiteLLM knows the model to support prompt caching, False for unknown models."""
+    try:
+        import litellm
+
+        return bool(litellm.utils.supports_prompt_caching(model_id))
+    except Exception as e:
+        logger.debug(f"Unknown prompt caching support of {model_id}: {e}")
+        return False
+
+
+def add_prompt_cache_hints(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mark the messages providers like Anthropic cache the prompt up to, see
+    https://docs.litellm.ai/docs/completion/prompt_caching. Providers caching prompts implicitly, like
+    OpenAI, get the hints removed by LiteLLM.
+
+    The system prompt, with the tool descriptions, is the same for every step, and the last message
+    closes the prefix the next step of the agent starts with.
+
+    Returns:
+        Copies of the messages with the hints, the given messages are not changed
+    """
+    indexes = {len(messages) - 1}
+    if messages and messages[0].get("role") == "system":
+        indexes.add(0)
+    hinted = list(messages)
+    for index in indexes:
+        if index < 0:
+            continue
+        message = copy.copy(messages[index])
+        content = message.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content or not isinstance(content, list):
+            continue
+        content = list(content)
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+        message["content"] = content
+        hinted[index] = message
+    return hinted
+
+
+def get_cached_tokens(usage: Any) -> int:
+    """Number of prompt tokens read from the provider prompt cache, from the usage of a completion."""
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+    if not isinstance(cached_tokens, int):
+        # Anthropic reports the tokens read from its cache separately
+        cached_tokens = getattr(usage, "cache_read_input_tokens", None)
+    return cached_tokens if isinstance(cached_tokens, int) else 0
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import TypeVar
+
+import httpx
+from solana.rpc.async_api import AsyncClient
+
+from galadriel.logging_utils import get_agent_logger
+
+logger = get_agent_logger()
+
+DEFAULT_SOLANA_RPC_URL = "https://api.mainnet-beta.solana.com"
+# Comma separated RPC URLs, in order of preference
+SOLANA_RPC_URLS_ENV = "SOLANA_RPC_URLS"
+
+RPC_TIMEOUT_SECONDS = 10
+MAX_KEEPALIVE_CONNECTIONS = 10
+# Number of passes over all endpoints before giving up
+MAX_ATTEMPTS = 3
+INITIAL_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 4.0
+# Weight of the latest call in the health score, older calls fade out exponentially
+HEALTH_SCORE_DECAY = 0.3
+
+T = TypeVar("T")
+
+
+class SolanaRpcError(Exception):
+    pass
+
+
+class RpcEndpoint:
+    """A Solana RPC endpoint and the health score of its recent calls."""
+
+    def __init__(self, url: str, client: AsyncClient):
+        self.url = url
+        self.client = client
+        # 1.0 when every recent call succeeded, towards 0.0 when they failed
+        self.health_score = 1.0
+        self.latency_seconds = 0.0
+
+    def record_success(self, latency_seconds: float) -> None:
+        self.health_score += HEALTH_SCORE_DECAY * (1.0 - self.health_score)
+        if self.latency_seconds:
+            self.latency_seconds += HEALTH_SCORE_DECAY * (latency_seconds - self.latency_seconds)
+        else:
+            self.latency_seconds = latency_seconds
+
+    def record_failure(self) -> None:
+        self.health_score -= HEALTH_SCORE_DECAY * self.health_score
+
+
+class SolanaRpcPool:
+    """Solana RPC client failing over between several endpoints.
+
+    Calls go to the healthiest endpoint first and move on to the next one when it fails. When all
+    endpoints failed, the pool waits with exponential backoff and jitter before the next pass, without
+    blocking the event loop. All endpoints share a single keep-alive HTTP connection pool.
+    """
+
+    def __init__(self, rpc_urls: Optional[List[str]] = None, timeout: float = RPC_TIMEOUT_SECONDS):
+        """
+        Args:
+            rpc_urls: RPC endpoint URLs in order of preference. Defaults to the SOLANA_RPC_URLS environment
+                variable, or the public mainnet endpoint if it is not set.
+            timeout: Timeout of a single RPC call in seconds
+        """
+        if not rpc_urls:
+            rpc_urls = [url.strip() for url in os.getenv(SOLANA_RPC_URLS_ENV, "").split(",") if url.strip()]
+        if not rpc_urls:
+            rpc_urls = [DEFAULT_SOLANA_RPC_URL]
+        self.session = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+        )
+        self.endpoints = [RpcEndpoint(url, self._create_client(url, timeout)) for url in rpc_urls]
+
+    def _create_client(self, url: str, timeout: float) -> AsyncClient:
+        client = AsyncClient(url, timeout=timeout)
+        # solana-py opens a separate HTTP session per client, share ours instead
+        client._provider.session = self.session  # pylint: disable=protected-access
+        return client
+
+    async def call(self, operation: Callable[[AsyncClient], Awaitable[T]]) -> T:
+        """Run an RPC call, failing over between the endpoints and retrying with backoff.
+
+        Args:
+            operation: Makes the call with the given client, e.g. lambda client: client.get_transaction(...)
+
+        Returns:
+            The result of the first successful call
+
+        Raises:
+            SolanaRpcError: If the call failed on every endpoint in every attempt
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(_get_backoff_seconds(attempt))
+            for endpoint in self._get_endpoints_by_health():
+                started = time.monotonic()
+                try:
+                    result = await operation(endpoint.client)
+                except Exception as e:
+                    endpoint.record_failure()
+                    last_error = e
+                    logger.debug(f"Solana RPC call to {endpoint.url} failed: {e}")
+                    continue
+                endpoint.record_success(time.monotonic() - started)
+                return result
+        raise SolanaRpcError(str(last_error))
+
+    def _get_endpoints_by_health(self) -> List[RpcEndpoint]:
+        # Among equally healthy endpoints the fastest goes first, untried ones get their turn early
+        return sorted(self.endpoints, key=lambda endpoint: (-round(endpoint.health_score, 2), endpoint.latency_seconds))
+
+    async def close(self) -> None:
+        await self.session.aclose()
+
+
+def _get_backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter, so clients retrying together spread out."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2**attempt))
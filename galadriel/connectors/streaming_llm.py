@@ -0,0 +1,179 @@
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from smolagents import LiteLLMModel
+from smolagents import Tool
+from smolagents.models import ChatMessage
+from smolagents.models import MessageRole
+from smolagents.models import parse_tool_args_if_needed
+
+from galadriel.connectors.llm_router import LlmEndpoint
+from galadriel.connectors.llm_router import LlmRouter
+from galadriel.connectors.prompt_caching import add_prompt_cache_hints
+from galadriel.connectors.prompt_caching import get_cached_tokens
+from galadriel.connectors.prompt_caching import supports_prompt_caching
+
+DeltaCallback = Callable[[str], None]
+
+
+class TokenCounts(NamedTuple):
+    input_tokens: int
+    output_tokens: int
+    # Input tokens read from the provider prompt cache
+    cached_input_tokens: int
+
+
+class StreamingLiteLLMModel(LiteLLMModel):
+    """LiteLLMModel streaming the completions from the provider.
+
+    smolagents needs the complete model output to parse it, so calls still return the whole message.
+    While it is generated, every text delta is passed to delta_callback, which stream_agent_response
+    sets to forward the deltas to the agent outputs. Calls with tools, from ToolCallingAgent, are not
+    streamed: their output is a tool call, not text for the user.
+
+    With prompt_caching, calls to models supporting it carry prompt caching hints, so the system
+    prompt and the earlier steps of the agent are read from the provider cache. The number of input
+    tokens read from the cache is in last_cached_input_token_count.
+    """
+
+    def __init__(self, *args, prompt_caching: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delta_callback: Optional[DeltaCallback] = None
+        self.prompt_caching = prompt_caching and supports_prompt_caching(self.model_id)
+        self.last_cached_input_token_count = 0
+
+    def __call__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        message, token_counts = self._complete(
+            messages,
+            self.api_base,
+            self.api_key,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+        self._set_token_counts(token_counts)
+        return message
+
+    def _set_token_counts(self, token_counts: TokenCounts) -> None:
+        self.last_input_token_count = token_counts.input_tokens
+        self.last_output_token_count = token_counts.output_tokens
+        self.last_cached_input_token_count = token_counts.cached_input_tokens
+
+    def _is_streamed(self, tools_to_call_from: Optional[List[Tool]]) -> bool:
+        return self.delta_callback is not None and tools_to_call_from is None
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        api_base: Optional[str],
+        api_key: Optional[str],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> Tuple[ChatMessage, TokenCounts]:
+        """Call the model at the given endpoint.
+
+        Returns:
+            The message and its token counts, the model itself is not changed so calls
+            may run concurrently
+        """
+        import litellm
+
+        is_streamed = self._is_streamed(tools_to_call_from)
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            model=self.model_id,
+            api_base=api_base,
+            api_key=api_key,
+            convert_images_to_image_urls=True,
+            flatten_messages_as_text=self.flatten_messages_as_text,
+            custom_role_conversions=self.custom_role_conversions,
+            **({"stream": True, "stream_options": {"include_usage": True}} if is_streamed else {}),
+            **kwargs,
+        )
+        if self.prompt_caching:
+            completion_kwargs["messages"] = add_prompt_cache_hints(completion_kwargs["messages"])
+        if not is_streamed:
+            response = litellm.completion(**completion_kwargs)
+            message = ChatMessage.from_dict(
+                response.choices[0].message.model_dump(include={"role", "content", "tool_calls"})
+            )
+            message.raw = response
+            if tools_to_call_from is not None:
+                message = parse_tool_args_if_needed(message)
+            return message, _get_token_counts(response.usage)
+        delta_callback: DeltaCallback = self.delta_callback  # type: ignore
+        parts = []
+        usage = None
+        for chunk in litellm.completion(**completion_kwargs):
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                delta_callback(delta)
+        return ChatMessage(role=MessageRole.ASSISTANT, content="".join(parts)), _get_token_counts(usage)
+
+
+class RoutedLiteLLMModel(StreamingLiteLLMModel):
+    """StreamingLiteLLMModel spreading its calls over the endpoints and API keys of a router.
+
+    The api_base and api_key of the model are not used, the ones of the chosen endpoint are. Calls
+    are hedged when the router hedges by default, except streamed calls: their deltas would be sent
+    to the user twice.
+    """
+
+    def __init__(self, model_id: str, router: LlmRouter, **kwargs):
+        super().__init__(model_id=model_id, **kwargs)
+        self.router = router
+
+    def __call__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        def complete(endpoint: LlmEndpoint) -> Tuple[ChatMessage, TokenCounts]:
+            result = self._complete(
+                messages,
+                endpoint.base_url,
+                endpoint.api_key,
+                stop_sequences=stop_sequences,
+                grammar=grammar,
+                tools_to_call_from=tools_to_call_from,
+                **kwargs,
+            )
+            hidden_params = getattr(result[0].raw, "_hidden_params", None)
+            if isinstance(hidden_params, dict):
+                endpoint.update_rate_limits(hidden_params.get("additional_headers"))
+            return result
+
+        message, token_counts = self.router.call_sync(complete, hedged=not self._is_streamed(tools_to_call_from))
+        self._set_token_counts(token_counts)
+        return message
+
+
+def _get_token_counts(usage) -> TokenCounts:
+    if not usage:
+        return TokenCounts(0, 0, 0)
+    return TokenCounts(usage.prompt_tokens, usage.completion_tokens, get_cached_tokens(usage))
@@ -4,6 +4,24 @@ import re
 from galadriel.entities import Message
 from smolagents import ActionStep
 
+CODE_FENCE = "```"
+END_CODE = "<end_code>"
+CODE_LABEL = "Code:"
+# Code fences with an <end_code> marker after or before them. Separate patterns, each starting with
+# a literal, are faster to scan for than an alternation of both
+FENCE_END_CODE_PATTERN = re.compile(r"```\s*<end_code>")
+END_CODE_FENCE_PATTERN = re.compile(r"<end_code>\s*```")
+EXTRA_NEWLINES_PATTERN = re.compile(r"\n{3,}")
+TOOL_NAME_PATTERN = re.compile(r"(?<=\s)`(\w+)`(?=\s)")
+CODE_FENCE_LINE_PATTERN = re.compile(r"```.*?\n")
+END_CODE_PATTERN = re.compile(r"\s*<end_code>\s*")
+EXECUTION_LOGS_PREFIX_PATTERN = re.compile(r"^Execution logs:\s*")
+# End of streamed text that may be the start of a code block, or of the "Code:" label or <end_code> marker before it
+PARTIAL_CODE_START_PATTERN = re.compile(
+    r"(?:(?:Code:|<end_code>)\s*`{0,2}|C(?:o(?:d(?:e)?)?)?|<(?:e(?:n(?:d(?:_(?:c(?:o(?:d(?:e)?)?)?)?)?)?)?)?|`{1,2})\Z"
+)
+PARTIAL_CODE_FENCE_PATTERN = re.compile(r"`{1,2}\Z")
+
 
 async def pull_messages_from_step(
     step_log,
@@ -15,46 +33,51 @@ async def pull_messages_from_step(
     show_step_errors: bool = False,
     show_token_counts: bool = False,
     show_code_in_thinking: bool = False,
+    show_thinking: bool = True,
 ):
-    """Extract Message objects from agent steps with proper nesting in OpenAI-compatible format"""
+    """Extract Message objects from agent steps with proper nesting in OpenAI-compatible format
+
+    show_thinking is disabled when the model output was already streamed token by token.
+    """
 
     if not isinstance(step_log, ActionStep):
         return
 
+    # Every message gets its own copy of these
+    base_kwargs = {**additional_kwargs, "role": "assistant"} if additional_kwargs else {"role": "assistant"}
+
     # Output the step number
     step_number = f"\n**Step {step_log.step_number}** \n" if step_log.step_number is not None else ""
     yield Message(
         content=step_number,
         conversation_id=conversation_id,
-        additional_kwargs={**(additional_kwargs or {}), "role": "assistant", "type": "step_header"},
+        additional_kwargs={**base_kwargs, "type": "step_header"},
     )
 
     # First yield the thought/reasoning from the LLM
-    if hasattr(step_log, "model_output") and step_log.model_output is not None:
+    if show_thinking and hasattr(step_log, "model_output") and step_log.model_output is not None:
         # Clean up the LLM output
         model_output = step_log.model_output.strip()
-        # Remove any trailing <end_code> and extra backticks
-        model_output = re.sub(r"```\s*<end_code>", "```", model_output)
-        model_output = re.sub(r"<end_code>\s*```", "```", model_output)
-        model_output = re.sub(r"```\s*\n\s*<end_code>", "```", model_output)
-
-        # If we don't want to show code in thinking, remove code blocks and "Code:" labels
-        if not show_code_in_thinking:
-            # Remove "Code:" labels followed by code blocks
-            model_output = re.sub(r"Code:\s*```.*?```", "", model_output, flags=re.DOTALL)
-            # Also remove any standalone code blocks
-            model_output = re.sub(r"```.*?```", "", model_output, flags=re.DOTALL)
+        if show_code_in_thinking:
+            # Remove any trailing <end_code> and extra backticks
+            if END_CODE in model_output:
+                model_output = FENCE_END_CODE_PATTERN.sub(CODE_FENCE, model_output)
+                model_output = END_CODE_FENCE_PATTERN.sub(CODE_FENCE, model_output)
+        else:
+            # Remove code blocks and their "Code:" labels
+            model_output = _strip_code_blocks(model_output)
             # Clean up any extra newlines that might have been created
-            model_output = re.sub(r"\n{3,}", "\n\n", model_output)
+            model_output = EXTRA_NEWLINES_PATTERN.sub("\n\n", model_output)
 
         # Replace tool names with bold formatting, excluding code blocks
-        model_output = re.sub(r"(?<=\s)`(\w+)`(?=\s)", r" **\1** ", model_output)
+        if "`" in model_output:
+            model_output = TOOL_NAME_PATTERN.sub(r" **\1** ", model_output)
         model_output = model_output.strip()
         model_output += "\n"
         yield Message(
             content=f"\n{model_output}",
             conversation_id=conversation_id,
-            additional_kwargs={**(additional_kwargs or {}), "role": "assistant", "type": "thinking"},
+            additional_kwargs={**base_kwargs, "type": "thinking"},
         )
 
     # For tool calls
@@ -71,8 +94,8 @@ async def pull_messages_from_step(
 
         if used_code:
             # Clean up the content
-            content = re.sub(r"```.*?\n", "", content)
-            content = re.sub(r"\s*<end_code>\s*", "", content)
+            content = CODE_FENCE_LINE_PATTERN.sub("", content)
+            content = END_CODE_PATTERN.sub("", content)
             content = content.strip()
             if not content.startswith("```python"):
                 content = f"```python\n{content}\n```"
@@ -82,8 +105,7 @@ async def pull_messages_from_step(
 
         # Tool call message
         tool_kwargs = {
-            **(additional_kwargs or {}),
-            "role": "assistant",
+            **base_kwargs,
             "tool_name": first_tool_call.name,
             "status": "pending",
             "type": "tool_call",
@@ -99,20 +121,20 @@ async def pull_messages_from_step(
             and step_log.observations.strip()
         ):
             log_content = step_log.observations.strip()
-            log_content = re.sub(r"^Execution logs:\s*", "", log_content)
+            log_content = EXECUTION_LOGS_PREFIX_PATTERN.sub("", log_content)
             # Fix markdown structure to avoid nesting issues - use a different format to avoid code block issues
             log_content = f"**Tool Output:**\n\n{log_content}"
-            log_kwargs = {**(additional_kwargs or {}), "role": "assistant", "type": "tool_output"}
+            log_kwargs = {**base_kwargs, "type": "tool_output"}
             yield Message(content=log_content, conversation_id=conversation_id, additional_kwargs=log_kwargs)
 
         # Tool errors
         if show_tool_errors and hasattr(step_log, "error") and step_log.error is not None:
-            error_kwargs = {**(additional_kwargs or {}), "role": "assistant", "type": "error", "status": "done"}
+            error_kwargs = {**base_kwargs, "type": "error", "status": "done"}
             yield Message(content=str(step_log.error), conversation_id=conversation_id, additional_kwargs=error_kwargs)
 
     # Handle standalone errors
     elif show_step_errors and hasattr(step_log, "error") and step_log.error is not None:
-        error_kwargs = {**(additional_kwargs or {}), "role": "assistant", "type": "error"}
+        error_kwargs = {**base_kwargs, "type": "error"}
         yield Message(content=str(step_log.error), conversation_id=conversation_id, additional_kwargs=error_kwargs)
 
     # Step summary with tokens and duration
@@ -126,5 +148,108 @@ async def pull_messages_from_step(
             step_footnote += step_duration  # type: ignore
         step_footnote += "\n\n"
 
-        summary_kwargs = {**(additional_kwargs or {}), "role": "assistant", "type": "step_summary"}
+        summary_kwargs = {**base_kwargs, "type": "step_summary"}
         yield Message(content=step_footnote, conversation_id=conversation_id, additional_kwargs=summary_kwargs)
+
+
+def _strip_code_blocks(text: str) -> str:
+    """Remove the code blocks, with the "Code:" label or <end_code> marker around them, in a single pass.
+
+    An unclosed code block is kept, like text without code blocks.
+    """
+    if CODE_FENCE not in text:
+        return text
+    parts = []
+    position = 0
+    length = len(text)
+    while True:
+        start = text.find(CODE_FENCE, position)
+        if start < 0:
+            break
+        end = text.find(CODE_FENCE, start + len(CODE_FENCE))
+        if end < 0:
+            break
+        before = text[position:start]
+        label_end = len(before.rstrip())
+        # Drop the "Code:" label, the whitespace between it and the block goes with it
+        if before.endswith(CODE_LABEL, 0, label_end):
+            before = before[: label_end - len(CODE_LABEL)]
+        # Drop an <end_code> marker before the block
+        elif before.endswith(END_CODE, 0, label_end):
+            before = before[: label_end - len(END_CODE)]
+        parts.append(before)
+        position = end + len(CODE_FENCE)
+        # Drop an <end_code> marker after the block
+        marker = position
+        while marker < length and text[marker].isspace():
+            marker += 1
+        if text.startswith(END_CODE, marker):
+            position = marker + len(END_CODE)
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+class CodeBlockFilter:
+    """Removes the code blocks, with their "Code:" labels and <end_code> markers, from streamed model output.
+
+    Streaming counterpart of the code block removal of pull_messages_from_step: text that may turn
+    out to start a code block is held back until the next delta tells.
+    """
+
+    def __init__(self) -> None:
+        self._in_code = False
+        # Right after a code block, where an <end_code> marker may follow
+        self._after_code = False
+        self._pending = ""
+
+    def feed(self, delta: str) -> str:
+        """Add a delta of the model output.
+
+        Returns:
+            The text that can be shown, possibly empty
+        """
+        text = self._pending + delta
+        visible = []
+        while True:
+            if self._after_code:
+                marker = text.lstrip()
+                if marker.startswith(END_CODE):
+                    text = marker[len(END_CODE) :]
+                elif END_CODE.startswith(marker):
+                    self._pending = text
+                    break
+                self._after_code = False
+            fence = text.find(CODE_FENCE)
+            if self._in_code:
+                if fence < 0:
+                    # Only a partial closing fence is kept, the code itself is dropped
+                    match = PARTIAL_CODE_FENCE_PATTERN.search(text)
+                    self._pending = match.group(0) if match else ""
+                    break
+                self._in_code = False
+                self._after_code = True
+                text = text[fence + len(CODE_FENCE) :]
+                continue
+            if fence < 0:
+                match = PARTIAL_CODE_START_PATTERN.search(text)
+                held = len(match.group(0)) if match else 0
+                visible.append(text[: len(text) - held])
+                self._pending = text[len(text) - held :]
+                break
+            before = text[:fence]
+            label_end = len(before.rstrip())
+            if before.endswith(CODE_LABEL, 0, label_end):
+                before = before[: label_end - len(CODE_LABEL)]
+            elif before.endswith(END_CODE, 0, label_end):
+                before = before[: label_end - len(END_CODE)]
+            visible.append(before)
+            self._in_code = True
+            text = text[fence + len(CODE_FENCE) :]
+        return "".join(visible)
+
+    def flush(self) -> str:
+        """Return the text held back at the end of the model output."""
+        pending, self._pending = self._pending, ""
+        in_code, self._in_code = self._in_code, False
+        self._after_code = False
+        return "" if in_code else pending
@@ -1,22 +1,28 @@
+import gzip
 import json
 import logging
 import os
 import threading
 import time
-from datetime import datetime
-from datetime import timezone
+from collections import deque
+from typing import Deque
 from typing import Dict
 from typing import List
 from typing import Optional
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from galadriel.entities import GALADRIEL_API_BASE_URL
+from galadriel.proof.merkle import build_merkle_tree
 from galadriel.proof.prover import Prover
 
 LOG_EXPORT_INTERVAL_SECONDS = 30
-LOG_EXPORT_BATCH_SIZE = 20
+# Maximum number of log records sent in a single request, a backlog is sent in several requests
+LOG_EXPORT_BATCH_SIZE = 500
+# Maximum number of log records waiting to be exported, the oldest ones are dropped when exceeded
+LOG_BUFFER_SIZE = 10_000
 
 
 class LogsExportHandler(logging.Handler):
@@ -25,12 +31,25 @@ class LogsExportHandler(logging.Handler):
         logger: logging.Logger,
         prover: Optional[Prover],
         export_interval_seconds: int = LOG_EXPORT_INTERVAL_SECONDS,
+        buffer_size: int = LOG_BUFFER_SIZE,
+        batch_size: int = LOG_EXPORT_BATCH_SIZE,
+        compress: bool = True,
+        batch_signing: bool = False,
     ):
         super().__init__()
         self.logger = logger
         self.prover = prover
-        self.log_records: List[str] = []
+        # deque appends and pops are thread-safe, so emit never takes a lock
+        self.log_records: Deque[Dict] = deque(maxlen=buffer_size)
         self.export_interval_seconds = export_interval_seconds
+        self.batch_size = batch_size
+        self.compress = compress
+        # Sign a Merkle root per exported batch instead of every log line
+        self.batch_signing = batch_signing
+        self.dropped_records_count = 0
+        self._reported_dropped_records_count = 0
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
     def run(self):
         threading.Thread(
@@ -39,8 +58,22 @@ class LogsExportHandler(logging.Handler):
         ).start()
 
     def emit(self, record):
-        log_entry = self.format(record)
-        self.log_records.append(log_entry)
+        try:
+            message = record.getMessage()
+            if not message:
+                return
+            if len(self.log_records) == self.log_records.maxlen:
+                # Best effort accounting, the oldest record is dropped by the append below
+                self.dropped_records_count += 1
+            self.log_records.append(
+                {
+                    "text": message,
+                    "level": record.levelname.lower(),
+                    "timestamp": int(record.created),
+                }
+            )
+        except Exception:
+            self.handleError(record)
 
     def _run_export_logs_job(self) -> None:
         """
@@ -60,38 +93,68 @@ class LogsExportHandler(logging.Handler):
             return
         while True:
             time.sleep(self.export_interval_seconds)
-            formatted_logs = self._format_logs()
-            is_export_success = self._export_logs(api_key, agent_id, agent_instance_id, formatted_logs)
-            if is_export_success:
-                self.log_records = self.log_records[len(formatted_logs) :]
-
-    def _format_logs(self) -> List[Dict]:
-        logs = self.log_records[:]  # shallow copy
-        formatted_logs = []
-        for log in logs:
-            try:
-                log_line = json.loads(log)
-                if log_line.get("message"):
-                    formatted_logs.append(
-                        {
-                            "text": log_line["message"],
-                            "level": str(log_line.get("levelname", "info")).lower(),
-                            "timestamp": self._format_timestamp(log_line.get("asctime")),
-                            "signature": self._get_signature(log_line["message"]),
-                        }
-                    )
-            except Exception:
-                pass
-        return formatted_logs[:LOG_EXPORT_BATCH_SIZE]
+            self._export_pending_logs(api_key, agent_id, agent_instance_id)
 
-    def _format_timestamp(self, asctime: Optional[str]) -> int:
-        if not asctime:
-            return 0
-        try:
-            dt_obj = datetime.strptime(asctime, "%Y-%m-%d %H:%M:%S,%f").replace(tzinfo=timezone.utc)
-            return int(dt_obj.timestamp())
-        except Exception:
-            return 0
+    def _export_pending_logs(self, api_key: str, agent_id: str, agent_instance_id: str) -> None:
+        """Export all buffered logs in batches of at most self.batch_size records.
+
+        Records of a failed batch are put back to the buffer and retried on the next run.
+        """
+        self._report_dropped_records()
+        # Records logged while exporting, e.g. by the export itself, are left for the next run
+        pending_count = len(self.log_records)
+        while pending_count > 0:
+            batch = self._pop_batch(min(pending_count, self.batch_size))
+            if not batch:
+                return
+            is_export_success = self._export_logs(api_key, agent_id, agent_instance_id, self._format_logs(batch))
+            if not is_export_success:
+                self._requeue(batch)
+                return
+            pending_count -= len(batch)
+
+    def _requeue(self, batch: List[Dict]) -> None:
+        """Put a failed batch back in front of the buffer, the newest records are evicted when it is full."""
+        # Best effort accounting, records logged meanwhile may evict a few more
+        free_count = self.log_records.maxlen - len(self.log_records)  # type: ignore
+        self.dropped_records_count += max(0, len(batch) - free_count)
+        self.log_records.extendleft(reversed(batch))
+
+    def _pop_batch(self, size: int) -> List[Dict]:
+        batch: List[Dict] = []
+        while self.log_records and len(batch) < size:
+            batch.append(self.log_records.popleft())
+        return batch
+
+    def _report_dropped_records(self) -> None:
+        dropped_records_count = self.dropped_records_count
+        if dropped_records_count > self._reported_dropped_records_count:
+            self.logger.warning(
+                f"Log export buffer is full, dropped {dropped_records_count - self._reported_dropped_records_count} "
+                f"log records ({dropped_records_count} in total)"
+            )
+            self._reported_dropped_records_count = dropped_records_count
+
+    def _format_logs(self, records: List[Dict]) -> List[Dict]:
+        if self.batch_signing and self.prover and records:
+            return self._format_logs_with_batch_signature(records)
+        return [{**record, "signature": self._get_signature(record["text"])} for record in records]
+
+    def _format_logs_with_batch_signature(self, records: List[Dict]) -> List[Dict]:
+        """Sign the whole batch at once.
+
+        The batch is signed by signing the root of a Merkle tree built over the hashes of its
+        log lines. Every line carries the signature, the root and its inclusion proof, so it
+        can still be verified on its own.
+        """
+        prover: Prover = self.prover  # type: ignore
+        leaves = [prover.hash(record["text"]) for record in records]
+        root, proofs = build_merkle_tree(leaves)
+        signature = prover.sign(root).hex()
+        return [
+            {**record, "signature": signature, "merkle_root": root.hex(), "merkle_proof": proof}
+            for record, proof in zip(records, proofs)
+        ]
 
     def _get_signature(self, message: str) -> Optional[str]:
         if not self.prover:
@@ -103,17 +166,31 @@ class LogsExportHandler(logging.Handler):
         is_export_success = False
         if formatted_logs:
             try:
-                response = requests.post(
-                    urljoin(GALADRIEL_API_BASE_URL, f"v1/agents/logs/{agent_id}"),
-                    timeout=60,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {api_key}",
-                    },
-                    json={"agent_instance_id": agent_instance_id, "logs": formatted_logs},
-                )
+                body = json.dumps({"agent_instance_id": agent_instance_id, "logs": formatted_logs}).encode("utf-8")
+                response = self._post_logs(api_key, agent_id, body)
+                if 400 <= response.status_code < 500 and self.compress:
+                    # APIs rejecting compressed bodies answer with various client errors, retry once
+                    # uncompressed and keep sending uncompressed bodies if that is accepted
+                    self.compress = False
+                    response = self._post_logs(api_key, agent_id, body)
+                    self.compress = not response.ok
                 self.logger.debug(f"Log export request status: {response.status_code}")
                 is_export_success = response.ok
             except Exception:
                 self.logger.error("Failed to export logs", exc_info=True)
         return is_export_success
+
+    def _post_logs(self, api_key: str, agent_id: str, body: bytes) -> requests.Response:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        if self.compress:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(
+            urljoin(GALADRIEL_API_BASE_URL, f"v1/agents/logs/{agent_id}"),
+            timeout=60,
+            headers=headers,
+            data=body,
+        )
@@ -1,6 +1,93 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 import json
+import os
 import random
+import re
+import threading
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(.*?)\}\}")
+PLACEHOLDER_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+MAX_COMPILED_TEMPLATES = 128
+# Character file fields filled in once, and the list fields sampled on every render
+CHARACTER_STATIC_FIELDS = {"agent_name": "name", "system": "system"}
+CHARACTER_RANDOM_FIELDS = ("knowledge", "bio", "lore", "topics")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """Prompt template parsed into literal text and the placeholder slots between it.
+
+    Rendering joins the literals with the values in a single pass, so values are never scanned
+    for placeholders: a value containing "{{request}}" is inserted as is.
+    """
+
+    # One literal more than names: literals[i] comes before names[i], literals[-1] ends the template
+    literals: Tuple[str, ...]
+    names: Tuple[str, ...]
+
+    @property
+    def placeholders(self) -> FrozenSet[str]:
+        return frozenset(self.names)
+
+    def render(self, prompt_state: Dict) -> str:
+        """Fill the placeholders with the values of prompt_state.
+
+        Placeholders without a value are kept, so they can be filled in later.
+        """
+        parts = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            parts.append(str(prompt_state[name]) if name in prompt_state else "{{" + name + "}}")
+            parts.append(literal)
+        return "".join(parts)
+
+    def partial(self, prompt_state: Dict) -> "CompiledTemplate":
+        """Fill the placeholders that have a value in prompt_state ahead of rendering.
+
+        Returns:
+            Template with the other placeholders left as slots
+        """
+        literals, names = [self.literals[0]], []
+        for name, literal in zip(self.names, self.literals[1:]):
+            if name in prompt_state:
+                literals[-1] += str(prompt_state[name]) + literal
+            else:
+                names.append(name)
+                literals.append(literal)
+        return CompiledTemplate(literals=tuple(literals), names=tuple(names))
+
+
+@lru_cache(maxsize=MAX_COMPILED_TEMPLATES)
+def compile_template(prompt_template: str) -> CompiledTemplate:
+    """Parse a prompt template, the result is cached per template string.
+
+    Args:
+        prompt_template: Template with {{name}} placeholders
+
+    Returns:
+        The compiled template
+
+    Raises:
+        ValueError: If a placeholder name is not a valid identifier, e.g. {{ request }} or {{}}
+    """
+    literals, names = [], []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(prompt_template):
+        name = match.group(1)
+        if not PLACEHOLDER_NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid placeholder {match.group(0)!r} in prompt template")
+        literals.append(prompt_template[position : match.start()])
+        names.append(name)
+        position = match.end()
+    literals.append(prompt_template[position:])
+    return CompiledTemplate(literals=tuple(literals), names=tuple(names))
 
 
 def validate_prompt_template(prompt_template: str) -> None:
@@ -10,26 +97,103 @@ def validate_prompt_template(prompt_template: str) -> None:
         prompt_template: The template string to validate
 
     Raises:
-        ValueError: If template doesn't contain {{request}}
+        ValueError: If template doesn't contain {{request}}, or has an invalid placeholder
     """
-    if "{{request}}" not in prompt_template:
+    placeholders = compile_template(prompt_template).placeholders
+    if "request" not in placeholders:
         raise ValueError("Prompt template must contain {{request}}")
 
-    if "{{chat_history}}" not in prompt_template:
+    if "chat_history" not in placeholders:
         raise ValueError("Prompt template must contain {{chat_history}}, otherwise it can't use any memory")
 
 
 def execute(prompt_template: str, prompt_state: Dict) -> str:
-    prompt = prompt_template
-    for k, v in prompt_state.items():
-        prompt = prompt.replace("{{" + k + "}}", str(v))
-    return prompt
+    return compile_template(prompt_template).render(prompt_state)
 
 
-def load_agent_template(template: str, json_path: str) -> str:
+class CharacterTemplate:
+    """Prompt template filled with the personality of a character file.
+
+    The file is parsed once and its static fields are rendered into the template ahead, so each
+    render only samples the randomized fields (knowledge, bio, lore and topics) and splices them in.
+    With watch enabled, the file is parsed again when it changes.
+    """
+
+    def __init__(self, template: str, json_path: Union[str, Path], watch: bool = False):
+        """
+        Args:
+            template: The template string containing placeholders
+            json_path: Path to the JSON file containing agent personality data
+            watch: Reload the character file when its modification time changes
+
+        Raises:
+            FileNotFoundError: If the character file doesn't exist
+            ValueError: If the character file is not valid
+        """
+        self.template = template
+        self.json_path = json_path
+        self.watch = watch
+        self._lock = threading.Lock()
+        self._modified_time_ns = 0
+        self._compiled = compile_template(template)
+        self._random_values: Dict[str, List] = {}
+        self._load()
+
+    def render(self, prompt_state: Optional[Dict] = None) -> str:
+        """Render the template with newly sampled character values.
+
+        Args:
+            prompt_state: Values for the other placeholders of the template, e.g. the request
+
+        Returns:
+            str: Template with randomly selected values, placeholders without a value are kept
+        """
+        if self.watch and self._get_modified_time_ns() != self._modified_time_ns:
+            self._load()
+        with self._lock:
+            compiled, random_values = self._compiled, self._random_values
+        values = {field: random.choice(choices) for field, choices in random_values.items()}
+        if prompt_state:
+            values.update(prompt_state)
+        return compiled.render(values)
+
+    def _load(self) -> None:
+        modified_time_ns = self._get_modified_time_ns()
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON file: {self.json_path}")
+        template = compile_template(self.template)
+        random_values = {}
+        for field in CHARACTER_RANDOM_FIELDS:
+            if not data.get(field):
+                raise ValueError(f"Missing required key in JSON file: {field}")
+            # Only the fields used by the template are sampled on render
+            if field in template.placeholders:
+                random_values[field] = list(data[field])
+        static_values = {field: data.get(key) for field, key in CHARACTER_STATIC_FIELDS.items()}
+        with self._lock:
+            self._compiled = template.partial(static_values)
+            self._random_values = random_values
+            self._modified_time_ns = modified_time_ns
+
+    def _get_modified_time_ns(self) -> int:
+        try:
+            return os.stat(self.json_path).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Agent personality file not found: {self.json_path}")
+
+
+_character_templates: Dict[Tuple[str, str], CharacterTemplate] = {}
+
+
+def load_agent_template(template: str, json_path: Union[str, Path]) -> str:
     """
     Load agent personality from JSON and update template with random values.
 
+    The character file is parsed on the first call only, and again when it changes.
+
     Args:
         template (str): The template string containing placeholders
         json_path (str): Path to the JSON file containing agent personality data
@@ -37,26 +201,8 @@ def load_agent_template(template: str, json_path: str) -> str:
     Returns:
         str: Updated template with randomly selected values
     """
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        agent_values = {
-            "knowledge": random.choice(data.get("knowledge", [])),
-            "agent_name": data.get("name"),
-            "system": data.get("system"),
-            "bio": random.choice(data.get("bio", [])),
-            "lore": random.choice(data.get("lore", [])),
-            "topics": random.choice(data.get("topics", [])),
-        }
-
-        updated_template = execute(template, agent_values)
-
-        return updated_template
-
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Agent personality file not found: {json_path}")
-    except json.JSONDecodeError:
-        raise ValueError(f"Invalid JSON file: {json_path}")
-    except KeyError as e:
-        raise KeyError(f"Missing required key in JSON file: {e}")
+    key = (template, os.path.abspath(json_path))
+    character_template = _character_templates.get(key)
+    if character_template is None:
+        character_template = _character_templates[key] = CharacterTemplate(template, json_path, watch=True)
+    return character_template.render()
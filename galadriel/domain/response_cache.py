@@ -0,0 +1,219 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from galadriel.entities import Message
+from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry import metrics
+
+logger = get_agent_logger()
+
+DEFAULT_RESPONSE_CACHE_TTL_SECONDS = 5 * 60
+DEFAULT_MAX_CACHED_RESPONSES = 1024
+# Minimum cosine similarity of two requests for the response of one to answer the other
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Responses of these types are never cached
+UNCACHEABLE_RESPONSE_TYPES = ("error_message",)
+
+
+@dataclass
+class CachedResponse:
+    content: str
+    response_type: Optional[str]
+    # Tools called by the agent to generate the response, used to invalidate it
+    tool_names: FrozenSet[str]
+    expires_at: float
+    conversation_id: Optional[str]
+    embedding: Optional[np.ndarray] = None
+
+
+@dataclass
+class CacheLookup:
+    """Result of looking up a request in the response cache, passed back on put after a miss."""
+
+    key: str
+    conversation_id: Optional[str]
+    # Normalized embedding of the request content, if similarity matching is enabled
+    embedding: Optional[np.ndarray]
+    # The cached response for the request, None on a miss
+    response: Optional[Message] = None
+
+
+class ResponseCache:
+    """Final responses of earlier requests, reused for requests with the same or a similar content.
+
+    Requests match when their contents are equal, ignoring case and whitespace, or, with embeddings
+    given, when their embeddings have a cosine similarity of at least similarity_threshold.
+
+    A response expires after ttl_seconds, or earlier when the agent called a tool listed in
+    tool_ttl_seconds to generate it, e.g. {"get_coin_price": 30}. With a TTL of 0, responses
+    that called the tool are not cached. invalidate() drops the responses that called a tool.
+
+    The chat history is not part of the key, enable the cache for requests that don't depend on it.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_CACHED_RESPONSES,
+        tool_ttl_seconds: Optional[Dict[str, float]] = None,
+        embeddings: Optional[Embeddings] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        per_conversation: bool = False,
+    ):
+        """
+        Args:
+            ttl_seconds: Time a response is reused for
+            max_entries: Maximum number of cached responses, the least recently used are evicted
+            tool_ttl_seconds: Shorter TTLs of the responses that called the given tools
+            embeddings: Embedding model to match similar requests, only equal requests match without it
+            similarity_threshold: Minimum cosine similarity of matching requests
+            per_conversation: Only reuse responses within the same conversation
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.tool_ttl_seconds = tool_ttl_seconds or {}
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.per_conversation = per_conversation
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    async def lookup(self, request: Message) -> CacheLookup:
+        """Find the cached response for a request.
+
+        Returns:
+            The lookup, with the response addressed to the request on a hit
+        """
+        conversation_id = request.conversation_id if self.per_conversation else None
+        content = WHITESPACE_PATTERN.sub(" ", request.content).strip().casefold()
+        key = hashlib.sha256(f"{conversation_id}\0{content}".encode("utf-8")).hexdigest()
+        lookup = CacheLookup(key=key, conversation_id=conversation_id, embedding=None)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            metrics.RESPONSE_CACHE_LOOKUPS.inc(result="exact_hit")
+            lookup.response = _get_response(request, entry)
+            return lookup
+        if self.embeddings is not None:
+            lookup.embedding = await self._embed(content)
+            entry = self._find_similar(lookup, now)
+            if entry is not None:
+                metrics.RESPONSE_CACHE_LOOKUPS.inc(result="similar_hit")
+                lookup.response = _get_response(request, entry)
+                return lookup
+        metrics.RESPONSE_CACHE_LOOKUPS.inc(result="miss")
+        return lookup
+
+    def put(self, lookup: CacheLookup, response: Optional[Message], tool_names: Iterable[str] = ()) -> bool:
+        """Cache the final response generated after a missed lookup.
+
+        Args:
+            lookup: The missed lookup of the request
+            response: The last response of the agent for the request
+            tool_names: Names of the tools the agent called to generate the response
+
+        Returns:
+            True if the response was cached
+        """
+        if response is None or not response.final or not response.content:
+            return False
+        response_type = (response.additional_kwargs or {}).get("type")
+        if response_type in UNCACHEABLE_RESPONSE_TYPES:
+            return False
+        tool_names = frozenset(tool_names)
+        ttl_seconds = min(
+            [self.ttl_seconds] + [self.tool_ttl_seconds.get(name, self.ttl_seconds) for name in tool_names]
+        )
+        if ttl_seconds <= 0:
+            return False
+        now = time.monotonic()
+        self._entries.pop(lookup.key, None)
+        if len(self._entries) >= self.max_entries:
+            self._remove_expired(now)
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+        self._entries[lookup.key] = CachedResponse(
+            content=response.content,
+            response_type=response_type,
+            tool_names=tool_names,
+            expires_at=now + ttl_seconds,
+            conversation_id=lookup.conversation_id,
+            embedding=lookup.embedding,
+        )
+        return True
+
+    def invalidate(self, tool_name: str) -> int:
+        """Drop the cached responses the agent called the tool for, e.g. when the data it returns changed.
+
+        Returns:
+            Number of responses dropped
+        """
+        keys = [key for key, entry in self._entries.items() if tool_name in entry.tool_names]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _embed(self, content: str) -> Optional[np.ndarray]:
+        try:
+            embedding = np.asarray(await self.embeddings.aembed_query(content), dtype=np.float32)  # type: ignore
+        except Exception as e:
+            logger.error(f"Error embedding request for the response cache, only equal requests match: {e}")
+            return None
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
+
+    def _find_similar(self, lookup: CacheLookup, now: float) -> Optional[CachedResponse]:
+        if lookup.embedding is None:
+            return None
+        keys, vectors = [], []
+        for key, entry in self._entries.items():
+            if (
+                entry.embedding is not None
+                and entry.expires_at > now
+                and entry.conversation_id == lookup.conversation_id
+            ):
+                keys.append(key)
+                vectors.append(entry.embedding)
+        if not vectors:
+            return None
+        similarities = np.stack(vectors) @ lookup.embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]]
+
+    def _remove_expired(self, now: float) -> None:
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+
+
+def _get_response(request: Message, entry: CachedResponse) -> Message:
+    return Message(
+        content=entry.content,
+        conversation_id=request.conversation_id,
+        additional_kwargs={
+            **(request.additional_kwargs or {}),
+            "role": "assistant",
+            "type": entry.response_type or "completion_message",
+            "cached": True,
+        },
+        final=True,
+    )
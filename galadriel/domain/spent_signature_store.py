@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+# Payments older than this are rejected, so their signatures can be forgotten after this long
+DEFAULT_MAX_PAYMENT_AGE_SECONDS = 24 * 60 * 60
+PRUNE_INTERVAL_SECONDS = 60 * 60
+# Expected number of signatures within the max payment age, the Bloom filter grows beyond it on pruning
+DEFAULT_BLOOM_FILTER_CAPACITY = 100_000
+BLOOM_FILTER_ERROR_RATE = 0.001
+# Name of the spent signatures file in agent state snapshots
+SNAPSHOT_FILE_NAME = "spent_signatures.json"
+# Relative to the working directory, can be overridden with the environment variable
+DEFAULT_DATABASE_PATH = "data/spent_signatures.sqlite"
+SPENT_SIGNATURES_DATABASE_PATH_ENV = "SPENT_SIGNATURES_DATABASE_PATH"
+
+
+class BloomFilter:
+    """Set membership test without false negatives, used to skip lookups of signatures never seen."""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_FILTER_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, value: str) -> None:
+        for index in self._get_indexes(value):
+            self.bits[index // 8] |= 1 << (index % 8)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[index // 8] & (1 << (index % 8)) for index in self._get_indexes(value))
+
+    def _get_indexes(self, value: str) -> Iterable[int]:
+        # Double hashing: the i-th index is h1 + i * h2
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+
+class SpentSignatureStore(ABC):
+    """Signatures of the payment transactions already used, to prevent replaying a payment.
+
+    Signatures are kept for max_age_seconds, payments older than that are rejected by the validator.
+    """
+
+    def __init__(self, max_age_seconds: float = DEFAULT_MAX_PAYMENT_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        # Incremented on every added signature, used to detect changes since the last state snapshot
+        self.change_count = 0
+        self._last_pruned = time.time()
+
+    @abstractmethod
+    async def contains(self, signature: str) -> bool:
+        """Check whether the signature has been spent."""
+
+    @abstractmethod
+    async def add(self, signature: str, timestamp: Optional[float] = None) -> bool:
+        """Mark the signature as spent.
+
+        Args:
+            signature: Transaction signature
+            timestamp: Time of the transaction, defaults to now
+
+        Returns:
+            False if the signature was already spent
+        """
+
+    @abstractmethod
+    def get_entries(self) -> Dict[str, float]:
+        """Return all spent signatures with their timestamps. Safe to call from a worker thread."""
+
+    @abstractmethod
+    def add_entries(self, entries: Dict[str, float]) -> None:
+        """Mark several signatures as spent. Safe to call from a worker thread."""
+
+    @abstractmethod
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forget signatures older than max_age_seconds.
+
+        Returns:
+            Number of signatures removed
+        """
+
+    def save_to_folder(self, folder_path: str) -> None:
+        """Write the spent signatures to an agent state folder."""
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, SNAPSHOT_FILE_NAME), "w", encoding="utf-8") as file:
+            json.dump(self.get_entries(), file)
+
+    def load_from_folder(self, folder_path: str) -> None:
+        """Add the spent signatures of an agent state folder, if it has any."""
+        path = os.path.join(folder_path, SNAPSHOT_FILE_NAME)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as file:
+            self.add_entries(json.load(file))
+        self.prune()
+
+    def _is_prune_due(self, now: float) -> bool:
+        return now - self._last_pruned >= PRUNE_INTERVAL_SECONDS
+
+
+class InMemorySpentSignatureStore(SpentSignatureStore):
+    """Spent signatures kept in memory only, they are lost on restart unless restored from agent state."""
+
+    def __init__(self, max_age_seconds: float = DEFAULT_MAX_PAYMENT_AGE_SECONDS):
+        super().__init__(max_age_seconds)
+        self._signatures: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def contains(self, signature: str) -> bool:
+        return signature in self._signatures
+
+    async def add(self, signature: str, timestamp: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            if signature in self._signatures:
+                return False
+            self._signatures[signature] = timestamp if timestamp is not None else now
+            self.change_count += 1
+        if self._is_prune_due(now):
+            self.prune(now)
+        return True
+
+    def get_entries(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._signatures)
+
+    def add_entries(self, entries: Dict[str, float]) -> None:
+        with self._lock:
+            for signature, timestamp in entries.items():
+                self._signatures.setdefault(signature, timestamp)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        self._last_pruned = now
+        with self._lock:
+            expired = [sig for sig, timestamp in self._signatures.items() if timestamp < now - self.max_age_seconds]
+            for signature in expired:
+                del self._signatures[signature]
+        return len(expired)
+
+
+class SqliteSpentSignatureStore(SpentSignatureStore):
+    """Spent signatures persisted in a SQLite database, so they survive restarts.
+
+    A Bloom filter in front of the database answers most lookups of new signatures without a query.
+    Database access runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[str] = None,
+        max_age_seconds: float = DEFAULT_MAX_PAYMENT_AGE_SECONDS,
+        bloom_filter_capacity: int = DEFAULT_BLOOM_FILTER_CAPACITY,
+    ):
+        """
+        Args:
+            database_path: Path of the SQLite database. Defaults to the SPENT_SIGNATURES_DATABASE_PATH
+                environment variable, or data/spent_signatures.sqlite in the working directory.
+            max_age_seconds: Signatures are forgotten after this long, older payments are rejected
+            bloom_filter_capacity: Expected number of signatures within the max payment age
+        """
+        super().__init__(max_age_seconds)
+        database_path = database_path or os.getenv(SPENT_SIGNATURES_DATABASE_PATH_ENV) or DEFAULT_DATABASE_PATH
+        self.database_path = database_path
+        self.bloom_filter_capacity = bloom_filter_capacity
+        if os.path.dirname(database_path):
+            os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        # Used from worker threads, serialized by the lock
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS spent_signatures (signature TEXT PRIMARY KEY, timestamp REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS spent_signatures_timestamp ON spent_signatures (timestamp)"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._bloom_filter = BloomFilter(bloom_filter_capacity)
+        # Also loads the stored signatures into the Bloom filter
+        self.prune()
+
+    async def contains(self, signature: str) -> bool:
+        if signature not in self._bloom_filter:
+            return False
+        return await asyncio.to_thread(self._contains, signature)
+
+    async def add(self, signature: str, timestamp: Optional[float] = None) -> bool:
+        now = time.time()
+        is_added = await asyncio.to_thread(self._add, signature, timestamp if timestamp is not None else now)
+        if self._is_prune_due(now):
+            await asyncio.to_thread(self.prune, now)
+        return is_added
+
+    def get_entries(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._connection.execute("SELECT signature, timestamp FROM spent_signatures").fetchall())
+
+    def add_entries(self, entries: Dict[str, float]) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO spent_signatures (signature, timestamp) VALUES (?, ?)", entries.items()
+                )
+            for signature in entries:
+                self._bloom_filter.add(signature)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forget expired signatures and rebuild the Bloom filter, which can't remove entries, without them."""
+        now = now if now is not None else time.time()
+        self._last_pruned = now
+        with self._lock:
+            with self._connection:
+                removed = self._connection.execute(
+                    "DELETE FROM spent_signatures WHERE timestamp < ?", (now - self.max_age_seconds,)
+                ).rowcount
+            signatures = [row[0] for row in self._connection.execute("SELECT signature FROM spent_signatures")]
+            bloom_filter = BloomFilter(max(self.bloom_filter_capacity, 2 * len(signatures)))
+            for signature in signatures:
+                bloom_filter.add(signature)
+            self._bloom_filter = bloom_filter
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _contains(self, signature: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM spent_signatures WHERE signature = ?", (signature,)
+            ).fetchone()
+        return row is not None
+
+    def _add(self, signature: str, timestamp: float) -> bool:
+        with self._lock:
+            with self._connection:
+                is_added = (
+                    self._connection.execute(
+                        "INSERT OR IGNORE INTO spent_signatures (signature, timestamp) VALUES (?, ?)",
+                        (signature, timestamp),
+                    ).rowcount
+                    == 1
+                )
+            self._bloom_filter.add(signature)
+            if is_added:
+                self.change_count += 1
+        return is_added
@@ -0,0 +1,114 @@
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+
+from galadriel.entities import Message
+
+DELTA_MESSAGE_TYPE = "delta"
+# Chat platforms rate limit message edits, streamed replies are edited at most this often
+DEFAULT_MIN_EDIT_INTERVAL_SECONDS = 1.0
+# Replies of requests that never got their final message are forgotten beyond this number
+MAX_STREAMED_REPLIES = 100
+TRUNCATION_PREFIX = "…"
+
+
+def is_delta_message(message: Message) -> bool:
+    """Whether the message is a chunk of streamed model output."""
+    return bool(message.additional_kwargs) and message.additional_kwargs.get("type") == DELTA_MESSAGE_TYPE  # type: ignore
+
+
+@dataclass
+class _StreamedReply:
+    text: str = ""
+    # The sent chat message, once there is text to show
+    handle: Any = None
+    shown_text: str = ""
+    edited_at: float = 0.0
+
+
+class StreamedReplies:
+    """Shows the streamed model output of each request in a single chat message, edited in place.
+
+    The first chunk is sent as a new chat message, which is then edited as more chunks arrive, at most
+    every min_edit_interval_seconds. The final response replaces the streamed text.
+    """
+
+    def __init__(
+        self,
+        max_length: int,
+        min_edit_interval_seconds: float = DEFAULT_MIN_EDIT_INTERVAL_SECONDS,
+    ):
+        """
+        Args:
+            max_length: Maximum length of a chat message on the platform, longer streamed text shows its end
+            min_edit_interval_seconds: Minimum time between two edits of a chat message
+        """
+        self.max_length = max_length
+        self.min_edit_interval_seconds = min_edit_interval_seconds
+        self._replies: Dict[str, _StreamedReply] = {}
+
+    async def send(
+        self,
+        request: Message,
+        response: Message,
+        send_message: Callable[[str], Awaitable[Any]],
+        edit_message: Callable[[Any, str], Awaitable[Any]],
+    ) -> bool:
+        """Show a response that is part of a streamed reply.
+
+        Args:
+            request: The request the response answers
+            response: The response to show
+            send_message: Sends a new chat message with the given text and returns it
+            edit_message: Replaces the text of a chat message returned by send_message
+
+        Returns:
+            False if the response is not part of a streamed reply, and should be sent as usual
+        """
+        reply = self._replies.get(request.id)
+        if is_delta_message(response):
+            if reply is None:
+                reply = self._add_reply(request.id)
+            reply.text += response.content
+            await self._show(reply, send_message, edit_message)
+            return True
+        if not response.final or reply is None:
+            return False
+        del self._replies[request.id]
+        if reply.handle is None or len(response.content) > self.max_length or not response.content.strip():
+            return False
+        await edit_message(reply.handle, response.content)
+        return True
+
+    def _add_reply(self, request_id: str) -> _StreamedReply:
+        if len(self._replies) >= MAX_STREAMED_REPLIES:
+            del self._replies[next(iter(self._replies))]
+        reply = self._replies[request_id] = _StreamedReply()
+        return reply
+
+    async def _show(
+        self,
+        reply: _StreamedReply,
+        send_message: Callable[[str], Awaitable[Any]],
+        edit_message: Callable[[Any, str], Awaitable[Any]],
+    ) -> None:
+        text = self._truncate(reply.text)
+        if not text.strip() or text == reply.shown_text:
+            return
+        now = time.monotonic()
+        if reply.handle is None:
+            reply.handle = await send_message(text)
+        elif now - reply.edited_at >= self.min_edit_interval_seconds:
+            await edit_message(reply.handle, text)
+        else:
+            return
+        reply.shown_text = text
+        reply.edited_at = now
+
+    def _truncate(self, text: str) -> str:
+        if len(text) <= self.max_length:
+            return text
+        return TRUNCATION_PREFIX + text[len(text) - self.max_length + len(TRUNCATION_PREFIX) :]
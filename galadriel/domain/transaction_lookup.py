@@ -0,0 +1,234 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey  # pylint: disable=E0401
+from solders.rpc.config import RpcTransactionConfig  # pylint: disable=E0401
+from solders.rpc.requests import GetTransaction  # pylint: disable=E0401
+from solders.rpc.responses import GetTransactionResp  # pylint: disable=E0401
+from solders.rpc.responses import RPCError  # pylint: disable=E0401
+from solders.signature import Signature  # pylint: disable=E0401
+from solders.transaction_status import UiTransactionEncoding  # pylint: disable=E0401
+
+from galadriel.connectors.solana_rpc import SolanaRpcError
+from galadriel.connectors.solana_rpc import SolanaRpcPool
+
+MAX_SUPPORTED_TRANSACTION_VERSION = 10
+# Transactions are immutable once confirmed, the TTL only bounds the memory used by the cache
+DEFAULT_CACHE_TTL_SECONDS = 60
+# Lookups arriving within this window are sent in a single batched JSON-RPC request
+DEFAULT_BATCH_WINDOW_SECONDS = 0.01
+DEFAULT_MAX_BATCH_SIZE = 50
+
+
+@dataclass(frozen=True)
+class TransactionTransfer:
+    """SOL received by the wallet in a confirmed transaction."""
+
+    amount_lamport: int
+    block_time: Optional[int]
+
+
+class TransactionLookup:
+    """Looks up the SOL transferred to a wallet by transactions, with as few RPC calls as possible.
+
+    - Results are cached by signature for cache_ttl_seconds, so a retried request doesn't fetch
+      the transaction again. The transferred amount is computed from the balances once.
+    - Concurrent lookups of the same signature share a single fetch.
+    - Lookups of different signatures arriving within batch_window_seconds are fetched in a single
+      batched JSON-RPC request.
+    """
+
+    def __init__(
+        self,
+        rpc_pool: SolanaRpcPool,
+        wallet_address: str,
+        cache_ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+        batch_window_seconds: float = DEFAULT_BATCH_WINDOW_SECONDS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        self.rpc_pool = rpc_pool
+        self.wallet_key = Pubkey.from_string(wallet_address)
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max_batch_size
+        self._cache: Dict[str, Tuple[float, TransactionTransfer]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks, batches in flight are kept here
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    async def get_transfer(self, signature: str) -> Optional[TransactionTransfer]:
+        """Get the SOL transferred to the wallet by the transaction.
+
+        Args:
+            signature: Transaction signature
+
+        Returns:
+            The transfer, or None if the transaction is not found (yet)
+
+        Raises:
+            SolanaRpcError: If the transaction could not be fetched from any RPC endpoint
+        """
+        cached = self._cache.get(signature)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        future = self._in_flight.get(signature)
+        if future is None:
+            future = self._in_flight[signature] = asyncio.get_running_loop().create_future()
+            self._schedule(signature)
+        # Shielded, so a cancelled caller doesn't cancel the lookup of the others waiting for it
+        return await asyncio.shield(future)
+
+    def _schedule(self, signature: str) -> None:
+        self._pending.append(signature)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window_seconds, self._flush)
+
+    def _flush(self) -> None:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        signatures, self._pending = self._pending, []
+        if signatures:
+            task = asyncio.ensure_future(self._fetch_batch(signatures))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _fetch_batch(self, signatures: List[str]) -> None:
+        try:
+            tx_sigs = [Signature.from_string(signature) for signature in signatures]
+            responses = await self.rpc_pool.call(lambda client: _fetch_transactions(client, tx_sigs))
+            now = time.monotonic()
+            self._evict_expired(now)
+            for signature, response in zip(signatures, responses):
+                if response is None:
+                    self._resolve(signature, exception=SolanaRpcError("No response to the request in the batch"))
+                    continue
+                if not hasattr(response, "value"):
+                    # A batch can fail for some of its requests only, those get an RPC error message
+                    self._resolve(signature, exception=SolanaRpcError(str(response)))
+                    continue
+                transfer = self._to_transfer(response)  # type: ignore
+                if transfer is not None:
+                    # Not found transactions aren't cached, they may still get confirmed
+                    self._cache[signature] = (now + self.cache_ttl_seconds, transfer)
+                self._resolve(signature, result=transfer)
+        except Exception as e:
+            for signature in signatures:
+                self._resolve(signature, exception=e)
+        # Resolves the signatures not handled above, when the batch has fewer responses than requests
+        for signature in signatures:
+            self._resolve(signature, result=None)
+
+    def _resolve(
+        self,
+        signature: str,
+        result: Optional[TransactionTransfer] = None,
+        exception: Optional[BaseException] = None,
+    ) -> None:
+        future = self._in_flight.pop(signature, None)
+        if future is None or future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [signature for signature, (expires_at, _) in self._cache.items() if expires_at <= now]
+        for signature in expired:
+            del self._cache[signature]
+
+    def _to_transfer(self, response: GetTransactionResp) -> Optional[TransactionTransfer]:
+        tx_info = response.value
+        if not tx_info:
+            return None
+        block_time = tx_info.block_time
+        transaction = tx_info.transaction.transaction  # The actual transaction
+        account_keys = transaction.message.account_keys  # type: ignore
+        index = _get_key_index(account_keys, self.wallet_key)  # type: ignore
+        meta = tx_info.transaction.meta
+        if index < 0 or meta is None or meta.err is not None:
+            return TransactionTransfer(amount_lamport=0, block_time=block_time)
+        amount_sent = meta.post_balances[index] - meta.pre_balances[index]
+        return TransactionTransfer(amount_lamport=amount_sent, block_time=block_time)
+
+
+async def _fetch_transactions(
+    client: AsyncClient, tx_sigs: List[Signature]
+) -> List[Optional[Union[GetTransactionResp, RPCError]]]:
+    """Fetch transactions, several of them in a single batched JSON-RPC request.
+
+    Returns:
+        The responses in the order of the signatures, an RPC error for failed requests and None for
+        requests the batch response has no answer to
+    """
+    if len(tx_sigs) == 1:
+        return [
+            await client.get_transaction(
+                tx_sig=tx_sigs[0], max_supported_transaction_version=MAX_SUPPORTED_TRANSACTION_VERSION
+            )
+        ]
+    config = RpcTransactionConfig(
+        encoding=UiTransactionEncoding.Json,
+        max_supported_transaction_version=MAX_SUPPORTED_TRANSACTION_VERSION,
+    )
+    requests = tuple(GetTransaction(tx_sig, config, id=i) for i, tx_sig in enumerate(tx_sigs))
+    raw = await _send_batch_request(client, requests)
+    return _parse_batch_response(raw, len(requests))
+
+
+async def _send_batch_request(client: AsyncClient, requests: Tuple[GetTransaction, ...]) -> str:
+    """Send a batched JSON-RPC request and return the raw response body.
+
+    AsyncClient has no public API for batches, this is the only place relying on the internals of
+    solana-py, see test_transaction_lookup for the tests against them.
+    """
+    return await client._provider.make_batch_request_unparsed(requests)  # pylint: disable=protected-access
+
+
+def _parse_batch_response(raw: str, request_count: int) -> List[Optional[Union[GetTransactionResp, RPCError]]]:
+    """Parse the responses of a batch of requests with the ids 0 to request_count - 1, in the order of the requests.
+
+    Batch responses may come in any order, they are matched to the requests by id. Errors without an id,
+    for requests the node couldn't read, are returned for the requests that got no other response.
+    """
+    responses: Dict[int, Any] = {}
+    error_without_id = None
+    for response in json.loads(raw):
+        response_id = response.get("id")
+        if isinstance(response_id, int):
+            responses[response_id] = response
+        elif "error" in response:
+            error_without_id = response
+    parsed: List[Optional[Union[GetTransactionResp, RPCError]]] = []
+    for request_id in range(request_count):
+        response = responses.get(request_id, error_without_id)
+        parsed.append(None if response is None else GetTransactionResp.from_json(json.dumps(response)))
+    return parsed
+
+
+def _get_key_index(account_keys: List[Pubkey], wallet_key: Pubkey) -> int:
+    """
+    Returns the index of the wallet address
+    :param account_keys:
+    :param wallet_key:
+    :return: non-zero number if present, -1 otherwise
+    """
+    for i, key in enumerate(account_keys):
+        if wallet_key == key:
+            return i
+    return -1
@@ -1,12 +1,14 @@
 from dataclasses import dataclass
 import re
 import time
-from typing import List, Optional, Set
+from typing import List, Optional
 
-from solana.rpc.async_api import AsyncClient
-from solders.pubkey import Pubkey  # pylint: disable=E0401
 from solders.signature import Signature  # pylint: disable=E0401
 
+from galadriel.connectors.solana_rpc import SolanaRpcPool
+from galadriel.domain.spent_signature_store import SpentSignatureStore
+from galadriel.domain.spent_signature_store import SqliteSpentSignatureStore
+from galadriel.domain.transaction_lookup import TransactionLookup
 from galadriel.entities import Message
 from galadriel.entities import Pricing
 from galadriel.errors import PaymentValidationError
@@ -24,16 +26,46 @@ class TaskAndPaymentSignatureResponse(TaskAndPaymentSignature):
 
 
 class SolanaPaymentValidator:
-    def __init__(self, pricing: Pricing):
+    def __init__(
+        self,
+        pricing: Pricing,
+        rpc_urls: Optional[List[str]] = None,
+        spent_signature_store: Optional[SpentSignatureStore] = None,
+    ):
+        """
+        Args:
+            pricing: Pricing configuration, containing the wallet address and payment amount required
+            rpc_urls: Solana RPC endpoints, in order of preference. Defaults to the SOLANA_RPC_URLS
+                environment variable, or the public mainnet endpoint.
+            spent_signature_store: Store of already used payment signatures, to avoid duplications.
+                Defaults to a SQLite database on disk, at the SPENT_SIGNATURES_DATABASE_PATH environment
+                variable or data/spent_signatures.sqlite in the working directory.
+        """
         self.pricing = pricing
-        self.existing_payments: Set[str] = set()
-        self.http_client = AsyncClient("https://api.mainnet-beta.solana.com")
+        self._spent_signatures = spent_signature_store
+        self.rpc_pool = SolanaRpcPool(rpc_urls)
+        self._transaction_lookup: Optional[TransactionLookup] = None
+
+    @property
+    def spent_signatures(self) -> SpentSignatureStore:
+        """Store of the already used payment signatures.
+
+        The default store is created on first use, so agents without pricing don't create a database.
+        """
+        if self._spent_signatures is None:
+            self._spent_signatures = SqliteSpentSignatureStore()
+        return self._spent_signatures
+
+    @property
+    def transaction_lookup(self) -> TransactionLookup:
+        """Cached and batched lookup of the SOL transferred to the pricing wallet, created on first use."""
+        if self._transaction_lookup is None:
+            self._transaction_lookup = TransactionLookup(self.rpc_pool, self.pricing.wallet_address)
+        return self._transaction_lookup
 
     async def execute(self, request: Message) -> TaskAndPaymentSignatureResponse:
         """Validate the payment for the request.
             Args:
-            pricing: Pricing configuration, containing the wallet address and payment amount required
-            existing_payments: Already validated payments to avoid duplications
             request: The message containing the transaction signature
         Returns:
             The task to be executed
@@ -45,17 +77,17 @@ class SolanaPaymentValidator:
             raise PaymentValidationError(
                 "No transaction signature found in the message. Please include your payment transaction signature."
             )
-        if task_and_payment.signature in self.existing_payments:
-            raise PaymentValidationError(
-                f"Transaction {task_and_payment.signature} has already been used. Please submit a new payment."
-            )
+        if await self.spent_signatures.contains(task_and_payment.signature):
+            raise _get_signature_used_error(task_and_payment.signature)
         sol_transferred_lamport = await self._get_sol_amount_transferred(task_and_payment.signature)
         if sol_transferred_lamport < self.pricing.cost * 10**9:
             raise PaymentValidationError(
                 f"Payment validation failed for transaction {task_and_payment.signature}. "
                 f"Please ensure you've sent {self.pricing.cost} SOL to {self.pricing.wallet_address}"
             )
-        self.existing_payments.add(task_and_payment.signature)
+        # Claiming the signature is atomic, so concurrent validations of the same payment can't both pass
+        if not await self.spent_signatures.add(task_and_payment.signature):
+            raise _get_signature_used_error(task_and_payment.signature)
         return TaskAndPaymentSignatureResponse(
             task=task_and_payment.task,
             signature=task_and_payment.signature,
@@ -65,58 +97,35 @@ class SolanaPaymentValidator:
     async def _get_sol_amount_transferred(self, tx_signature: str) -> int:
         """
         Get the amount of SOL transferred in lamports for the given transaction signature.
-        This function includes a retry mechanism with exponential backoff to handle RPC rate limits.
+        Failed RPC calls are retried on the other configured endpoints and with backoff, to handle RPC rate limits.
+        Lookups are cached and batched with the concurrent ones, see TransactionLookup.
         """
-        tx_sig = Signature.from_string(tx_signature)
-        max_retries = 3
-        delay = 1.0  # initial delay in seconds
-
-        for attempt in range(max_retries):
-            try:
-                tx_info = await self.http_client.get_transaction(tx_sig=tx_sig, max_supported_transaction_version=10)
-                break  # Successful call, exit the retry loop.
-            except Exception as e:
-                # If we've not reached the final attempt, wait and retry.
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-                    delay *= 2  # Exponential backoff.
-                else:
-                    raise PaymentValidationError(
-                        f"RPC error on transaction validation: {str(e)}. "
-                        f"Consider switching to an RPC endpoint with higher rate limits."
-                    )
+        try:
+            transfer = await self.transaction_lookup.get_transfer(tx_signature)
+        except Exception as e:
+            raise PaymentValidationError(
+                f"RPC error on transaction validation: {str(e)}. "
+                f"Consider switching to an RPC endpoint with higher rate limits."
+            )
         # If the transaction data is not available, return 0.
-        if not tx_info.value:
+        if not transfer:
             return 0
-
-        transaction = tx_info.value.transaction.transaction  # The actual transaction
-        account_keys = transaction.message.account_keys  # type: ignore
-        index = _get_key_index(account_keys, self.pricing.wallet_address)  # type: ignore
-        if index < 0:
-            return 0
-
-        meta = tx_info.value.transaction.meta
-        if meta.err is not None:  # type: ignore
-            return 0
-
-        pre_balance = meta.pre_balances[index]  # type: ignore
-        post_balance = meta.post_balances[index]  # type: ignore
-        amount_sent = post_balance - pre_balance
-        return amount_sent
+        # Signatures are only remembered for the max payment age, older payments could be replayed.
+        # Without a block time the age is unknown, so the payment can't be accepted either.
+        if transfer.block_time is None:
+            raise PaymentValidationError(
+                f"Transaction {tx_signature} has no block time yet, its age can't be validated. "
+                f"Please retry once the transaction is finalized."
+            )
+        if transfer.block_time < time.time() - self.spent_signatures.max_age_seconds:
+            raise PaymentValidationError(
+                f"Transaction {tx_signature} is too old to be used as a payment. Please submit a new payment."
+            )
+        return transfer.amount_lamport
 
 
-def _get_key_index(account_keys: List[Pubkey], wallet_address: str) -> int:
-    """
-    Returns the index of the wallet address
-    :param account_keys:
-    :param wallet_address:
-    :return: non-zero number if present, -1 otherwise
-    """
-    wallet_key = Pubkey.from_string(wallet_address)
-    for i, key in enumerate(account_keys):
-        if wallet_key == key:
-            return i
-    return -1
+def _get_signature_used_error(signature: str) -> PaymentValidationError:
+    return PaymentValidationError(f"Transaction {signature} has already been used. Please submit a new payment.")
 
 
 def _extract_transaction_signature(message: str) -> Optional[TaskAndPaymentSignature]:
@@ -1,22 +1,102 @@
+import atexit
+import copy
 import logging
 import os
+import queue
 from logging import DEBUG
 from logging import INFO
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from logging.handlers import TimedRotatingFileHandler
 from typing import Optional
 
 from pythonjsonlogger import jsonlogger
 
 from galadriel.domain.logs_exporter import LogsExportHandler
 from galadriel.proof.prover import Prover
+from galadriel.telemetry import metrics
 
 GALADRIEL_NODE_LOGGER = "galadriel"
 
 LOG_FILE_PATH = "logs/logs.log"
 LOGGING_MESSAGE_FORMAT = "%(asctime)s %(name)-12s %(levelname)s %(message)s"
 
+# Log file is rotated every hour or when it grows over the max size, whichever comes first
+LOG_FILE_ROTATION_INTERVAL = "H"
+LOG_FILE_MAX_BYTES = 100 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 1
+
+# Maximum number of log records waiting to be handled, new records are dropped when exceeded
+LOG_QUEUE_SIZE = 10_000
+
 logger: Optional[logging.Logger] = None
 
 
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue that drops records instead of blocking when the queue is full.
+
+    Records are handed over without being formatted, formatting happens on the listener thread.
+    Dropped records are counted in the metrics, and reported by a warning once the queue has room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped_records_count = 0
+        self._reported_dropped_records_count = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, they could be mutated before the listener gets to the record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_records_count += 1
+            metrics.LOG_RECORDS_DROPPED.inc()
+            return
+        self._report_dropped_records()
+
+    def _report_dropped_records(self) -> None:
+        dropped_records_count = self.dropped_records_count
+        if dropped_records_count <= self._reported_dropped_records_count:
+            return
+        warning = logging.LogRecord(
+            GALADRIEL_NODE_LOGGER,
+            logging.WARNING,
+            __file__,
+            0,
+            f"Log queue is full, dropped {dropped_records_count - self._reported_dropped_records_count} "
+            f"log records ({dropped_records_count} in total)",
+            None,
+            None,
+        )
+        try:
+            self.queue.put_nowait(warning)
+        except queue.Full:
+            return
+        self._reported_dropped_records_count = dropped_records_count
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """File handler rotating the file on a time interval and also when it exceeds max_bytes."""
+
+    def __init__(self, filename: str, max_bytes: int, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if super().shouldRollover(record):
+            return 1
+        if self.max_bytes > 0 and self.stream is not None:
+            if self.stream.tell() >= self.max_bytes:
+                return 1
+        return 0
+
+
 def init_logging(prover: Optional[Prover], debug: bool):
     global logger  # pylint:disable=W0603
     if logger:
@@ -25,22 +105,41 @@ def init_logging(prover: Optional[Prover], debug: bool):
     file_handler = _get_file_logger()
     console_handler = _get_console_logger()
     logger = logging.getLogger()
-    logs_exports_handler = LogsExportHandler(logger, prover)
-    logger.setLevel(log_level)
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(logs_exports_handler)
+    logs_exports_handler = LogsExportHandler(
+        logger,
+        prover,
+        batch_signing=os.getenv("LOG_EXPORT_BATCH_SIGNING", "").lower() == "true",
+    )
     apply_default_formatter(file_handler)
     apply_default_formatter(console_handler)
-    apply_default_formatter(logs_exports_handler)
+
+    # Formatting and I/O happen on the listener thread, logging only puts the record to the queue
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(
+        log_queue,
+        console_handler,
+        file_handler,
+        logs_exports_handler,
+        respect_handler_level=True,
+    )
+    logger.setLevel(log_level)
+    logger.addHandler(BoundedQueueHandler(log_queue))
     logger.propagate = False
 
+    listener.start()
+    # Flush the queued records on exit
+    atexit.register(listener.stop)
     logs_exports_handler.run()
 
 
 def _get_file_logger() -> logging.FileHandler:
     os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
-    file_handler = logging.FileHandler(LOG_FILE_PATH)
+    file_handler = SizedTimedRotatingFileHandler(
+        LOG_FILE_PATH,
+        max_bytes=LOG_FILE_MAX_BYTES,
+        when=LOG_FILE_ROTATION_INTERVAL,
+        backupCount=LOG_FILE_BACKUP_COUNT,
+    )
     file_handler.setLevel(logging.DEBUG)
     return file_handler
 
@@ -1,10 +1,13 @@
 from datetime import datetime
+import asyncio
+import copy
 import os
 from typing import Dict, List, Optional
 
 from langchain_openai import OpenAIEmbeddings
 
 from galadriel.entities import Message
+from galadriel.telemetry.tracing import traced
 import faiss
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
@@ -39,11 +42,17 @@ class MemoryStore:
         self.embedding_model = embedding_model
         self.short_term_memory = []  # type: ignore
         self.short_term_memory_limit = short_term_memory_limit
+        # Number of memories written to long-term storage, used to detect changes since the last checkpoint
+        self.long_term_memory_count = 0
+        # Held while a memory is written to long-term storage and while the vector store is swapped,
+        # so a memory is never written to a vector store that is being replaced
+        self._vector_store_lock = asyncio.Lock()
         # Initialize long-term memory only if both api_key and embedding_model are provided
         self.vector_store = None
         if api_key and embedding_model:
             self.vector_store = self._initialize_vector_database(embedding_model, api_key)  # type: ignore
 
+    @traced("memory.add")
     async def add_memory(self, request: Message, response: Message) -> None:
         """Add a new memory from a request-response interaction.
 
@@ -74,8 +83,11 @@ class MemoryStore:
                     page_content=oldest_memory.content,
                     metadata=_metadata,  # this metadata is used for filtering in query_long_term_memory
                 )
-                await self.vector_store.aadd_documents(documents=[vector_document], ids=[oldest_memory.id])
+                async with self._vector_store_lock:
+                    await self.vector_store.aadd_documents(documents=[vector_document], ids=[oldest_memory.id])
+                    self.long_term_memory_count += 1
 
+    @traced("memory.get")
     async def get_memories(self, prompt: str, top_k: int = 2, filter: Optional[Dict[str, str]] = None) -> str:
         """Retrieve relevant memories based on a prompt.
 
@@ -151,12 +163,46 @@ class MemoryStore:
     def load_memory_from_folder(self, folder_path: str) -> None:
         """Load the vector store from a local folder.
 
+        Memories already written to long-term memory are merged into the loaded vector store.
+
+        Args:
+            folder_path: Path to the folder containing the vector store
+        """
+        if not self.api_key or not self.embedding_model:
+            raise RuntimeError("Long-term memory is not enabled. Provide api_key and embedding_model to enable it.")
+        vector_store = self._initialize_vector_database(self.embedding_model, self.api_key, folder_path)
+        self._swap_vector_store(vector_store)
+
+    async def aload_memory_from_folder(self, folder_path: str) -> None:
+        """Load the vector store from a local folder without blocking the event loop.
+
+        The folder is deserialized in a worker thread while the current vector store keeps serving
+        queries with the most recent memories. Once loaded, and once the memories being written have been
+        added, those recent memories are merged into the loaded vector store and it replaces the current one
+        in a single step.
+
         Args:
             folder_path: Path to the folder containing the vector store
         """
         if not self.api_key or not self.embedding_model:
             raise RuntimeError("Long-term memory is not enabled. Provide api_key and embedding_model to enable it.")
-        self.vector_store = self._initialize_vector_database(self.embedding_model, self.api_key, folder_path)
+        vector_store = await asyncio.to_thread(
+            self._initialize_vector_database, self.embedding_model, self.api_key, folder_path
+        )
+        async with self._vector_store_lock:
+            self._swap_vector_store(vector_store)
+
+    def _swap_vector_store(self, vector_store: Optional[FAISS]) -> None:
+        """Replace the current vector store, keeping the memories it already contains.
+
+        Args:
+            vector_store: The vector store to swap in. If None, the current vector store is kept.
+        """
+        if vector_store is None:
+            return
+        if self.vector_store and self.vector_store.index.ntotal:
+            vector_store.merge_from(self.vector_store)
+        self.vector_store = vector_store
 
     def save_data_locally(self, folder_path: str) -> None:
         """Save the vector store to a local folder.
@@ -171,6 +217,34 @@ class MemoryStore:
             raise RuntimeError("Long-term memory is not enabled. Cannot save vector store.")
         self.vector_store.save_local(folder_path)
 
+    def snapshot(self) -> "MemoryStore":
+        """Create a point-in-time copy of the memory store.
+
+        Only the index and the containers holding the documents are copied, which is much cheaper than
+        serializing them. The copy can then be saved from another thread while new memories keep being
+        added to this store.
+
+        Returns:
+            A copy of this memory store that does not share mutable state with it
+
+        Raises:
+            RuntimeError: If long-term memory is not enabled
+        """
+        if not self.vector_store:
+            raise RuntimeError("Long-term memory is not enabled. Cannot snapshot vector store.")
+        snapshot = copy.copy(self)
+        snapshot.short_term_memory = list(self.short_term_memory)
+        snapshot.vector_store = FAISS(
+            embedding_function=self.vector_store.embedding_function,
+            index=faiss.clone_index(self.vector_store.index),
+            docstore=InMemoryDocstore(dict(self.vector_store.docstore._dict)),  # type: ignore
+            index_to_docstore_id=dict(self.vector_store.index_to_docstore_id),
+            relevance_score_fn=self.vector_store.override_relevance_score_fn,
+            normalize_L2=self.vector_store._normalize_L2,
+            distance_strategy=self.vector_store.distance_strategy,
+        )
+        return snapshot
+
     def _initialize_vector_database(
         self, embedding_model: str, api_key: str, folder_path: Optional[str] = None
     ) -> FAISS:
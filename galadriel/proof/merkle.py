@@ -0,0 +1,74 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+LEFT = "left"
+RIGHT = "right"
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    """Hash two sibling nodes into their parent node.
+
+    The 0x01 prefix separates inner nodes from leaves, so a leaf can never be
+    presented as an inner node.
+    """
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def build_merkle_tree(leaves: List[bytes]) -> Tuple[bytes, List[List[Dict[str, str]]]]:
+    """Build a Merkle tree over leaf hashes.
+
+    A node without a sibling is promoted to the next level unchanged.
+
+    Args:
+        leaves: Leaf hashes, in order
+
+    Returns:
+        The root hash and, for every leaf, its inclusion proof: the sibling hashes from the
+        leaf up to the root together with the side the sibling is on.
+
+    Raises:
+        ValueError: If there are no leaves
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    proofs: List[List[Dict[str, str]]] = [[] for _ in leaves]
+    # Leaf indexes covered by each node of the current level
+    covered = [[i] for i in range(len(leaves))]
+    level = list(leaves)
+    while len(level) > 1:
+        next_level = []
+        next_covered = []
+        for i in range(0, len(level) - 1, 2):
+            left, right = level[i], level[i + 1]
+            for leaf_index in covered[i]:
+                proofs[leaf_index].append({"position": RIGHT, "hash": right.hex()})
+            for leaf_index in covered[i + 1]:
+                proofs[leaf_index].append({"position": LEFT, "hash": left.hex()})
+            next_level.append(hash_node(left, right))
+            next_covered.append(covered[i] + covered[i + 1])
+        if len(level) % 2:
+            next_level.append(level[-1])
+            next_covered.append(covered[-1])
+        level, covered = next_level, next_covered
+    return level[0], proofs
+
+
+def verify_inclusion(leaf: bytes, proof: List[Dict[str, str]], root: bytes) -> bool:
+    """Check that a leaf hash is part of the tree with the given root.
+
+    Args:
+        leaf: The leaf hash
+        proof: Inclusion proof of the leaf, as returned by build_merkle_tree
+        root: The root hash of the tree
+
+    Returns:
+        True if the proof leads from the leaf to the root
+    """
+    node = leaf
+    for sibling in proof:
+        sibling_hash = bytes.fromhex(sibling["hash"])
+        if sibling["position"] == LEFT:
+            node = hash_node(sibling_hash, node)
+        else:
+            node = hash_node(node, sibling_hash)
+    return node == root
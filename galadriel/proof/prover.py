@@ -10,6 +10,7 @@ from cryptography.hazmat.primitives import serialization
 
 from galadriel.entities import GALADRIEL_API_BASE_URL, Message, Proof
 from galadriel.docker.galadriel_base_image.enclave_services.nsm_util import NSMUtil
+from galadriel.telemetry.tracing import traced
 
 PRIVATE_KEY_PATH = "/private_key.pem"
 PUBLIC_KEY_PATH = "/public_key.pem"
@@ -31,6 +32,7 @@ class Prover:
             )
         self.nsm_util = NSMUtil()
 
+    @traced("proof.generate")
     async def generate_proof(self, request: Message, response: Message) -> Proof:
         try:
             # Hash data
@@ -65,6 +67,7 @@ class Prover:
     def hash(self, value: str) -> bytes:
         return hashlib.sha256(value.encode("utf-8")).digest()
 
+    @traced("proof.publish")
     async def publish_proof(self, request: Message, response: Message, proof: Proof) -> bool:
         url = urljoin(GALADRIEL_API_BASE_URL, "/verified/chat/log")
         headers = {
@@ -0,0 +1,141 @@
+import asyncio
+import shutil
+import tempfile
+from typing import Optional
+
+from galadriel.domain.spent_signature_store import SpentSignatureStore
+from galadriel.logging_utils import get_agent_logger
+from galadriel.memory.memory_store import MemoryStore
+from galadriel.state.state_backend import StateBackend
+
+logger = get_agent_logger()
+
+DEFAULT_CHECKPOINT_INTERVAL_MINUTES: float = 15
+DEFAULT_CHECKPOINT_MEMORY_THRESHOLD: int = 50
+
+
+class CheckpointScheduler:
+    """Periodically persists the agent's long-term memory while the runtime is serving requests.
+
+    A checkpoint is taken every `interval_minutes`, or earlier once `memory_threshold` new memories
+    have been written to long-term storage. The memory store is snapshotted on the event loop, then the
+    snapshot is serialized in a worker thread and uploaded asynchronously, so requests keep being
+    processed meanwhile.
+    Checkpoints are skipped when nothing changed since the previous one. The spent payment signatures
+    are part of the checkpoints when a store of them is given.
+    """
+
+    def __init__(
+        self,
+        memory_store: MemoryStore,
+        agent_state_repository: StateBackend,
+        interval_minutes: float = DEFAULT_CHECKPOINT_INTERVAL_MINUTES,
+        memory_threshold: int = DEFAULT_CHECKPOINT_MEMORY_THRESHOLD,
+        spent_signature_store: Optional[SpentSignatureStore] = None,
+    ):
+        """Initialize the CheckpointScheduler.
+
+        Args:
+            memory_store: Memory store to checkpoint
+            agent_state_repository: Repository the checkpoints are uploaded to
+            interval_minutes: Maximum time between two checkpoints
+            memory_threshold: Number of new long-term memories that triggers a checkpoint early
+            spent_signature_store: Spent payment signatures to include in the checkpoints
+        """
+        self.memory_store = memory_store
+        self.agent_state_repository = agent_state_repository
+        self.interval_minutes = interval_minutes
+        self.memory_threshold = memory_threshold
+        self.spent_signature_store = spent_signature_store
+        self.checkpointed_memory_count = 0
+        self.checkpointed_signature_change_count = 0
+        self._wake_up = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Optional[asyncio.Future] = None
+
+    def start(self) -> None:
+        """Start the background checkpoint loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background checkpoint loop and wait for a running upload to finish."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight and not self._in_flight.done():
+            await asyncio.wait([self._in_flight])
+
+    def is_dirty(self) -> bool:
+        """Check whether long-term memory or spent signatures changed since the last successful checkpoint."""
+        if self.spent_signature_store and (
+            self.spent_signature_store.change_count != self.checkpointed_signature_change_count
+        ):
+            return True
+        return self.memory_store.long_term_memory_count != self.checkpointed_memory_count
+
+    def on_memory_added(self) -> None:
+        """Notify the scheduler about a new memory, triggering a checkpoint once the threshold is reached."""
+        if self.memory_store.long_term_memory_count - self.checkpointed_memory_count >= self.memory_threshold:
+            self._wake_up.set()
+
+    def mark_checkpointed(self, memory_count: int, signature_change_count: Optional[int] = None) -> None:
+        """Record that the memory store was persisted up to `memory_count` long-term memories.
+
+        Args:
+            memory_count: Number of long-term memories persisted
+            signature_change_count: Change count of the spent signature store when it was persisted
+        """
+        self.checkpointed_memory_count = memory_count
+        if signature_change_count is not None:
+            self.checkpointed_signature_change_count = signature_change_count
+
+    async def checkpoint(self) -> Optional[str]:
+        """Snapshot the memory store and upload it in the background.
+
+        Returns:
+            The key of the uploaded state, or None if nothing changed or the upload failed
+        """
+        if not self.is_dirty():
+            logger.debug("Skipping checkpoint: no new memories since the last one")
+            return None
+        memory_count = self.memory_store.long_term_memory_count
+        signature_change_count = self.spent_signature_store.change_count if self.spent_signature_store else None
+        snapshot = self.memory_store.snapshot()
+        self._in_flight = asyncio.ensure_future(self._persist(snapshot, memory_count, signature_change_count))
+        # Shielded so that stopping the scheduler does not abandon an upload halfway through
+        return await asyncio.shield(self._in_flight)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake_up.wait(), timeout=self.interval_minutes * 60)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_up.clear()
+            try:
+                await self.checkpoint()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error("Failed to checkpoint agent state", exc_info=True)
+
+    async def _persist(
+        self, snapshot: MemoryStore, memory_count: int, signature_change_count: Optional[int]
+    ) -> Optional[str]:
+        folder_path = tempfile.mkdtemp(prefix="agent_state_checkpoint_")
+        try:
+            await asyncio.to_thread(snapshot.save_data_locally, folder_path)
+            if self.spent_signature_store:
+                await asyncio.to_thread(self.spent_signature_store.save_to_folder, folder_path)
+            key = await self.agent_state_repository.upload_agent_state(folder_path)
+            if key:
+                self.mark_checkpointed(memory_count, signature_change_count)
+                logger.info(f"Checkpointed agent state with key {key}")
+            return key
+        finally:
+            shutil.rmtree(folder_path, ignore_errors=True)
@@ -0,0 +1,32 @@
+from abc import ABC
+from abc import abstractmethod
+from typing import Optional
+
+from galadriel.entities import AgentState
+
+
+class StateBackend(ABC):
+    """Interface for persisting and restoring snapshots of the agent state."""
+
+    @abstractmethod
+    async def download_agent_state(self, key: Optional[str] = None) -> Optional[AgentState]:
+        """Download an agent state folder to a local directory.
+
+        Args:
+            key: (Optional) The key of the state to download. If None, the latest version will be fetched.
+
+        Returns:
+            AgentState if successful, None if there is no state or downloading failed.
+        """
+
+    @abstractmethod
+    async def upload_agent_state(self, local_folder_path: str, key: Optional[str] = None) -> Optional[str]:
+        """Upload an agent state folder and make it the latest version.
+
+        Args:
+            local_folder_path: Path to the folder to upload.
+            key: The key to use for the uploaded folder. If None, a timestamp will be used.
+
+        Returns:
+            The key of the uploaded folder, None if uploading failed.
+        """
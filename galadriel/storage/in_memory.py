@@ -0,0 +1,46 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from galadriel.storage.object_storage import DEFAULT_MAX_CONCURRENCY
+from galadriel.storage.object_storage import ObjectStorage
+
+
+class InMemoryStorage(ObjectStorage):
+    """ObjectStorage keeping objects in a dictionary, mainly for tests and load-testing.
+
+    Objects are lost when the process exits.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        super().__init__(max_concurrency)
+        self.objects: Dict[str, bytes] = {}
+
+    async def get_object(self, key: str) -> Optional[bytes]:
+        return self.objects.get(key)
+
+    async def put_object(self, key: str, data: bytes) -> None:
+        self.objects[key] = data
+
+    async def upload_file(self, local_path: str, key: str) -> None:
+        self.objects[key] = await asyncio.to_thread(_read_file, local_path)
+
+    async def download_file(self, key: str, local_path: str) -> None:
+        data = self.objects.get(key)
+        if data is None:
+            raise FileNotFoundError(f"Object {key} does not exist")
+        await asyncio.to_thread(_write_file, local_path, data)
+
+    async def list_keys(self, prefix: str) -> List[str]:
+        return sorted(key for key in self.objects if key.startswith(prefix))
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
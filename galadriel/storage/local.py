@@ -0,0 +1,77 @@
+import asyncio
+import os
+import shutil
+from typing import List, Optional
+
+from galadriel.storage.object_storage import DEFAULT_MAX_CONCURRENCY
+from galadriel.storage.object_storage import ObjectStorage
+
+
+class LocalStorage(ObjectStorage):
+    """ObjectStorage backed by a directory on the local filesystem.
+
+    Keys map to paths relative to `root_dir`. Useful for running and benchmarking
+    the state pipeline without AWS.
+    """
+
+    def __init__(self, root_dir: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """Initialize local storage.
+
+        Args:
+            root_dir: Directory the objects are stored in, created if missing
+            max_concurrency: Maximum number of objects transferred in parallel by folder operations
+        """
+        super().__init__(max_concurrency)
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    async def get_object(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, self._path(key))
+
+    async def put_object(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, self._path(key), data)
+
+    async def upload_file(self, local_path: str, key: str) -> None:
+        await asyncio.to_thread(_copy_file, local_path, self._path(key))
+
+    async def download_file(self, key: str, local_path: str) -> None:
+        await asyncio.to_thread(_copy_file, self._path(key), local_path)
+
+    async def list_keys(self, prefix: str) -> List[str]:
+        return await asyncio.to_thread(self._list_keys, prefix)
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        # Only walk the deepest directory that can contain matching keys
+        search_dir = self._path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.root_dir
+        keys: List[str] = []
+        for root, _, files in os.walk(search_dir):
+            for file in files:
+                key = os.path.relpath(os.path.join(root, file), self.root_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root_dir, key))
+        if os.path.commonpath([path, os.path.abspath(self.root_dir)]) != os.path.abspath(self.root_dir):
+            raise ValueError(f"Key {key} points outside of the storage directory")
+        return path
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _copy_file(source: str, destination: str) -> None:
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    shutil.copyfile(source, destination)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+from abc import ABC
+from abc import abstractmethod
+from functools import partial
+from typing import Awaitable, Callable, List, Optional
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class ObjectStorage(ABC):
+    """Async interface to a flat object store, such as an S3 bucket or a local directory.
+
+    Objects are addressed by "/" separated keys. Folder operations transfer their objects
+    concurrently, at most `max_concurrency` at a time.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """Initialize the object storage.
+
+        Args:
+            max_concurrency: Maximum number of objects transferred in parallel by folder operations
+        """
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    async def get_object(self, key: str) -> Optional[bytes]:
+        """Read an object.
+
+        Args:
+            key: Key of the object
+
+        Returns:
+            The object's content, or None if the object does not exist
+        """
+
+    @abstractmethod
+    async def put_object(self, key: str, data: bytes) -> None:
+        """Write an object, replacing it if it already exists.
+
+        Args:
+            key: Key of the object
+            data: Content of the object
+        """
+
+    @abstractmethod
+    async def upload_file(self, local_path: str, key: str) -> None:
+        """Upload a local file as an object.
+
+        Args:
+            local_path: Path of the file to upload
+            key: Key of the object
+        """
+
+    @abstractmethod
+    async def download_file(self, key: str, local_path: str) -> None:
+        """Download an object to a local file, creating parent directories as needed.
+
+        Args:
+            key: Key of the object
+            local_path: Path where the file should be saved
+        """
+
+    @abstractmethod
+    async def list_keys(self, prefix: str) -> List[str]:
+        """List the keys of all objects starting with a prefix.
+
+        Args:
+            prefix: Prefix of the keys to list
+
+        Returns:
+            List of matching keys
+        """
+
+    async def upload_folder(self, local_folder: str, prefix: str) -> List[str]:
+        """Upload all files of a local folder while maintaining directory structure.
+
+        Args:
+            local_folder: The source folder on the local system
+            prefix: Key prefix the files are uploaded under
+
+        Returns:
+            List of uploaded keys
+        """
+        uploads = []
+        for root, _, files in os.walk(local_folder):
+            for file in files:
+                local_path = os.path.join(root, file)
+                relative_path = os.path.relpath(local_path, local_folder)
+                uploads.append((local_path, f"{prefix.rstrip('/')}/{relative_path}"))
+        await self._run_concurrently([partial(self.upload_file, local_path, key) for local_path, key in uploads])
+        return [key for _, key in uploads]
+
+    async def download_folder(self, prefix: str, local_folder: str) -> List[str]:
+        """Download all objects under a prefix while maintaining directory structure.
+
+        Args:
+            prefix: Key prefix of the objects to download
+            local_folder: The destination folder on the local system
+
+        Returns:
+            List of downloaded keys
+        """
+        os.makedirs(local_folder, exist_ok=True)
+        keys = await self.list_keys(prefix)
+        await self._run_concurrently(
+            [partial(self.download_file, key, os.path.join(local_folder, os.path.relpath(key, prefix))) for key in keys]
+        )
+        return keys
+
+    async def _run_concurrently(self, operations: List[Callable[[], Awaitable]]) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run(operation: Callable[[], Awaitable]) -> None:
+            async with semaphore:
+                await operation()
+
+        await asyncio.gather(*(_run(operation) for operation in operations))
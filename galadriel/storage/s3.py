@@ -1,13 +1,92 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from functools import partial
+from typing import Any, List, Optional
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from galadriel.logging_utils import get_agent_logger
+from galadriel.storage.object_storage import DEFAULT_MAX_CONCURRENCY
+from galadriel.storage.object_storage import ObjectStorage
 
 logger = get_agent_logger()
 
+# Upper bound of concurrent S3 requests, shared by all S3Storage instances
+S3_MAX_POOL_CONNECTIONS = 32
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """Get the process-wide boto3 S3 client.
+
+    boto3 clients are thread-safe, so a single client with a connection pool sized for
+    concurrent transfers is shared instead of creating a client (and pool) per user.
+    """
+    return boto3.client("s3", config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+
+
+@lru_cache(maxsize=None)
+def _get_s3_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=S3_MAX_POOL_CONNECTIONS, thread_name_prefix="s3")
+
+
+class S3Storage(ObjectStorage):
+    """ObjectStorage backed by an S3 bucket.
+
+    The blocking boto3 calls run in a dedicated thread pool sized to the client's connection pool,
+    so they never block the event loop.
+    """
+
+    def __init__(self, bucket_name: str, client: Optional[Any] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """Initialize S3 storage.
+
+        Args:
+            bucket_name: Name of the S3 bucket to use
+            client: Optional boto3 S3 client. Defaults to the shared client.
+            max_concurrency: Maximum number of objects transferred in parallel by folder operations
+        """
+        super().__init__(max_concurrency)
+        self.bucket_name = bucket_name
+        self.client = client or get_s3_client()
+
+    async def get_object(self, key: str) -> Optional[bytes]:
+        try:
+            response = await self._run(self.client.get_object, Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return await self._run(response["Body"].read)
+
+    async def put_object(self, key: str, data: bytes) -> None:
+        await self._run(self.client.put_object, Bucket=self.bucket_name, Key=key, Body=data)
+
+    async def upload_file(self, local_path: str, key: str) -> None:
+        await self._run(self.client.upload_file, local_path, self.bucket_name, key)
+
+    async def download_file(self, key: str, local_path: str) -> None:
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        await self._run(self.client.download_file, self.bucket_name, key, local_path)
+
+    async def list_keys(self, prefix: str) -> List[str]:
+        return await self._run(self._list_keys, prefix)
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        keys: List[str] = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return keys
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_s3_executor(), partial(func, *args, **kwargs))
+
 
 class S3Client:
     def __init__(self, bucket_name: str):
@@ -16,7 +95,7 @@ class S3Client:
         Args:
             bucket_name: Name of the S3 bucket to use
         """
-        self.s3_client = boto3.client("s3")
+        self.storage = S3Storage(bucket_name)
         self.bucket_name = bucket_name
 
     async def upload_file(self, file_path: str, agent_name: str) -> Optional[str]:
@@ -35,7 +114,7 @@ class S3Client:
 
             s3_path = f"agents/{agent_name}/{filename}.json"
 
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_path)
+            await self.storage.upload_file(file_path, s3_path)
             logger.info(f"Successfully uploaded {file_path} to {s3_path}")
             return s3_path
 
@@ -57,7 +136,7 @@ class S3Client:
             True if successful, False if failed
         """
         try:
-            self.s3_client.download_file(self.bucket_name, s3_path, local_path)
+            await self.storage.download_file(s3_path, local_path)
             logger.info(f"Successfully downloaded {s3_path} to {local_path}")
             return True
 
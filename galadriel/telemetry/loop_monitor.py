@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry import metrics
+
+logger = get_agent_logger()
+
+# Callbacks holding the event loop for longer than this are reported as blocking
+DEFAULT_BLOCKING_THRESHOLD_SECONDS = 0.1
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.05
+# Innermost frames kept of a blocking stack, the outer ones are the same asyncio machinery every time
+MAX_STACK_DEPTH = 15
+# Number of offenders listed when the monitor stops
+REPORTED_OFFENDERS_COUNT = 5
+
+Stack = Tuple[str, ...]
+
+
+class EventLoopMonitor:
+    """Diagnostic detecting callbacks that block the event loop.
+
+    A heartbeat task sleeps for sample_interval_seconds in a loop and measures how late it wakes up,
+    which is the event-loop lag. A watchdog thread notices when the heartbeat is late by more than
+    threshold_seconds and captures the stack of the event-loop thread at that moment, which is the
+    stack of the blocking call. Blocking stacks are logged and aggregated into a report of offenders.
+    """
+
+    def __init__(
+        self,
+        threshold_seconds: float = DEFAULT_BLOCKING_THRESHOLD_SECONDS,
+        sample_interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS,
+    ):
+        self.threshold_seconds = threshold_seconds
+        self.sample_interval_seconds = sample_interval_seconds
+        # Sequence number and monotonic time of the latest heartbeat, assigned together
+        self._beat: Tuple[int, float] = (0, time.monotonic())
+        self._captured_stack: Optional[Tuple[int, Stack]] = None
+        self._offenders: Dict[Stack, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self._heartbeat_task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop monitoring and log the worst offenders."""
+        if not self._heartbeat_task:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+        self._log_report()
+
+    def get_report(self) -> List[Dict]:
+        """Blocking stacks seen so far, the one that blocked the loop for the longest in total first.
+
+        Returns:
+            List of dicts with the stack (innermost frame last), the number of times it blocked the
+            loop, the total and the longest blocking time in milliseconds
+        """
+        with self._lock:
+            offenders = [{"stack": list(stack), **stats} for stack, stats in self._offenders.items()]
+        return sorted(offenders, key=lambda offender: offender["total_ms"], reverse=True)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            sequence, _ = self._beat
+            started = time.monotonic()
+            self._beat = (sequence + 1, started)
+            await asyncio.sleep(self.sample_interval_seconds)
+            lag = max(0.0, time.monotonic() - started - self.sample_interval_seconds)
+            metrics.EVENT_LOOP_LAG.observe(lag)
+            if lag >= self.threshold_seconds:
+                self._record_blocking(sequence + 1, lag)
+
+    def _watch(self) -> None:
+        check_interval = min(self.sample_interval_seconds, self.threshold_seconds / 2)
+        while not self._stopped.wait(check_interval):
+            sequence, beat_time = self._beat
+            is_late = time.monotonic() - beat_time - self.sample_interval_seconds >= self.threshold_seconds
+            already_captured = self._captured_stack is not None and self._captured_stack[0] == sequence
+            if is_late and not already_captured:
+                frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+                if frame is not None:
+                    self._captured_stack = (sequence, _format_stack(frame))
+
+    def _record_blocking(self, sequence: int, lag: float) -> None:
+        metrics.EVENT_LOOP_BLOCKS.inc()
+        captured = self._captured_stack
+        if captured is None or captured[0] != sequence:
+            # Blocked for too short to be caught by the watchdog
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+            return
+        stack = captured[1]
+        lag_ms = lag * 1000
+        with self._lock:
+            stats = self._offenders.setdefault(stack, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += lag_ms
+            stats["max_ms"] = max(stats["max_ms"], lag_ms)
+        logger.warning(f"Event loop blocked for {lag_ms:.0f} ms by:\n" + "\n".join(stack))
+
+    def _log_report(self) -> None:
+        report = self.get_report()
+        if not report:
+            logger.info("No blocking calls detected on the event loop")
+            return
+        lines = [f"Event loop was blocked by {len(report)} different call stacks, the worst ones:"]
+        for offender in report[:REPORTED_OFFENDERS_COUNT]:
+            lines.append(
+                f"{offender['count']} times, {offender['total_ms']:.0f} ms in total, "
+                f"{offender['max_ms']:.0f} ms at most, at {offender['stack'][-1]}"
+            )
+        logger.warning("\n".join(lines))
+
+
+def _format_stack(frame) -> Stack:
+    frames = traceback.extract_stack(frame)[-MAX_STACK_DEPTH:]
+    return tuple(f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in frames)
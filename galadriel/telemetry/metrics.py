@@ -0,0 +1,329 @@
+import bisect
+import math
+import threading
+from abc import ABC
+from abc import abstractmethod
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from galadriel.telemetry.tracing import REQUEST_SPAN_NAME
+from galadriel.telemetry.tracing import STATUS_OK
+from galadriel.telemetry.tracing import Span
+from galadriel.telemetry.tracing import SpanExporter
+from galadriel.telemetry.tracing import get_tracer
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Agent requests take from milliseconds to minutes, the upper buckets cover long agent runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric(ABC):
+    """Base class of metrics in the Prometheus data model."""
+
+    type_name = ""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, label_values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, label_values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Lines of the metric values, without the HELP and TYPE lines."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing value, e.g. the number of processed requests."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. the number of requests in flight.
+
+    A gauge without labels can read its value from a function at scrape time instead.
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Optional[Callable[[], float]]) -> None:
+        if self.label_names:
+            raise ValueError("Only gauges without labels can read their value from a function")
+        self._function = function
+
+    def get(self, **labels: str) -> float:
+        if self._function is not None:
+            return float(self._function())
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self.get())}"]
+            except Exception:
+                # The source is gone or broken, leave the gauge out of this scrape
+                return []
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, e.g. request latencies in seconds."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: count per bucket (the last one is +Inf), sum of the observations
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            bucket_counts[index] += 1
+            total[0] += value
+
+    def get_count(self, **labels: str) -> int:
+        with self._lock:
+            values = self._values.get(self._label_values(labels))
+            return sum(values[0]) if values else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (bucket_counts, total) in values:
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (math.inf,), bucket_counts):
+                cumulative += count
+                labels = self._format_labels(key, ("le", _format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, label_names))  # type: ignore
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, label_names))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, description, label_names, buckets))  # type: ignore
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the process wide metrics registry."""
+    return _registry
+
+
+QUEUE_DEPTH = _registry.gauge("galadriel_queue_depth", "Number of requests waiting in the input queue")
+REQUESTS_IN_FLIGHT = _registry.gauge("galadriel_requests_in_flight", "Number of requests being processed")
+REQUEST_DURATION = _registry.histogram(
+    "galadriel_request_duration_seconds", "Time to process a request end to end", ["status"]
+)
+STAGE_DURATION = _registry.histogram(
+    "galadriel_stage_duration_seconds", "Time spent in each traced stage of a request", ["stage"]
+)
+FIRST_RESPONSE_LATENCY = _registry.histogram(
+    "galadriel_first_response_latency_seconds",
+    "Time from the start of a request to its first response message, the first tokens when streaming",
+)
+LLM_TOKENS = _registry.counter("galadriel_llm_tokens_total", "Number of LLM tokens used", ["type"])
+LLM_CALLS = _registry.counter(
+    "galadriel_llm_calls_total", "LLM completion call attempts by model and outcome", ["model", "outcome"]
+)
+LLM_ENDPOINT_CALLS = _registry.counter(
+    "galadriel_llm_endpoint_calls_total",
+    "LLM calls routed to each endpoint by outcome, cancelled calls lost to a hedged call",
+    ["endpoint", "outcome"],
+)
+LLM_HEDGED_CALLS = _registry.counter(
+    "galadriel_llm_hedged_calls_total", "Slow LLM calls also started on another endpoint"
+)
+LLM_CACHE_LOOKUPS = _registry.counter(
+    "galadriel_llm_cache_lookups_total",
+    "LLM completion cache lookups by result, coalesced calls waited for an identical call in flight",
+    ["result"],
+)
+LLM_COST = _registry.counter(
+    "galadriel_llm_cost_usd_total", "Estimated cost of the LLM tokens used, for models with known pricing", ["model"]
+)
+AGENT_STEP_TOKENS = _registry.histogram(
+    "galadriel_agent_step_tokens",
+    "Number of LLM tokens used by an agent step, input tokens grow with the memory and steps in the prompt",
+    ["type"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+AGENT_STEP_CACHED_INPUT_SHARE = _registry.histogram(
+    "galadriel_agent_step_cached_input_share",
+    "Share of the input tokens of an agent step read from the provider prompt cache",
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 1.0),
+)
+AGENT_STEPS = _registry.histogram(
+    "galadriel_agent_steps", "Number of steps of an agent run", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+)
+TOOL_CALL_DURATION = _registry.histogram(
+    "galadriel_tool_call_duration_seconds", "Duration of agent tool calls", ["tool", "status"]
+)
+RESPONSE_CACHE_LOOKUPS = _registry.counter(
+    "galadriel_response_cache_lookups_total", "Response cache lookups by result", ["result"]
+)
+LOG_RECORDS_DROPPED = _registry.counter(
+    "galadriel_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+PAYMENT_VALIDATIONS = _registry.counter(
+    "galadriel_payment_validations_total", "Payment validation results", ["outcome"]
+)
+PROOF_PUBLISH_FAILURES = _registry.counter(
+    "galadriel_proof_publish_failures_total", "Number of proofs that failed to be published"
+)
+SHORT_TERM_MEMORIES = _registry.gauge(
+    "galadriel_memory_store_short_term_memories", "Number of memories in the short-term memory"
+)
+LONG_TERM_MEMORIES = _registry.gauge(
+    "galadriel_memory_store_long_term_memories", "Number of memories in the long-term vector store"
+)
+
+EVENT_LOOP_LAG = _registry.histogram(
+    "galadriel_event_loop_lag_seconds",
+    "How late the event loop runs scheduled callbacks, sampled when event-loop monitoring is enabled",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKS = _registry.counter(
+    "galadriel_event_loop_blocks_total", "Number of times a callback blocked the event loop over the threshold"
+)
+
+
+class MetricsSpanExporter(SpanExporter):
+    """Turns finished spans into latency histograms, so traced stages need no separate timing."""
+
+    def export(self, span: Span) -> None:
+        seconds = (span.duration_ms or 0.0) / 1000
+        status = "ok" if span.status == STATUS_OK else "error"
+        if span.name == REQUEST_SPAN_NAME:
+            REQUEST_DURATION.observe(seconds, status=status)
+        elif span.name.startswith("tool."):
+            TOOL_CALL_DURATION.observe(seconds, tool=span.attributes.get("tool.name", span.name[5:]), status=status)
+        STAGE_DURATION.observe(seconds, stage=span.name)
+
+
+get_tracer().add_exporter(MetricsSpanExporter())
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+from typing import Any
+from typing import Optional
+from typing import Tuple
+
+from galadriel.logging_utils import get_agent_logger
+from galadriel.telemetry.loop_monitor import EventLoopMonitor
+from galadriel.telemetry.metrics import MetricsRegistry
+from galadriel.telemetry.metrics import PROMETHEUS_CONTENT_TYPE
+from galadriel.telemetry.metrics import get_registry
+from galadriel.telemetry.tracing import Tracer
+from galadriel.telemetry.tracing import get_tracer
+
+logger = get_agent_logger()
+
+DEFAULT_TELEMETRY_HOST = "127.0.0.1"
+# Host the telemetry server binds to, e.g. 0.0.0.0 so replicas can be scraped from other hosts
+TELEMETRY_HOST_ENV = "TELEMETRY_HOST"
+DEFAULT_TELEMETRY_PORT = 9464
+
+# Requests are tiny GETs, anything larger is not meant for this server
+MAX_REQUEST_LINE_LENGTH = 8 * 1024
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+class TelemetryServer:
+    """Minimal HTTP server exposing the agent telemetry on a local port.
+
+    Routes:
+        GET /metrics: all metrics in the Prometheus text exposition format
+        GET /latency: p50/p95/p99 latency in milliseconds of every traced stage
+        GET /traces: ids of the most recent traces, newest first
+        GET /traces/<trace_id>: spans of a single trace, the trace id of a request is its Message id
+        GET /blocking: call stacks that blocked the event loop, when event-loop monitoring is enabled
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: int = DEFAULT_TELEMETRY_PORT,
+        tracer: Optional[Tracer] = None,
+        registry: Optional[MetricsRegistry] = None,
+        event_loop_monitor: Optional[EventLoopMonitor] = None,
+    ):
+        """
+        Args:
+            host: Host to bind to, defaults to the TELEMETRY_HOST environment variable or loopback only
+            port: Port to bind to
+            tracer: Tracer of the traces served, defaults to the global one
+            registry: Registry of the metrics served, defaults to the global one
+            event_loop_monitor: Monitor of the blocking calls served, if event-loop monitoring is enabled
+        """
+        self.host = host or os.getenv(TELEMETRY_HOST_ENV) or DEFAULT_TELEMETRY_HOST
+        self.port = port
+        self.tracer = tracer or get_tracer()
+        self.registry = registry or get_registry()
+        self.event_loop_monitor = event_loop_monitor
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_REQUEST_LINE_LENGTH
+        )
+        logger.info(f"Telemetry server listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # Headers are not used, but have to be read before responding
+            while (await reader.readline()).strip():
+                pass
+            if len(request_line) < 2 or request_line[0] != "GET":
+                status, content_type, body = 405, "text/plain", b"Method Not Allowed"
+            else:
+                status, content_type, body = self.handle_get(request_line[1])
+            writer.write(_http_response(status, content_type, body))
+            await writer.drain()
+        except Exception:
+            logger.debug("Failed to handle telemetry request", exc_info=True)
+        finally:
+            writer.close()
+
+    def handle_get(self, path: str) -> Tuple[int, str, bytes]:
+        """Route a GET request.
+
+        Args:
+            path: Request path, query parameters are ignored
+
+        Returns:
+            The status code, content type and body of the response
+        """
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/metrics":
+            return 200, PROMETHEUS_CONTENT_TYPE, self.registry.render().encode("utf-8")
+        if path == "/latency":
+            return _json_response(self.tracer.latency_stats.get_stats())
+        if path == "/blocking" and self.event_loop_monitor:
+            return _json_response(self.event_loop_monitor.get_report())
+        if path == "/traces":
+            return _json_response(self.tracer.recent_traces.get_trace_ids())
+        if path.startswith("/traces/"):
+            spans = self.tracer.recent_traces.get_trace(path[len("/traces/") :])
+            if spans is not None:
+                return _json_response(spans)
+        return 404, "text/plain", b"Not Found"
+
+
+def _json_response(value: Any) -> Tuple[int, str, bytes]:
+    return 200, JSON_CONTENT_TYPE, json.dumps(value).encode("utf-8")
+
+
+def _http_response(status: int, content_type: str, body: bytes) -> bytes:
+    reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "")
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
@@ -0,0 +1,358 @@
+import functools
+import inspect
+import secrets
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from collections import defaultdict
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+# Number of most recent durations per span name the latency percentiles are computed over
+LATENCY_WINDOW_SIZE = 1024
+# Number of most recent traces kept for inspection
+MAX_TRACES = 256
+# Span name of the whole request, its trace id is the id of the request Message
+REQUEST_SPAN_NAME = "agent.request"
+
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("galadriel_current_span", default=None)
+# Lists of the tool calls being recorded, innermost last, see record_tool_calls
+_tool_call_recordings: ContextVar[Tuple[List["ToolCallRecord"], ...]] = ContextVar(
+    "galadriel_tool_call_recordings", default=()
+)
+
+
+def _new_id(num_bytes: int) -> str:
+    return secrets.token_hex(num_bytes)
+
+
+class Span:
+    """A timed operation within a trace.
+
+    Field names follow the OpenTelemetry span data model, so spans can be forwarded to an
+    OpenTelemetry exporter as is.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time: Optional[float] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent_span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_OK
+        # Wall clock timestamps in seconds, the duration is measured with a monotonic clock
+        self.start_time = start_time if start_time is not None else time.time()
+        self.end_time: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self._start_counter = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.attributes["exception.type"] = type(exception).__name__
+        self.attributes["exception.message"] = str(exception)
+
+    def end(self, end_time: Optional[float] = None) -> None:
+        if self.end_time is not None:
+            return
+        if end_time is None:
+            self.duration_ms = (time.perf_counter() - self._start_counter) * 1000
+            self.end_time = self.start_time + self.duration_ms / 1000
+        else:
+            self.end_time = end_time
+            self.duration_ms = (end_time - self.start_time) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter(ABC):
+    """Receives every finished span."""
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """Handle a finished span. Called on the thread that ended the span, so it must be quick."""
+
+
+class LatencyStatsExporter(SpanExporter):
+    """Keeps the latency distribution of every span name, e.g. of every stage of a request."""
+
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE):
+        self.window_size = window_size
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window_size))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._durations[span.name].append(span.duration_ms or 0.0)
+            self._counts[span.name] += 1
+            if span.status == STATUS_ERROR:
+                self._errors[span.name] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles in milliseconds per span name.
+
+        Percentiles are computed over the most recent window_size spans, the counts cover all of them.
+        """
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+        return {
+            name: {
+                "count": counts[name],
+                "errors": errors.get(name, 0),
+                "p50": get_percentile(values, 50),
+                "p95": get_percentile(values, 95),
+                "p99": get_percentile(values, 99),
+                "max": values[-1],
+            }
+            for name, values in sorted(durations.items())
+        }
+
+
+class RecentTracesExporter(SpanExporter):
+    """Keeps the spans of the most recent traces, to see where the time of a single request went."""
+
+    def __init__(self, max_traces: int = MAX_TRACES):
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+
+    def get_trace(self, trace_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                return None
+            return [span.to_dict() for span in sorted(spans, key=lambda s: s.start_time)]
+
+    def get_trace_ids(self) -> List[str]:
+        with self._lock:
+            return list(reversed(self._traces.keys()))
+
+
+class Tracer:
+    """Creates spans and hands them to the exporters once they end.
+
+    The span being executed is tracked in a context variable, so spans started while another span
+    is active, also in other coroutines of the same task, become its children.
+    """
+
+    def __init__(self, exporters: Optional[List[SpanExporter]] = None):
+        self.latency_stats = LatencyStatsExporter()
+        self.recent_traces = RecentTracesExporter()
+        self.exporters: List[SpanExporter] = [self.latency_stats, self.recent_traces]
+        self.exporters.extend(exporters or [])
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        """Add an exporter, e.g. one forwarding the spans to an OpenTelemetry collector."""
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Span]:
+        """Time the enclosed block as a span.
+
+        Args:
+            name: Name of the operation, latency stats are grouped by it
+            trace_id: Trace to start the span in. Defaults to the trace of the current span,
+                or a new trace if there is no current span.
+            attributes: Attributes of the span
+
+        Yields:
+            The started span
+        """
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent else _new_id(16)
+        parent_span_id = parent.span_id if parent and parent.trace_id == trace_id else None
+        span = Span(name, trace_id, parent_span_id=parent_span_id, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self._export(span)
+
+    def record_span(
+        self,
+        name: str,
+        start_time: float,
+        end_time: float,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        """Record an operation that has already finished as a child of the current span.
+
+        Args:
+            name: Name of the operation
+            start_time: Wall clock start time in seconds
+            end_time: Wall clock end time in seconds
+            attributes: Attributes of the span
+
+        Returns:
+            The recorded span
+        """
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else _new_id(16),
+            parent_span_id=parent.span_id if parent else None,
+            attributes=attributes,
+            start_time=start_time,
+        )
+        span.end(end_time)
+        self._export(span)
+        return span
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                # Tracing must never break the traced code
+                pass
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the process wide tracer."""
+    return _tracer
+
+
+def get_current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def traced(name: str) -> Callable:
+    """Decorator running every call of the function in a span with the given name.
+
+    Works with both regular and async functions.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().start_span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().start_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_tools(tools: Dict[str, Any]) -> None:
+    """Run every call of the given smolagents tools in a "tool.<tool name>" span.
+
+    The tool instances are instrumented in place, tools that are already instrumented are skipped.
+    """
+    for tool_name, tool in tools.items():
+        forward = getattr(tool, "forward", None)
+        if forward is None or getattr(forward, "_galadriel_traced", False):
+            continue
+        tool.forward = _trace_tool_forward(tool_name, forward)
+
+
+class ToolCallRecord(NamedTuple):
+    tool_name: str
+    duration_seconds: float
+
+
+@contextmanager
+def record_tool_calls() -> Iterator[List[ToolCallRecord]]:
+    """Collect the traced tool calls made within the block, recordings can be nested.
+
+    Code sharing the context, e.g. while the block awaits in the same task, is recorded too: keep the
+    block synchronous to record a part of a task only.
+    """
+    tool_calls: List[ToolCallRecord] = []
+    token = _tool_call_recordings.set(_tool_call_recordings.get() + (tool_calls,))
+    try:
+        yield tool_calls
+    finally:
+        _tool_call_recordings.reset(token)
+
+
+def _trace_tool_forward(tool_name: str, forward: Callable) -> Callable:
+    @functools.wraps(forward)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with get_tracer().start_span(f"tool.{tool_name}", attributes={"tool.name": tool_name}):
+                return forward(*args, **kwargs)
+        finally:
+            record = ToolCallRecord(tool_name, time.perf_counter() - started)
+            for tool_calls in _tool_call_recordings.get():
+                tool_calls.append(record)
+
+    wrapper._galadriel_traced = True  # type: ignore
+    return wrapper
+
+
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[int(index)]
@@ -0,0 +1,127 @@
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from smolagents import ActionStep
+
+from galadriel.telemetry import metrics
+
+
+@dataclass
+class StepUsage:
+    """LLM tokens and time used by one agent step."""
+
+    step_number: Optional[int]
+    input_tokens: int
+    output_tokens: int
+    duration_seconds: float
+    # Time spent in tool calls, the rest of the step is mostly the model generating
+    tool_seconds: float
+    # Input tokens read from the provider prompt cache, part of input_tokens
+    cached_input_tokens: int = 0
+
+    @property
+    def cached_input_share(self) -> float:
+        return self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+@dataclass
+class AgentUsage:
+    """LLM tokens, cost and time used by an agent run, step by step."""
+
+    model: Optional[str] = None
+    steps: List[StepUsage] = field(default_factory=list)
+    duration_seconds: float = 0.0
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(step.input_tokens for step in self.steps)
+
+    @property
+    def cached_input_tokens(self) -> int:
+        return sum(step.cached_input_tokens for step in self.steps)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(step.output_tokens for step in self.steps)
+
+    @property
+    def tool_seconds(self) -> float:
+        return sum(step.tool_seconds for step in self.steps)
+
+    @property
+    def cost_usd(self) -> Optional[float]:
+        """Estimated cost of the tokens, None if the pricing of the model is unknown."""
+        if not self.model:
+            return None
+        try:
+            import litellm
+
+            prompt_cost, completion_cost = litellm.cost_per_token(
+                model=self.model,
+                prompt_tokens=self.input_tokens,
+                completion_tokens=self.output_tokens,
+                cache_read_input_tokens=self.cached_input_tokens,
+            )
+        except Exception:
+            return None
+        return prompt_cost + completion_cost
+
+    def add_step(
+        self,
+        step_log: Any,
+        input_tokens: int,
+        output_tokens: int,
+        tool_seconds: float,
+        cached_input_tokens: int = 0,
+    ) -> None:
+        """Account a finished agent step, steps other than ActionSteps used no tokens of their own."""
+        if not isinstance(step_log, ActionStep):
+            return
+        self.steps.append(
+            StepUsage(
+                step_number=step_log.step_number,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                duration_seconds=step_log.duration or 0.0,
+                tool_seconds=tool_seconds,
+                cached_input_tokens=cached_input_tokens,
+            )
+        )
+
+    def record_metrics(self) -> None:
+        """Add the usage to the runtime metrics."""
+        for step in self.steps:
+            metrics.AGENT_STEP_TOKENS.observe(step.input_tokens, type="input")
+            metrics.AGENT_STEP_TOKENS.observe(step.output_tokens, type="output")
+            metrics.AGENT_STEP_TOKENS.observe(step.cached_input_tokens, type="cached_input")
+            if step.input_tokens:
+                metrics.AGENT_STEP_CACHED_INPUT_SHARE.observe(step.cached_input_share)
+        metrics.AGENT_STEPS.observe(len(self.steps))
+        if self.input_tokens:
+            metrics.LLM_TOKENS.inc(self.input_tokens, type="input")
+        if self.cached_input_tokens:
+            metrics.LLM_TOKENS.inc(self.cached_input_tokens, type="cached_input")
+        if self.output_tokens:
+            metrics.LLM_TOKENS.inc(self.output_tokens, type="output")
+        cost_usd = self.cost_usd
+        if cost_usd:
+            metrics.LLM_COST.inc(cost_usd, model=self.model)  # type: ignore
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Usage summary, as attached to the final message of a request."""
+        return {
+            "model": self.model,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+            "cost_usd": self.cost_usd,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "tool_seconds": round(self.tool_seconds, 3),
+            "steps": [asdict(step) for step in self.steps],
+        }
@@ -0,0 +1,16 @@
+from typing import Callable
+
+import httpx
+import openai
+import pytest
+
+
+@pytest.fixture
+def status_error() -> Callable[..., openai.APIStatusError]:
+    """Factory of the errors the OpenAI client raises for an HTTP error response."""
+
+    def create(status_code: int, headers=None) -> openai.APIStatusError:
+        response = httpx.Response(status_code, headers=headers, request=httpx.Request("POST", "http://localhost"))
+        return openai.APIStatusError("error", response=response, body=None)
+
+    return create
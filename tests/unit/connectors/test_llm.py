@@ -0,0 +1,149 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from galadriel.connectors import llm
+from galadriel.connectors.llm import LlmClient
+from galadriel.connectors.llm_cache import LlmCache
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _client(cache=None, **kwargs) -> LlmClient:
+    client = LlmClient("http://localhost", "api-key", cache=cache, **kwargs)
+    client.client = MagicMock()
+    client.client.chat.completions.create = AsyncMock(return_value=MagicMock())
+    return client
+
+
+async def test_completion_passes_parameters():
+    client = _client()
+
+    await client.completion("gpt-4o", MESSAGES, temperature=0)
+
+    client.client.chat.completions.create.assert_awaited_once_with(model="gpt-4o", messages=MESSAGES, temperature=0)
+
+
+async def test_completion_is_cached():
+    client = _client(cache=LlmCache())
+    client.client.chat.completions.create.return_value = MagicMock()
+
+    first = await client.completion("gpt-4o", iter(MESSAGES), temperature=0)
+    second = await client.completion("gpt-4o", MESSAGES, temperature=0)
+
+    assert first is second
+    assert client.client.chat.completions.create.await_count == 1
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm, "get_backoff_seconds", lambda _: 0.0)
+
+
+async def test_retryable_error_is_retried(no_backoff, status_error):
+    client = _client()
+    completion = MagicMock()
+    client.client.chat.completions.create.side_effect = [status_error(503), completion]
+
+    assert await client.completion("gpt-4o", MESSAGES) is completion
+    assert client.client.chat.completions.create.await_count == 2
+
+
+async def test_non_retryable_error_is_not_retried(no_backoff, status_error):
+    client = _client()
+    client.client.chat.completions.create.side_effect = status_error(400)
+
+    assert await client.completion("gpt-4o", MESSAGES) is None
+    assert client.client.chat.completions.create.await_count == 1
+
+
+async def test_no_backoff_after_last_attempt(monkeypatch, status_error):
+    monkeypatch.setattr(llm, "get_backoff_seconds", lambda _: 10.0)
+    client = _client(max_attempts=1)
+    client.client.chat.completions.create.side_effect = status_error(503)
+
+    started = time.monotonic()
+    assert await client.completion("gpt-4o", MESSAGES) is None
+    assert time.monotonic() - started < 1
+
+
+async def test_retry_after_is_respected(no_backoff, status_error):
+    client = _client()
+    completion = MagicMock()
+    client.client.chat.completions.create.side_effect = [status_error(429, {"retry-after-ms": "100"}), completion]
+
+    started = time.monotonic()
+    assert await client.completion("gpt-4o", MESSAGES) is completion
+    assert time.monotonic() - started >= 0.1
+
+
+async def test_retry_after_beyond_deadline_gives_up(no_backoff, status_error):
+    client = _client(deadline_seconds=1)
+    client.client.chat.completions.create.side_effect = status_error(429, {"retry-after": "30"})
+
+    started = time.monotonic()
+    assert await client.completion("gpt-4o", MESSAGES) is None
+    assert time.monotonic() - started < 1
+    assert client.client.chat.completions.create.await_count == 1
+
+
+async def test_call_is_bounded_by_deadline():
+    client = _client()
+
+    async def hang(**kwargs):
+        await asyncio.sleep(10)
+
+    client.client.chat.completions.create.side_effect = hang
+
+    started = time.monotonic()
+    assert await client.completion("gpt-4o", MESSAGES, deadline_seconds=0.05) is None
+    assert time.monotonic() - started < 1
+
+
+async def test_concurrency_is_limited_per_model():
+    client = _client(max_concurrency_per_model=1)
+    in_flight, max_in_flight = 0, 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return MagicMock()
+
+    client.client.chat.completions.create.side_effect = create
+    await asyncio.gather(*[client.completion("gpt-4o", MESSAGES) for _ in range(3)])
+
+    assert max_in_flight == 1
+
+
+async def test_circuit_breaker_fails_fast(no_backoff, status_error):
+    client = _client(max_attempts=1, circuit_breaker_threshold=2)
+    client.client.chat.completions.create.side_effect = status_error(503)
+
+    for _ in range(3):
+        assert await client.completion("gpt-4o", MESSAGES) is None
+
+    assert client.client.chat.completions.create.await_count == 2
+    # Other models are not affected
+    await client.completion("gpt-4o-mini", MESSAGES)
+    assert client.client.chat.completions.create.await_count == 3
+
+
+async def test_completion_is_routed_over_endpoints():
+    router = MagicMock()
+    router.call = AsyncMock(return_value="completion")
+    client = LlmClient(router=router)
+
+    assert await client.completion("gpt-4o", MESSAGES, hedge_after_seconds=0.5, temperature=0) == "completion"
+
+    operation, hedge_after_seconds = router.call.await_args.args
+    assert hedge_after_seconds == 0.5
+    endpoint = MagicMock()
+    endpoint.create_completion = AsyncMock(return_value="completion")
+    await operation(endpoint)
+    endpoint.create_completion.assert_awaited_once_with("gpt-4o", MESSAGES, temperature=0)
@@ -0,0 +1,147 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from openai.types.chat.chat_completion import ChatCompletion
+
+from galadriel.connectors.llm_cache import LlmCache
+from galadriel.connectors.llm_cache import get_cache_key
+
+MODEL = "gpt-4o"
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _completion(content: str = "hi") -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 1700000000,
+            "model": MODEL,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        }
+    )
+
+
+def test_cache_key_is_canonical():
+    assert get_cache_key(MODEL, MESSAGES, {"temperature": 0, "top_p": 1}) == get_cache_key(
+        MODEL, [{"content": "hello", "role": "user"}], {"top_p": 1, "temperature": 0}
+    )
+    assert get_cache_key(MODEL, MESSAGES, {"temperature": 0}) != get_cache_key(MODEL, MESSAGES, {"temperature": 1})
+
+
+async def test_deterministic_completion_is_reused():
+    cache = LlmCache()
+    create = AsyncMock(return_value=_completion())
+
+    first = await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+    second = await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+
+    assert first == second
+    assert create.await_count == 1
+
+
+async def test_non_deterministic_completion_is_not_stored():
+    cache = LlmCache()
+    create = AsyncMock(return_value=_completion())
+
+    await cache.get_or_create(MODEL, MESSAGES, {}, create)
+    await cache.get_or_create(MODEL, MESSAGES, {}, create)
+
+    assert create.await_count == 2
+    assert len(cache) == 0
+
+
+async def test_concurrent_identical_calls_are_deduplicated():
+    cache = LlmCache()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return _completion()
+
+    completions = await asyncio.gather(*[cache.get_or_create(MODEL, MESSAGES, {}, create) for _ in range(3)])
+
+    assert calls == 1
+    assert completions[0] == completions[1] == completions[2]
+
+
+async def test_error_is_raised_to_all_waiters():
+    cache = LlmCache()
+
+    async def create():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(
+        *[cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create) for _ in range(2)],
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
+
+
+async def test_waiters_create_completion_when_first_call_is_cancelled():
+    cache = LlmCache()
+    started = asyncio.Event()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.01)
+        return _completion()
+
+    first = asyncio.create_task(cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create))
+    await started.wait()
+    waiters = [asyncio.create_task(cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)) for _ in range(2)]
+    await asyncio.sleep(0)
+    first.cancel()
+
+    completions = await asyncio.gather(*waiters)
+
+    assert first.cancelled()
+    assert completions[0] == completions[1] == _completion()
+    # One of the waiters called the LLM again, the other one waited for it
+    assert calls == 2
+
+
+async def test_completion_expires():
+    cache = LlmCache(ttl_seconds=0.01)
+    create = AsyncMock(return_value=_completion())
+    await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+
+    await asyncio.sleep(0.02)
+    await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+
+    assert create.await_count == 2
+
+
+async def test_least_recently_used_is_evicted():
+    cache = LlmCache(max_entries=1)
+    create = AsyncMock(return_value=_completion())
+
+    await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+    await cache.get_or_create(MODEL, [{"role": "user", "content": "bye"}], {"temperature": 0}, create)
+
+    assert len(cache) == 1
+    await cache.get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+    assert create.await_count == 3
+
+
+@pytest.mark.parametrize("ttl_seconds, expected_calls", [(60, 1), (-1, 2)])
+async def test_disk_store(tmp_path, ttl_seconds, expected_calls):
+    create = AsyncMock(return_value=_completion("from disk"))
+    await LlmCache(directory=str(tmp_path), ttl_seconds=ttl_seconds).get_or_create(
+        MODEL, MESSAGES, {"temperature": 0}, create
+    )
+
+    # A new cache, e.g. after a restart, reads the completions stored on disk
+    completion = await LlmCache(directory=str(tmp_path)).get_or_create(MODEL, MESSAGES, {"temperature": 0}, create)
+
+    assert completion.choices[0].message.content == "from disk"
+    assert create.await_count == expected_calls
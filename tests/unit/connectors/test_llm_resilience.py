@@ -0,0 +1,68 @@
+import email.utils
+import time
+
+import httpx
+import openai
+import pytest
+
+from galadriel.connectors.llm_resilience import CircuitBreaker
+from galadriel.connectors.llm_resilience import MAX_BACKOFF_SECONDS
+from galadriel.connectors.llm_resilience import get_backoff_seconds
+from galadriel.connectors.llm_resilience import get_retry_after_seconds
+from galadriel.connectors.llm_resilience import is_retryable
+
+
+@pytest.mark.parametrize(
+    "status_code, expected",
+    [(429, True), (503, True), (529, True), (400, False), (401, False)],
+)
+def test_is_retryable_status(status_error, status_code, expected):
+    assert is_retryable(status_error(status_code)) == expected
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (openai.APIConnectionError(request=httpx.Request("POST", "http://localhost")), True),
+        (ValueError("bug"), False),
+    ],
+)
+def test_is_retryable(error, expected):
+    assert is_retryable(error) == expected
+
+
+def test_retry_after_seconds(status_error):
+    assert get_retry_after_seconds(status_error(429, {"retry-after": "3"})) == 3.0
+    assert get_retry_after_seconds(status_error(429, {"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after_seconds(status_error(429)) is None
+    assert get_retry_after_seconds(ValueError("no response")) is None
+
+
+def test_retry_after_http_date(status_error):
+    retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+
+    assert 28 < get_retry_after_seconds(status_error(429, {"retry-after": retry_at})) <= 30
+
+
+def test_backoff_is_capped():
+    backoff_seconds = 0.5
+    for _ in range(20):
+        backoff_seconds = get_backoff_seconds(backoff_seconds)
+        assert backoff_seconds <= MAX_BACKOFF_SECONDS
+
+
+def test_circuit_breaker_opens_and_resets():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=0.01)
+    circuit_breaker.record_failure()
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+    assert not circuit_breaker.allow_request()
+
+    time.sleep(0.02)
+    # A single trial call is let through
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.is_open
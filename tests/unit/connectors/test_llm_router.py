@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from galadriel.connectors.llm_router import LlmEndpoint
+from galadriel.connectors.llm_router import LlmRouter
+from galadriel.connectors.llm_router import LlmRouterError
+
+
+def _endpoints(count: int = 2):
+    return [LlmEndpoint(f"http://endpoint-{i}", "api-key", name=f"endpoint-{i}") for i in range(count)]
+
+
+def test_router_needs_endpoints():
+    with pytest.raises(LlmRouterError):
+        LlmRouter([])
+
+
+def test_fastest_endpoint_is_preferred():
+    slow, fast = _endpoints()
+    slow.record_success(2.0)
+    fast.record_success(0.5)
+
+    assert LlmRouter([slow, fast]).get_endpoints() == [fast, slow]
+
+
+def test_calls_in_flight_spread_load():
+    first, second = _endpoints()
+    first.record_success(0.5)
+    second.record_success(0.6)
+    first.in_flight = 1
+
+    assert LlmRouter([first, second]).get_endpoints()[0] is second
+
+
+def test_failing_endpoint_is_avoided_then_recovers(status_error):
+    failing, healthy = _endpoints()
+    failing.record_success(0.5)
+    healthy.record_success(1.0)
+    for _ in range(5):
+        failing.record_failure(status_error(503))
+    now = time.monotonic()
+
+    assert failing.get_cost(now) > healthy.get_cost(now)
+    # The error rate halves every minute, so the endpoint is tried again later
+    assert failing.get_cost(now + 600) < healthy.get_cost(now + 600)
+
+
+def test_rate_limit_headroom_from_headers():
+    endpoint, other = _endpoints()
+    endpoint.record_success(0.5)
+    other.record_success(1.0)
+
+    endpoint.update_rate_limits(
+        {
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "50",
+            "llm_provider-x-ratelimit-limit-tokens": "10000",
+            "llm_provider-x-ratelimit-remaining-tokens": "100",
+        }
+    )
+
+    now = time.monotonic()
+    assert endpoint.get_rate_limit_headroom(now) == 0.01
+    assert LlmRouter([endpoint, other]).get_endpoints()[0] is other
+    # Older headers are not trusted anymore
+    assert endpoint.get_rate_limit_headroom(now + 120) == 1.0
+
+
+def test_retry_after_skips_endpoint(status_error):
+    endpoint, other = _endpoints()
+    other.record_success(5.0)
+
+    endpoint.record_failure(status_error(429, {"retry-after": "30"}))
+
+    assert LlmRouter([endpoint, other]).get_endpoints() == [other, endpoint]
+
+
+async def test_call_fails_over_on_retryable_error(status_error):
+    first, second = _endpoints()
+    first.record_success(0.1)
+    second.record_success(0.2)
+    operation = AsyncMock(side_effect=[status_error(503), "completion"])
+
+    result = await LlmRouter([first, second]).call(operation)
+
+    assert result == "completion"
+    assert [call.args[0] for call in operation.await_args_list] == [first, second]
+    assert first.error_rate > 0
+    assert second.error_rate == 0
+
+
+async def test_call_fails_over_on_rejected_api_key(status_error):
+    operation = AsyncMock(side_effect=[status_error(401), "completion"])
+
+    assert await LlmRouter(_endpoints()).call(operation) == "completion"
+
+
+async def test_call_raises_invalid_request_without_failing_over(status_error):
+    endpoints = _endpoints()
+    operation = AsyncMock(side_effect=status_error(400))
+
+    with pytest.raises(openai.APIStatusError):
+        await LlmRouter(endpoints).call(operation)
+
+    assert operation.await_count == 1
+    assert all(endpoint.error_rate == 0 for endpoint in endpoints)
+
+
+async def test_call_raises_last_error_when_all_endpoints_fail(status_error):
+    operation = AsyncMock(side_effect=[status_error(502), status_error(503)])
+
+    with pytest.raises(openai.APIStatusError) as error:
+        await LlmRouter(_endpoints()).call(operation)
+
+    assert error.value.status_code == 503
+
+
+async def test_hedged_call_returns_first_answer_and_cancels_other():
+    slow, fast = _endpoints()
+    slow.record_success(0.1)
+    fast.record_success(0.2)
+    cancelled = asyncio.Event()
+
+    async def operation(endpoint):
+        if endpoint is slow:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return endpoint.name
+
+    result = await LlmRouter([slow, fast]).call(operation, hedge_after_seconds=0.01)
+
+    assert result == "endpoint-1"
+    assert cancelled.is_set()
+    assert slow.in_flight == 0
+    assert slow.error_rate == 0
+
+
+async def test_fast_call_is_not_hedged():
+    operation = AsyncMock(return_value="completion")
+
+    assert await LlmRouter(_endpoints(), hedge_after_seconds=1.0).call(operation) == "completion"
+    assert operation.await_count == 1
+
+
+def test_call_sync_fails_over(status_error):
+    operation = MagicMock(side_effect=[status_error(503), "completion"])
+
+    assert LlmRouter(_endpoints()).call_sync(operation) == "completion"
+    assert operation.call_count == 2
+
+
+def test_call_sync_hedges_slow_call():
+    slow, fast = _endpoints()
+    slow.record_success(0.1)
+    fast.record_success(0.2)
+    release = threading.Event()
+
+    def operation(endpoint):
+        if endpoint is slow:
+            release.wait(5)
+        return endpoint.name
+
+    try:
+        assert LlmRouter([slow, fast]).call_sync(operation, hedge_after_seconds=0.01) == "endpoint-1"
+    finally:
+        release.set()
+
+
+def test_call_sync_not_hedged_when_not_allowed():
+    operation = MagicMock(return_value="completion")
+
+    router = LlmRouter(_endpoints(), hedge_after_seconds=0.0)
+
+    assert router.call_sync(operation, hedged=False) == "completion"
+    assert operation.call_count == 1
+
+
+async def test_create_completion_reads_rate_limits():
+    endpoint = LlmEndpoint("http://localhost", "api-key")
+    response = MagicMock()
+    response.headers = {"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "5"}
+    endpoint._client = MagicMock()
+    endpoint._client.chat.completions.with_raw_response.create = AsyncMock(return_value=response)
+
+    completion = await endpoint.create_completion("gpt-4o", [], temperature=0)
+
+    assert completion is response.parse.return_value
+    assert endpoint.get_rate_limit_headroom(time.monotonic()) == 0.5
@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock
+
+from galadriel.connectors.prompt_caching import CACHE_CONTROL
+from galadriel.connectors.prompt_caching import add_prompt_cache_hints
+from galadriel.connectors.prompt_caching import get_cached_tokens
+from galadriel.connectors.prompt_caching import supports_prompt_caching
+
+
+def test_hints_system_prompt_and_last_message():
+    messages = [
+        {"role": "system", "content": [{"type": "text", "text": "You are an agent"}]},
+        {"role": "user", "content": "New task"},
+        {"role": "assistant", "content": "Thought"},
+        {"role": "user", "content": [{"type": "text", "text": "Observation"}]},
+    ]
+
+    hinted = add_prompt_cache_hints(messages)
+
+    assert hinted[0]["content"] == [{"type": "text", "text": "You are an agent", "cache_control": CACHE_CONTROL}]
+    assert hinted[1:3] == messages[1:3]
+    assert hinted[3]["content"][-1]["cache_control"] == CACHE_CONTROL
+    # The messages of the agent memory are not changed
+    assert "cache_control" not in messages[0]["content"][0]
+    assert "cache_control" not in messages[3]["content"][0]
+
+
+def test_hints_text_content():
+    hinted = add_prompt_cache_hints([{"role": "user", "content": "New task"}])
+
+    assert hinted == [
+        {"role": "user", "content": [{"type": "text", "text": "New task", "cache_control": CACHE_CONTROL}]}
+    ]
+
+
+def test_hints_no_messages():
+    assert not add_prompt_cache_hints([])
+
+
+def test_supports_prompt_caching():
+    assert supports_prompt_caching("anthropic/claude-3-5-sonnet-20240620")
+    assert not supports_prompt_caching("my-own-model")
+
+
+def test_cached_tokens_from_usage():
+    openai_usage = MagicMock()
+    openai_usage.prompt_tokens_details.cached_tokens = 1024
+    anthropic_usage = MagicMock(prompt_tokens_details=None, cache_read_input_tokens=2048)
+
+    assert get_cached_tokens(openai_usage) == 1024
+    assert get_cached_tokens(anthropic_usage) == 2048
+    assert get_cached_tokens(MagicMock()) == 0
+    assert get_cached_tokens(None) == 0
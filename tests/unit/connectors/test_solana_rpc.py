@@ -0,0 +1,73 @@
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+import pytest
+
+from galadriel.connectors import solana_rpc
+from galadriel.connectors.solana_rpc import SolanaRpcError
+from galadriel.connectors.solana_rpc import SolanaRpcPool
+
+PRIMARY_URL = "https://primary.example.com"
+SECONDARY_URL = "https://secondary.example.com"
+
+
+def test_rpc_urls_from_env(monkeypatch):
+    monkeypatch.setenv("SOLANA_RPC_URLS", f"{PRIMARY_URL}, {SECONDARY_URL}")
+
+    pool = SolanaRpcPool()
+
+    assert [endpoint.url for endpoint in pool.endpoints] == [PRIMARY_URL, SECONDARY_URL]
+
+
+def test_defaults_to_mainnet(monkeypatch):
+    monkeypatch.delenv("SOLANA_RPC_URLS", raising=False)
+
+    pool = SolanaRpcPool()
+
+    assert [endpoint.url for endpoint in pool.endpoints] == ["https://api.mainnet-beta.solana.com"]
+
+
+def test_endpoints_share_http_session():
+    pool = SolanaRpcPool([PRIMARY_URL, SECONDARY_URL])
+
+    for endpoint in pool.endpoints:
+        assert endpoint.client._provider.session is pool.session
+
+
+async def test_fails_over_to_healthy_endpoint():
+    pool = SolanaRpcPool([PRIMARY_URL, SECONDARY_URL])
+    primary, secondary = pool.endpoints
+
+    async def operation(client):
+        if client is primary.client:
+            raise Exception("429 Too Many Requests")
+        return "transaction"
+
+    assert await pool.call(operation) == "transaction"
+    assert primary.health_score < secondary.health_score
+    # The unhealthy endpoint is tried last from now on
+    assert pool._get_endpoints_by_health() == [secondary, primary]
+
+
+async def test_retries_with_backoff_without_blocking():
+    pool = SolanaRpcPool([PRIMARY_URL])
+    operation = AsyncMock(side_effect=[Exception("timeout"), Exception("timeout"), "transaction"])
+
+    with patch.object(solana_rpc.asyncio, "sleep", new=AsyncMock()) as mock_sleep:
+        assert await pool.call(operation) == "transaction"
+
+    assert operation.call_count == 3
+    assert mock_sleep.await_count == 2
+    for call in mock_sleep.await_args_list:
+        assert 0 <= call.args[0] <= solana_rpc.MAX_BACKOFF_SECONDS
+
+
+async def test_raises_when_all_attempts_fail():
+    pool = SolanaRpcPool([PRIMARY_URL, SECONDARY_URL])
+    operation = AsyncMock(side_effect=Exception("unavailable"))
+
+    with patch.object(solana_rpc.asyncio, "sleep", new=AsyncMock()):
+        with pytest.raises(SolanaRpcError):
+            await pool.call(operation)
+
+    assert operation.call_count == 2 * solana_rpc.MAX_ATTEMPTS
@@ -0,0 +1,96 @@
+import time
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from galadriel.connectors.llm_router import LlmEndpoint
+from galadriel.connectors.llm_router import LlmRouter
+from galadriel.connectors.streaming_llm import RoutedLiteLLMModel
+from galadriel.connectors.streaming_llm import StreamingLiteLLMModel
+
+
+def _chunk(content, usage=None):
+    chunk = MagicMock()
+    chunk.usage = usage
+    chunk.choices = [MagicMock()] if content is not None else []
+    if content is not None:
+        chunk.choices[0].delta.content = content
+    return chunk
+
+
+def test_deltas_are_passed_to_callback():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+    deltas = []
+    model.delta_callback = deltas.append
+    usage = MagicMock(prompt_tokens=10, completion_tokens=3)
+    chunks = [_chunk("Hel"), _chunk("lo"), _chunk(None, usage=usage)]
+
+    with patch("litellm.completion", return_value=iter(chunks)) as completion:
+        message = model([{"role": "user", "content": "hi"}])
+
+    assert completion.call_args.kwargs["stream"] is True
+    assert deltas == ["Hel", "lo"]
+    assert message.content == "Hello"
+    assert (model.last_input_token_count, model.last_output_token_count) == (10, 3)
+
+
+def test_not_streamed_without_callback():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+    response = MagicMock()
+    response.choices[0].message.model_dump.return_value = {"role": "assistant", "content": "Hello"}
+
+    with patch("litellm.completion", return_value=response) as completion:
+        model([{"role": "user", "content": "hi"}])
+
+    assert "stream" not in completion.call_args.kwargs
+
+
+def test_routed_model_calls_chosen_endpoint():
+    endpoint = LlmEndpoint("http://endpoint", "endpoint-key")
+    model = RoutedLiteLLMModel(model_id="openai/gpt-4o", router=LlmRouter([endpoint]))
+    response = MagicMock()
+    response.usage.prompt_tokens, response.usage.completion_tokens = 10, 3
+    response.choices[0].message.model_dump.return_value = {"role": "assistant", "content": "Hello"}
+    response._hidden_params = {
+        "additional_headers": {
+            "llm_provider-x-ratelimit-limit-requests": "10",
+            "llm_provider-x-ratelimit-remaining-requests": "2",
+        }
+    }
+
+    with patch("litellm.completion", return_value=response) as completion:
+        message = model([{"role": "user", "content": "hi"}])
+
+    assert message.content == "Hello"
+    assert completion.call_args.kwargs["api_base"] == "http://endpoint"
+    assert completion.call_args.kwargs["api_key"] == "endpoint-key"
+    assert (model.last_input_token_count, model.last_output_token_count) == (10, 3)
+    assert endpoint.get_rate_limit_headroom(time.monotonic()) == 0.2
+
+
+def test_prompt_caching_hints_and_cached_tokens():
+    model = StreamingLiteLLMModel(model_id="anthropic/claude-3-5-sonnet-20240620")
+    response = MagicMock()
+    response.usage.prompt_tokens, response.usage.completion_tokens = 2000, 10
+    response.usage.prompt_tokens_details.cached_tokens = 1800
+    response.choices[0].message.model_dump.return_value = {"role": "assistant", "content": "Hello"}
+    messages = [{"role": "system", "content": "You are an agent"}, {"role": "user", "content": "hi"}]
+
+    with patch("litellm.completion", return_value=response) as completion:
+        model(messages)
+
+    sent = completion.call_args.kwargs["messages"]
+    assert sent[0]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert sent[-1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert model.last_cached_input_token_count == 1800
+
+
+def test_no_prompt_caching_hints_when_disabled():
+    model = StreamingLiteLLMModel(model_id="anthropic/claude-3-5-sonnet-20240620", prompt_caching=False)
+    response = MagicMock()
+    response.choices[0].message.model_dump.return_value = {"role": "assistant", "content": "Hello"}
+
+    with patch("litellm.completion", return_value=response) as completion:
+        model([{"role": "system", "content": "You are an agent"}])
+
+    assert "cache_control" not in str(completion.call_args.kwargs["messages"])
+    assert "prompt_caching" not in completion.call_args.kwargs
@@ -1,3 +1,9 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
 from galadriel.domain.prompts import format_prompt
 
 
@@ -30,3 +36,117 @@ async def test_extra_values():
     }
     result = format_prompt.execute(template, state)
     assert result == "Hello world!"
+
+
+async def test_missing_values_keep_placeholder():
+    template = "{{value1}} {{value2}}!"
+    result = format_prompt.execute(template, {"value1": "Hello"})
+    assert result == "Hello {{value2}}!"
+
+
+async def test_values_are_not_expanded():
+    template = "{{value1}} {{value2}}!"
+    state = {
+        "value1": "{{value2}}",
+        "value2": "world",
+    }
+    result = format_prompt.execute(template, state)
+    assert result == "{{value2}} world!"
+
+
+def test_compiled_template_is_cached():
+    template = "{{value1}} and {{value2}}"
+    compiled = format_prompt.compile_template(template)
+    assert format_prompt.compile_template(template) is compiled
+    assert compiled.literals == ("", " and ", "")
+    assert compiled.placeholders == {"value1", "value2"}
+
+
+@pytest.mark.parametrize("template", ["{{ request }}", "{{}}", "{{1st}}", "{{{request}}}"])
+def test_invalid_placeholder(template):
+    with pytest.raises(ValueError):
+        format_prompt.compile_template(template)
+
+
+def test_validate_prompt_template():
+    format_prompt.validate_prompt_template("{{request}} {{chat_history}}")
+    with pytest.raises(ValueError):
+        format_prompt.validate_prompt_template("{{chat_history}}")
+    with pytest.raises(ValueError):
+        format_prompt.validate_prompt_template("{{request}}")
+
+
+def test_partial():
+    compiled = format_prompt.compile_template("{{a}}-{{b}}-{{a}}")
+    partial = compiled.partial({"a": "x"})
+    assert partial.names == ("b",)
+    assert partial.render({"b": "y"}) == "x-y-x"
+
+
+CHARACTER = {
+    "name": "Elrond",
+    "system": "You are Elrond.",
+    "knowledge": ["elves"],
+    "bio": ["bio 1", "bio 2"],
+    "lore": ["lore"],
+    "topics": ["rings"],
+}
+CHARACTER_TEMPLATE = "{{system}} {{agent_name}} knows {{knowledge}}, {{bio}}. {{message}}"
+
+
+def _write_character(path, character):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(character, f)
+
+
+def test_character_template(tmp_path):
+    path = tmp_path / "agent.json"
+    _write_character(path, CHARACTER)
+    character_template = format_prompt.CharacterTemplate(CHARACTER_TEMPLATE, path)
+
+    result = character_template.render({"message": "{{agent_name}}?"})
+
+    assert result in [
+        "You are Elrond. Elrond knows elves, bio 1. {{agent_name}}?",
+        "You are Elrond. Elrond knows elves, bio 2. {{agent_name}}?",
+    ]
+    # Unused random fields are not sampled
+    assert set(character_template._random_values) == {"knowledge", "bio"}
+
+
+def test_character_template_reloads_changed_file(tmp_path):
+    path = tmp_path / "agent.json"
+    _write_character(path, CHARACTER)
+    character_template = format_prompt.CharacterTemplate("{{agent_name}}", path, watch=True)
+    assert character_template.render() == "Elrond"
+
+    _write_character(path, {**CHARACTER, "name": "Galadriel"})
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+    assert character_template.render() == "Galadriel"
+
+
+def test_load_agent_template_parses_file_once(tmp_path):
+    path = tmp_path / "agent.json"
+    _write_character(path, CHARACTER)
+
+    with patch("galadriel.domain.prompts.format_prompt.json.load", wraps=json.load) as json_load:
+        assert format_prompt.load_agent_template("{{agent_name}}: {{lore}}", path) == "Elrond: lore"
+        assert format_prompt.load_agent_template("{{agent_name}}: {{lore}}", path) == "Elrond: lore"
+
+    assert json_load.call_count == 1
+
+
+def test_load_agent_template_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        format_prompt.load_agent_template(CHARACTER_TEMPLATE, tmp_path / "missing.json")
+
+    path = tmp_path / "invalid.json"
+    path.write_text("{", encoding="utf-8")
+    with pytest.raises(ValueError):
+        format_prompt.load_agent_template(CHARACTER_TEMPLATE, path)
+
+    path = tmp_path / "no_bio.json"
+    _write_character(path, {**CHARACTER, "bio": []})
+    with pytest.raises(ValueError):
+        format_prompt.load_agent_template(CHARACTER_TEMPLATE, path)
@@ -1,5 +1,6 @@
 import pytest
 from smolagents import ActionStep, ToolCall
+from galadriel.domain.extract_step_logs import CodeBlockFilter
 from galadriel.domain.extract_step_logs import pull_messages_from_step
 
 
@@ -157,3 +158,71 @@ async def test_tool_error_handling():
     messages = [msg async for msg in pull_messages_from_step(step)]
     error_messages = [msg for msg in messages if isinstance(msg.content, str) and "Tool execution error" in msg.content]
     assert len(error_messages) == 0
+
+
+@pytest.mark.parametrize(
+    "model_output",
+    [
+        "Thought: compute it\nCode:\n```py\nprint(1)\n```<end_code>",
+        "Thought: compute it\nCode: ```py\nprint(1)\n```\n<end_code>",
+        "Thought: compute it\n```py\nprint(1)\n<end_code>\n```",
+    ],
+)
+async def test_code_blocks_removed_from_thinking(model_output):
+    step = ActionStep(step_number=1, model_output=model_output, start_time=0, end_time=1.0)
+
+    messages = [msg async for msg in pull_messages_from_step(step)]
+
+    assert messages[1].content == "\nThought: compute it\n"
+
+
+async def test_end_code_removed_from_code_in_thinking():
+    step = ActionStep(
+        step_number=1,
+        model_output="Thought: use `final_answer`\nCode:\n```py\nfinal_answer(1)\n```<end_code>",
+        start_time=0,
+        end_time=1.0,
+    )
+
+    messages = [msg async for msg in pull_messages_from_step(step, show_code_in_thinking=True)]
+
+    assert messages[1].content == "\nThought: use  **final_answer** \nCode:\n```py\nfinal_answer(1)\n```\n"
+
+
+async def test_unclosed_code_block_kept():
+    step = ActionStep(step_number=1, model_output="Thought:\n```py\nprint(1)", start_time=0, end_time=1.0)
+
+    messages = [msg async for msg in pull_messages_from_step(step)]
+
+    assert messages[1].content == "\nThought:\n```py\nprint(1)\n"
+
+
+async def test_thinking_not_shown_when_streamed():
+    step = ActionStep(step_number=1, model_output="Thought: compute it", start_time=0, end_time=1.0)
+
+    messages = [msg async for msg in pull_messages_from_step(step, show_thinking=False)]
+
+    assert all("Thought" not in message.content for message in messages)
+
+
+@pytest.mark.parametrize(
+    "deltas",
+    [
+        ["Thought: compute it\nCode:\n```py\nprint(1)\n```<end_code>\nDone"],
+        ["Thought: compute it\nCo", "de", ":\n``", "`py\nprint(1)\n`", "``<end_", "code>\nDone"],
+        list("Thought: compute it\nCode:\n```py\nprint(1)\n```<end_code>\nDone"),
+    ],
+)
+def test_code_block_filter(deltas):
+    code_block_filter = CodeBlockFilter()
+
+    text = "".join(code_block_filter.feed(delta) for delta in deltas) + code_block_filter.flush()
+
+    assert text == "Thought: compute it\n\nDone"
+
+
+def test_code_block_filter_holds_back_possible_code_label():
+    code_block_filter = CodeBlockFilter()
+
+    assert code_block_filter.feed("Thought: look it up\nCod") == "Thought: look it up\n"
+    assert code_block_filter.feed("ing is fun") == "Coding is fun"
@@ -1,16 +1,35 @@
+import gzip
+import hashlib
+import json
+import logging
 from unittest.mock import MagicMock
 
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
 from galadriel.domain.logs_exporter import LogsExportHandler
 from galadriel.domain import logs_exporter
+from galadriel.proof.merkle import verify_inclusion
 
 
-def get_exporter() -> LogsExportHandler:
+def get_exporter(**kwargs) -> LogsExportHandler:
     return LogsExportHandler(
         MagicMock(),
         None,
+        **kwargs,
     )
 
 
+def make_record(message: str, created: float, level: int = logging.INFO) -> logging.LogRecord:
+    record = logging.LogRecord("root", level, __file__, 1, message, None, None)
+    record.created = created
+    return record
+
+
+def emit_logs(exporter: LogsExportHandler, count: int) -> None:
+    for i in range(count):
+        exporter.emit(make_record(f"msg_{i}", 1738080273 + i))
+
+
 def test_no_env_values():
     logs_exporter.time = MagicMock()
 
@@ -23,18 +42,16 @@ def test_no_env_values():
 
 def test_formats_logs():
     exporter: LogsExportHandler = get_exporter()
-    original_logs = [
-        '{"asctime": "2025-01-28 16:04:33,063", "name": "root", "levelname": "INFO", "message": "msg_1", "taskName": null}',
-        '{"asctime": "2025-01-28 16:05:33,063", "name": "root", "levelname": "INFO", "message": "msg_2", "taskName": null}',
-    ]
-    exporter.log_records = original_logs[:]
-    formatted = exporter._format_logs()
+    exporter.emit(make_record("msg_1", 1738080273.063))
+    exporter.emit(make_record("msg_2", 1738080333.063, logging.WARNING))
+    exporter.emit(make_record("", 1738080333.063))
+    formatted = exporter._format_logs(list(exporter.log_records))
     assert formatted == [
         {"level": "info", "text": "msg_1", "timestamp": 1738080273, "signature": None},
-        {"level": "info", "text": "msg_2", "timestamp": 1738080333, "signature": None},
+        {"level": "warning", "text": "msg_2", "timestamp": 1738080333, "signature": None},
     ]
     # Does not delete existing values
-    assert exporter.log_records == original_logs[:]
+    assert len(exporter.log_records) == 2
 
 
 def test_formats_logs_with_signature():
@@ -45,15 +62,146 @@ def test_formats_logs_with_signature():
     )
     prover.hash.return_value = b"asdasd"
     prover.sign.return_value = b"asdasd"
-    original_logs = [
-        '{"asctime": "2025-01-28 16:04:33,063", "name": "root", "levelname": "INFO", "message": "msg_1", "taskName": null}',
-        '{"asctime": "2025-01-28 16:05:33,063", "name": "root", "levelname": "INFO", "message": "msg_2", "taskName": null}',
-    ]
-    exporter.log_records = original_logs[:]
-    formatted = exporter._format_logs()
+    exporter.emit(make_record("msg_1", 1738080273.063))
+    exporter.emit(make_record("msg_2", 1738080333.063))
+    formatted = exporter._format_logs(list(exporter.log_records))
     assert formatted == [
         {"level": "info", "text": "msg_1", "timestamp": 1738080273, "signature": b"asdasd".hex()},
         {"level": "info", "text": "msg_2", "timestamp": 1738080333, "signature": b"asdasd".hex()},
     ]
     # Does not delete existing values
-    assert exporter.log_records == original_logs[:]
+    assert len(exporter.log_records) == 2
+
+
+def test_buffer_is_bounded():
+    exporter: LogsExportHandler = get_exporter(buffer_size=3)
+    emit_logs(exporter, 5)
+
+    assert [record["text"] for record in exporter.log_records] == ["msg_2", "msg_3", "msg_4"]
+    assert exporter.dropped_records_count == 2
+
+    exporter._report_dropped_records()
+    exporter.logger.warning.assert_called_once()
+
+
+def test_exports_backlog_in_batches():
+    exporter: LogsExportHandler = get_exporter(batch_size=2)
+    exporter.session = MagicMock()
+    exporter.session.post.return_value = MagicMock(ok=True, status_code=200)
+    emit_logs(exporter, 5)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    assert exporter.session.post.call_count == 3
+    assert len(exporter.log_records) == 0
+    _, kwargs = exporter.session.post.call_args_list[0]
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    payload = json.loads(gzip.decompress(kwargs["data"]))
+    assert payload["agent_instance_id"] == "instance_id"
+    assert [log["text"] for log in payload["logs"]] == ["msg_0", "msg_1"]
+
+
+def test_failed_export_keeps_logs():
+    exporter: LogsExportHandler = get_exporter(batch_size=2)
+    exporter.session = MagicMock()
+    exporter.session.post.return_value = MagicMock(ok=False, status_code=500)
+    emit_logs(exporter, 3)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    assert exporter.session.post.call_count == 1
+    assert [record["text"] for record in exporter.log_records] == ["msg_0", "msg_1", "msg_2"]
+
+
+def test_falls_back_to_uncompressed_export():
+    exporter: LogsExportHandler = get_exporter()
+    exporter.session = MagicMock()
+    exporter.session.post.side_effect = [
+        MagicMock(ok=False, status_code=415),
+        MagicMock(ok=True, status_code=200),
+    ]
+    emit_logs(exporter, 1)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    _, kwargs = exporter.session.post.call_args_list[1]
+    assert "Content-Encoding" not in kwargs["headers"]
+    assert json.loads(kwargs["data"])["logs"][0]["text"] == "msg_0"
+    assert not exporter.compress
+    assert len(exporter.log_records) == 0
+
+
+def test_falls_back_to_uncompressed_export_on_any_client_error():
+    exporter: LogsExportHandler = get_exporter()
+    exporter.session = MagicMock()
+    exporter.session.post.side_effect = [
+        MagicMock(ok=False, status_code=400),
+        MagicMock(ok=True, status_code=200),
+    ]
+    emit_logs(exporter, 1)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    assert not exporter.compress
+    assert len(exporter.log_records) == 0
+
+
+def test_keeps_compression_when_uncompressed_export_fails_too():
+    exporter: LogsExportHandler = get_exporter()
+    exporter.session = MagicMock()
+    exporter.session.post.return_value = MagicMock(ok=False, status_code=401)
+    emit_logs(exporter, 1)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    assert exporter.session.post.call_count == 2
+    assert exporter.compress
+    assert len(exporter.log_records) == 1
+
+
+def test_requeue_counts_evicted_records():
+    exporter: LogsExportHandler = get_exporter(buffer_size=3)
+    emit_logs(exporter, 3)
+    batch = exporter._pop_batch(2)
+    emit_logs(exporter, 1)
+
+    exporter._requeue(batch)
+
+    assert len(exporter.log_records) == 3
+    assert exporter.dropped_records_count == 1
+
+
+def test_logs_emitted_during_export_wait_for_next_run():
+    exporter: LogsExportHandler = get_exporter(batch_size=1)
+    exporter.session = MagicMock()
+
+    def post(*args, **kwargs):
+        exporter.emit(make_record("export status", 1738080273))
+        return MagicMock(ok=True, status_code=200)
+
+    exporter.session.post.side_effect = post
+    emit_logs(exporter, 2)
+
+    exporter._export_pending_logs("api_key", "agent_id", "instance_id")
+
+    assert exporter.session.post.call_count == 2
+    assert [record["text"] for record in exporter.log_records] == ["export status", "export status"]
+
+
+def test_formats_logs_with_batch_signature():
+    private_key = Ed25519PrivateKey.generate()
+    prover = MagicMock()
+    prover.hash.side_effect = lambda value: hashlib.sha256(value.encode("utf-8")).digest()
+    prover.sign.side_effect = private_key.sign
+    exporter: LogsExportHandler = LogsExportHandler(MagicMock(), prover, batch_signing=True)
+    emit_logs(exporter, 3)
+
+    formatted = exporter._format_logs(list(exporter.log_records))
+
+    # Signed once for the whole batch
+    prover.sign.assert_called_once()
+    root = bytes.fromhex(formatted[0]["merkle_root"])
+    private_key.public_key().verify(bytes.fromhex(formatted[0]["signature"]), root)
+    for log in formatted:
+        assert log["signature"] == formatted[0]["signature"]
+        assert verify_inclusion(prover.hash(log["text"]), log["merkle_proof"], root)
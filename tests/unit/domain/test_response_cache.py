@@ -0,0 +1,128 @@
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from galadriel.domain.response_cache import ResponseCache
+from galadriel.entities import Message
+
+
+def _response(content: str = "It is 42", response_type: str = "completion_message") -> Message:
+    return Message(content=content, final=True, additional_kwargs={"type": response_type})
+
+
+def _embeddings(vectors):
+    embeddings = MagicMock()
+    embeddings.aembed_query = AsyncMock(side_effect=lambda content: vectors[content])
+    return embeddings
+
+
+async def _cache(cache: ResponseCache, content: str, response: Message, tool_names=()) -> None:
+    lookup = await cache.lookup(Message(content=content))
+    assert lookup.response is None
+    cache.put(lookup, response, tool_names)
+
+
+async def test_equal_request_hits():
+    cache = ResponseCache()
+    await _cache(cache, "What is the answer?", _response())
+
+    lookup = await cache.lookup(Message(content="what is  the ANSWER? ", conversation_id="c2"))
+
+    assert lookup.response.content == "It is 42"
+    assert lookup.response.conversation_id == "c2"
+    assert lookup.response.final
+    assert lookup.response.additional_kwargs["cached"]
+
+
+async def test_response_expires():
+    cache = ResponseCache(ttl_seconds=0.01)
+    await _cache(cache, "question", _response())
+
+    await asyncio.sleep(0.02)
+
+    assert (await cache.lookup(Message(content="question"))).response is None
+
+
+async def test_tool_ttl():
+    cache = ResponseCache(tool_ttl_seconds={"get_coin_price": 0.01, "swap": 0})
+    await _cache(cache, "price?", _response(), ["get_coin_price"])
+    await _cache(cache, "weather?", _response(), ["get_weather"])
+    # Responses that called a tool with a TTL of 0 are not cached
+    await _cache(cache, "swap!", _response(), ["get_coin_price", "swap"])
+
+    await asyncio.sleep(0.02)
+
+    assert len(cache) == 2
+    assert (await cache.lookup(Message(content="price?"))).response is None
+    assert (await cache.lookup(Message(content="weather?"))).response is not None
+
+
+async def test_invalidate_by_tool():
+    cache = ResponseCache()
+    await _cache(cache, "price?", _response(), ["get_coin_price"])
+    await _cache(cache, "weather?", _response(), ["get_weather"])
+
+    assert cache.invalidate("get_coin_price") == 1
+    assert (await cache.lookup(Message(content="price?"))).response is None
+    assert (await cache.lookup(Message(content="weather?"))).response is not None
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        Message(content="partial", final=False),
+        _response(response_type="error_message"),
+        _response(content=""),
+        None,
+    ],
+)
+async def test_uncacheable_responses(response):
+    cache = ResponseCache()
+
+    assert not cache.put(await cache.lookup(Message(content="question")), response)
+
+
+async def test_least_recently_used_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    await _cache(cache, "a", _response())
+    await _cache(cache, "b", _response())
+    await cache.lookup(Message(content="a"))
+
+    await _cache(cache, "c", _response())
+
+    assert (await cache.lookup(Message(content="a"))).response is not None
+    assert (await cache.lookup(Message(content="b"))).response is None
+
+
+async def test_per_conversation():
+    cache = ResponseCache(per_conversation=True)
+    lookup = await cache.lookup(Message(content="question", conversation_id="c1"))
+    cache.put(lookup, _response())
+
+    assert (await cache.lookup(Message(content="question", conversation_id="c2"))).response is None
+    assert (await cache.lookup(Message(content="question", conversation_id="c1"))).response is not None
+
+
+async def test_similar_request_hits():
+    vectors = {
+        "what is the price of sol?": [1.0, 0.0],
+        "what's the price of sol?": [0.99, 0.05],
+        "what is the weather?": [0.0, 1.0],
+    }
+    cache = ResponseCache(embeddings=_embeddings(vectors), similarity_threshold=0.95)
+    await _cache(cache, "What is the price of SOL?", _response())
+
+    assert (await cache.lookup(Message(content="What's the price of SOL?"))).response is not None
+    assert (await cache.lookup(Message(content="What is the weather?"))).response is None
+
+
+async def test_embedding_error_falls_back_to_equal_requests():
+    embeddings = MagicMock()
+    embeddings.aembed_query = AsyncMock(side_effect=RuntimeError("rate limited"))
+    cache = ResponseCache(embeddings=embeddings)
+    await _cache(cache, "question", _response())
+
+    assert (await cache.lookup(Message(content="question"))).response is not None
+    assert (await cache.lookup(Message(content="other question"))).response is None
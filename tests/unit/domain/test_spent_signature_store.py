@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from galadriel.domain.spent_signature_store import BloomFilter
+from galadriel.domain.spent_signature_store import InMemorySpentSignatureStore
+from galadriel.domain.spent_signature_store import SqliteSpentSignatureStore
+
+SIGNATURE = "52rdAHYLiTw2vVJmkyWi2sQesn3dLaPnKrDc9UjySmnBK7qi39DyzTXrdPAPNEeh9b1JvHRB1RLg8RQZVXywDMGE"
+
+
+@pytest.fixture(params=["in_memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "in_memory":
+        return InMemorySpentSignatureStore(max_age_seconds=100)
+    return SqliteSpentSignatureStore(str(tmp_path / "signatures.sqlite"), max_age_seconds=100)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000)
+    values = [f"signature_{i}" for i in range(1000)]
+    for value in values:
+        bloom_filter.add(value)
+
+    assert all(value in bloom_filter for value in values)
+    false_positives = sum(f"other_{i}" in bloom_filter for i in range(10_000))
+    assert false_positives < 100
+
+
+async def test_add_claims_signature_once(store):
+    assert not await store.contains(SIGNATURE)
+
+    assert await store.add(SIGNATURE)
+    assert not await store.add(SIGNATURE)
+
+    assert await store.contains(SIGNATURE)
+    assert store.change_count == 1
+
+
+async def test_prune_forgets_expired_signatures(store):
+    await store.add("old", timestamp=1000)
+    await store.add("recent", timestamp=1050)
+
+    assert store.prune(now=1120) == 1
+
+    assert not await store.contains("old")
+    assert await store.contains("recent")
+
+
+async def test_snapshot_round_trip(store, tmp_path):
+    await store.add(SIGNATURE)
+    store.save_to_folder(str(tmp_path / "state"))
+    restored = InMemorySpentSignatureStore()
+
+    restored.load_from_folder(str(tmp_path / "state"))
+
+    assert await restored.contains(SIGNATURE)
+
+
+def test_sqlite_store_path_from_environment(tmp_path, monkeypatch):
+    database_path = str(tmp_path / "state" / "signatures.sqlite")
+    monkeypatch.setenv("SPENT_SIGNATURES_DATABASE_PATH", database_path)
+
+    store = SqliteSpentSignatureStore()
+
+    assert store.database_path == database_path
+    assert os.path.exists(database_path)
+
+
+async def test_sqlite_store_survives_restart(tmp_path):
+    database_path = str(tmp_path / "signatures.sqlite")
+    store = SqliteSpentSignatureStore(database_path)
+    await store.add(SIGNATURE)
+    store.close()
+
+    restarted = SqliteSpentSignatureStore(database_path)
+
+    assert await restarted.contains(SIGNATURE)
+    assert not await restarted.add(SIGNATURE)
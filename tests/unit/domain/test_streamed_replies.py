@@ -0,0 +1,53 @@
+from unittest.mock import AsyncMock
+
+from galadriel.domain.streamed_replies import StreamedReplies
+from galadriel.entities import Message
+
+REQUEST = Message(content="hello")
+
+
+def _delta(content: str) -> Message:
+    return Message(content=content, additional_kwargs={"type": "delta"})
+
+
+async def test_streamed_reply_is_edited_in_place():
+    streamed_replies = StreamedReplies(max_length=100, min_edit_interval_seconds=0)
+    send_message = AsyncMock(return_value="handle")
+    edit_message = AsyncMock()
+
+    assert await streamed_replies.send(REQUEST, _delta("Hel"), send_message, edit_message)
+    assert await streamed_replies.send(REQUEST, _delta("lo"), send_message, edit_message)
+    assert await streamed_replies.send(REQUEST, Message(content="Hello!", final=True), send_message, edit_message)
+
+    send_message.assert_awaited_once_with("Hel")
+    assert [call.args for call in edit_message.await_args_list] == [("handle", "Hello"), ("handle", "Hello!")]
+
+
+async def test_edits_are_throttled():
+    streamed_replies = StreamedReplies(max_length=100, min_edit_interval_seconds=60)
+    send_message = AsyncMock(return_value="handle")
+    edit_message = AsyncMock()
+
+    for delta in ["a", "b", "c"]:
+        await streamed_replies.send(REQUEST, _delta(delta), send_message, edit_message)
+
+    send_message.assert_awaited_once_with("a")
+    edit_message.assert_not_awaited()
+
+
+async def test_long_streamed_reply_shows_its_end():
+    streamed_replies = StreamedReplies(max_length=5, min_edit_interval_seconds=0)
+    send_message = AsyncMock(return_value="handle")
+
+    await streamed_replies.send(REQUEST, _delta("abcdefgh"), send_message, AsyncMock())
+
+    send_message.assert_awaited_once_with("…efgh")
+
+
+async def test_responses_without_stream_are_not_handled():
+    streamed_replies = StreamedReplies(max_length=100)
+    send_message = AsyncMock()
+
+    assert not await streamed_replies.send(REQUEST, Message(content="step"), send_message, AsyncMock())
+    assert not await streamed_replies.send(REQUEST, Message(content="done", final=True), send_message, AsyncMock())
+    send_message.assert_not_awaited()
@@ -0,0 +1,205 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import httpx
+import pytest
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey  # pylint: disable=E0401
+from solders.signature import Signature  # pylint: disable=E0401
+
+from galadriel.connectors.solana_rpc import SolanaRpcError
+from galadriel.domain.transaction_lookup import TransactionLookup
+from galadriel.domain.transaction_lookup import TransactionTransfer
+from galadriel.domain.transaction_lookup import _fetch_transactions
+
+WALLET_ADDRESS = "HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH"
+SIGNATURE_1 = "52rdAHYLiTw2vVJmkyWi2sQesn3dLaPnKrDc9UjySmnBK7qi39DyzTXrdPAPNEeh9b1JvHRB1RLg8RQZVXywDMGE"
+SIGNATURE_2 = "5aqB4BGzQyFybjvKBjdcP8KAstZo81ooUZnf64vSbLLWbUqNSGgXWaGHNteiK2EJrjTmDKdLYHamJpdQBFevWuvy"
+
+
+def _get_response(amount_lamport: int, block_time: int = 1700000000):
+    response = MagicMock()
+    response.value.block_time = block_time
+    response.value.transaction.transaction.message.account_keys = [
+        Pubkey.default(),
+        Pubkey.from_string(WALLET_ADDRESS),
+    ]
+    response.value.transaction.meta.err = None
+    response.value.transaction.meta.pre_balances = [5000, 1000]
+    response.value.transaction.meta.post_balances = [4000, 1000 + amount_lamport]
+    return response
+
+
+@pytest.fixture
+def fetch_transactions():
+    async def fetch(_client, tx_sigs):
+        return [_get_response(100 * (i + 1)) for i in range(len(tx_sigs))]
+
+    with patch("galadriel.domain.transaction_lookup._fetch_transactions", side_effect=fetch) as mock:
+        yield mock
+
+
+@pytest.fixture
+def transaction_lookup():
+    async def call(operation):
+        return await operation(MagicMock())
+
+    rpc_pool = MagicMock()
+    rpc_pool.call = AsyncMock(side_effect=call)
+    return TransactionLookup(rpc_pool, WALLET_ADDRESS, batch_window_seconds=0.01)
+
+
+async def test_computes_transfer(transaction_lookup, fetch_transactions):
+    transfer = await transaction_lookup.get_transfer(SIGNATURE_1)
+
+    assert transfer == TransactionTransfer(amount_lamport=100, block_time=1700000000)
+
+
+async def test_caches_transfer(transaction_lookup, fetch_transactions):
+    first = await transaction_lookup.get_transfer(SIGNATURE_1)
+    second = await transaction_lookup.get_transfer(SIGNATURE_1)
+
+    assert first == second
+    assert transaction_lookup.rpc_pool.call.await_count == 1
+
+
+async def test_cache_expires(transaction_lookup, fetch_transactions):
+    transaction_lookup.cache_ttl_seconds = 0
+
+    await transaction_lookup.get_transfer(SIGNATURE_1)
+    await transaction_lookup.get_transfer(SIGNATURE_1)
+
+    assert transaction_lookup.rpc_pool.call.await_count == 2
+
+
+async def test_concurrent_lookups_share_a_fetch(transaction_lookup, fetch_transactions):
+    transfers = await asyncio.gather(*[transaction_lookup.get_transfer(SIGNATURE_1) for _ in range(3)])
+
+    assert transfers[0] == transfers[1] == transfers[2]
+    assert transaction_lookup.rpc_pool.call.await_count == 1
+    assert [str(sig) for sig in fetch_transactions.call_args.args[1]] == [SIGNATURE_1]
+
+
+async def test_concurrent_lookups_are_batched(transaction_lookup, fetch_transactions):
+    first, second = await asyncio.gather(
+        transaction_lookup.get_transfer(SIGNATURE_1), transaction_lookup.get_transfer(SIGNATURE_2)
+    )
+
+    assert first.amount_lamport == 100
+    assert second.amount_lamport == 200
+    assert transaction_lookup.rpc_pool.call.await_count == 1
+    assert [str(sig) for sig in fetch_transactions.call_args.args[1]] == [SIGNATURE_1, SIGNATURE_2]
+
+
+async def test_full_batch_is_sent_without_waiting(transaction_lookup, fetch_transactions):
+    transaction_lookup.max_batch_size = 2
+    transaction_lookup.batch_window_seconds = 60
+
+    transfers = await asyncio.wait_for(
+        asyncio.gather(transaction_lookup.get_transfer(SIGNATURE_1), transaction_lookup.get_transfer(SIGNATURE_2)),
+        timeout=1,
+    )
+
+    assert len(transfers) == 2
+
+
+async def test_not_found_transaction_is_not_cached(transaction_lookup):
+    not_found = MagicMock()
+    not_found.value = None
+    with patch("galadriel.domain.transaction_lookup._fetch_transactions", AsyncMock(return_value=[not_found])):
+        assert await transaction_lookup.get_transfer(SIGNATURE_1) is None
+        assert await transaction_lookup.get_transfer(SIGNATURE_1) is None
+
+    assert transaction_lookup.rpc_pool.call.await_count == 2
+
+
+async def test_rpc_error_is_raised_to_all_waiters(transaction_lookup):
+    transaction_lookup.rpc_pool.call = AsyncMock(side_effect=SolanaRpcError("rate limited"))
+
+    results = await asyncio.gather(
+        transaction_lookup.get_transfer(SIGNATURE_1),
+        transaction_lookup.get_transfer(SIGNATURE_2),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, SolanaRpcError) for result in results)
+    assert transaction_lookup._in_flight == {}
+
+
+async def test_failed_request_in_batch_raises(transaction_lookup):
+    error = MagicMock(spec=["message"])
+    with patch(
+        "galadriel.domain.transaction_lookup._fetch_transactions", AsyncMock(return_value=[error, _get_response(100)])
+    ):
+        first, second = await asyncio.gather(
+            transaction_lookup.get_transfer(SIGNATURE_1),
+            transaction_lookup.get_transfer(SIGNATURE_2),
+            return_exceptions=True,
+        )
+
+    assert isinstance(first, SolanaRpcError)
+    assert second.amount_lamport == 100
+
+
+async def test_batch_in_flight_is_referenced(transaction_lookup):
+    released = asyncio.Event()
+
+    async def fetch(_client, tx_sigs):
+        await released.wait()
+        return [_get_response(100) for _ in tx_sigs]
+
+    with patch("galadriel.domain.transaction_lookup._fetch_transactions", side_effect=fetch):
+        lookup = asyncio.create_task(transaction_lookup.get_transfer(SIGNATURE_1))
+        await asyncio.sleep(0.05)
+        # The event loop only references the batch weakly, it would be lost to garbage collection otherwise
+        assert len(transaction_lookup._batch_tasks) == 1
+
+        released.set()
+        await lookup
+        await asyncio.sleep(0)
+
+    assert not transaction_lookup._batch_tasks
+
+
+async def test_fetch_transactions_sends_batch_through_solana_client():
+    """The batch is sent with the internals of the solana-py client, this breaks if they change."""
+    client = AsyncClient("http://localhost")
+    # Responses in another order than the requests, with an error the node couldn't attribute to a request
+    body = [
+        {"jsonrpc": "2.0", "id": 2, "result": None},
+        {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}},
+        {"jsonrpc": "2.0", "id": 0, "error": {"code": -32603, "message": "Internal error"}},
+    ]
+    post = AsyncMock(return_value=httpx.Response(200, json=body, request=httpx.Request("POST", "http://localhost")))
+    client._provider.session.post = post
+
+    responses = await _fetch_transactions(client, [Signature.from_string(SIGNATURE_1)] * 3)
+
+    sent = json.loads(post.call_args.kwargs["content"])
+    assert [request["method"] for request in sent] == ["getTransaction"] * 3
+    assert [request["id"] for request in sent] == [0, 1, 2]
+    assert "Internal error" in str(responses[0])
+    assert "Invalid request" in str(responses[1])
+    assert responses[2].value is None
+
+
+async def test_fetch_transactions_with_missing_response():
+    client = AsyncClient("http://localhost")
+    body = [{"jsonrpc": "2.0", "id": 1, "result": None}]
+    client._provider.session.post = AsyncMock(
+        return_value=httpx.Response(200, json=body, request=httpx.Request("POST", "http://localhost"))
+    )
+
+    responses = await _fetch_transactions(client, [Signature.from_string(SIGNATURE_1)] * 2)
+
+    assert responses[0] is None
+    assert responses[1].value is None
+
+
+async def test_missing_response_in_batch_raises(transaction_lookup):
+    with patch("galadriel.domain.transaction_lookup._fetch_transactions", AsyncMock(return_value=[None])):
+        with pytest.raises(SolanaRpcError):
+            await transaction_lookup.get_transfer(SIGNATURE_1)
@@ -1,4 +1,6 @@
+import time
 from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
 
 import pytest
 
@@ -8,6 +10,7 @@ from galadriel.domain.validate_solana_payment import (
     TaskAndPaymentSignature,
     _extract_transaction_signature,
 )
+from galadriel.domain.spent_signature_store import InMemorySpentSignatureStore
 from galadriel.domain.validate_solana_payment import TaskAndPaymentSignatureResponse
 from galadriel.entities import Message
 from galadriel.entities import Pricing
@@ -15,7 +18,10 @@ from galadriel.entities import Pricing
 
 @pytest.fixture
 def solana_payment_validator():
-    return SolanaPaymentValidator(Pricing(cost=0.1, wallet_address="HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH"))
+    return SolanaPaymentValidator(
+        Pricing(cost=0.1, wallet_address="HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH"),
+        spent_signature_store=InMemorySpentSignatureStore(),
+    )
 
 
 test_signature = "52rdAHYLiTw2vVJmkyWi2sQesn3dLaPnKrDc9UjySmnBK7qi39DyzTXrdPAPNEeh9b1JvHRB1RLg8RQZVXywDMGE"
@@ -33,13 +39,13 @@ async def test_successful_payment_validation(solana_payment_validator):
     assert isinstance(result, TaskAndPaymentSignatureResponse)
     assert result.task == "My task"
     assert result.signature == test_signature
-    assert test_signature in solana_payment_validator.existing_payments
+    assert await solana_payment_validator.spent_signatures.contains(test_signature)
     mock_get_sol.assert_called_once_with(test_signature)
 
 
 async def test_reused_signature(solana_payment_validator):
     """Test validation fails when signature was already used."""
-    solana_payment_validator.existing_payments.add(test_signature)
+    await solana_payment_validator.spent_signatures.add(test_signature)
     message = Message(content=f"My task https://solscan.io/tx/{test_signature}")
 
     with pytest.raises(PaymentValidationError) as exc_info:
@@ -48,6 +54,50 @@ async def test_reused_signature(solana_payment_validator):
     assert "already been used" in str(exc_info.value)
 
 
+async def test_signature_claimed_during_validation(solana_payment_validator):
+    """Test only one of two concurrent validations of the same payment passes."""
+
+    async def get_sol_amount_transferred(signature):
+        # The same payment is validated meanwhile
+        await solana_payment_validator.spent_signatures.add(signature)
+        return solana_payment_validator.pricing.cost * 10**9
+
+    solana_payment_validator._get_sol_amount_transferred = get_sol_amount_transferred
+    message = Message(content=f"My task https://solscan.io/tx/{test_signature}")
+
+    with pytest.raises(PaymentValidationError) as exc_info:
+        await solana_payment_validator.execute(message)
+
+    assert "already been used" in str(exc_info.value)
+
+
+async def test_rejects_payment_older_than_max_age(solana_payment_validator):
+    """Test old transactions are rejected, their signatures may already be pruned."""
+    tx_info = MagicMock()
+    tx_info.value.block_time = int(time.time() - solana_payment_validator.spent_signatures.max_age_seconds - 60)
+    solana_payment_validator.rpc_pool.call = AsyncMock(return_value=[tx_info])
+    message = Message(content=f"My task https://solscan.io/tx/{test_signature}")
+
+    with pytest.raises(PaymentValidationError) as exc_info:
+        await solana_payment_validator.execute(message)
+
+    assert "too old" in str(exc_info.value)
+
+
+async def test_rejects_payment_without_block_time(solana_payment_validator):
+    """Test transactions of unknown age are rejected, they could be replayed once pruned."""
+    tx_info = MagicMock()
+    tx_info.value.block_time = None
+    solana_payment_validator.rpc_pool.call = AsyncMock(return_value=[tx_info])
+    message = Message(content=f"My task https://solscan.io/tx/{test_signature}")
+
+    with pytest.raises(PaymentValidationError) as exc_info:
+        await solana_payment_validator.execute(message)
+
+    assert "no block time" in str(exc_info.value)
+    assert not await solana_payment_validator.spent_signatures.contains(test_signature)
+
+
 async def test_missing_signature(solana_payment_validator):
     """Test validation fails when no signature is provided."""
     message = Message(content="My task without signature")
@@ -69,7 +119,7 @@ async def test_invalid_payment(solana_payment_validator):
         await solana_payment_validator.execute(message)
 
     assert "Payment validation failed" in str(exc_info.value)
-    assert test_signature not in solana_payment_validator.existing_payments
+    assert not await solana_payment_validator.spent_signatures.contains(test_signature)
     mock_get_sol.assert_called_once_with(test_signature)
 
 
@@ -91,7 +141,7 @@ async def test_signature_extraction_formats(solana_payment_validator):
         assert result.signature == test_signature
         mock_get_sol.assert_called_once_with(test_signature)
 
-        solana_payment_validator.existing_payments.clear()
+        solana_payment_validator._spent_signatures = InMemorySpentSignatureStore()
         mock_get_sol.reset_mock()  # Reset mock between test cases
 
 
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from unittest.mock import Mock, patch
 
@@ -147,3 +149,65 @@ def test_load_existing_memory_folder(mock_embeddings, mock_faiss, tmp_path):
     mock_faiss.assert_called_once_with(
         str(memory_folder), embeddings=mock_embeddings.return_value, allow_dangerous_deserialization=True
     )
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_independent_copy(memory_repo):
+    request = Message(content="Test", conversation_id="123")
+    response = Message(content="Response", conversation_id="123")
+    await memory_repo.add_memory(request, response)
+
+    snapshot = memory_repo.snapshot()
+    await memory_repo.add_memory(request, response)
+
+    assert len(snapshot.short_term_memory) == 1
+    assert len(memory_repo.short_term_memory) == 2
+    assert snapshot.vector_store is not memory_repo.vector_store
+    assert snapshot.vector_store.index is not memory_repo.vector_store.index
+
+
+@patch("galadriel.memory.memory_store.FAISS.load_local")
+async def test_load_memory_keeps_recent_memories(mock_faiss, memory_repo, tmp_path):
+    """Memories added before the stored state is loaded are merged into the loaded vector store."""
+    loaded_store = Mock()
+    mock_faiss.return_value = loaded_store
+    recent_store = memory_repo.vector_store
+    recent_store.index = Mock(ntotal=1)
+
+    await memory_repo.aload_memory_from_folder(str(tmp_path))
+
+    loaded_store.merge_from.assert_called_once_with(recent_store)
+    assert memory_repo.vector_store is loaded_store
+
+
+@patch("galadriel.memory.memory_store.FAISS.load_local")
+async def test_load_memory_waits_for_memory_being_added(mock_faiss, memory_repo, tmp_path):
+    """A memory being written while the stored state is loaded ends up in the loaded vector store."""
+    events = []
+    loaded_store = Mock()
+    loaded_store.merge_from.side_effect = lambda _: events.append("merged")
+    mock_faiss.return_value = loaded_store
+    memory_repo.vector_store.index = Mock(ntotal=1)
+    adding = asyncio.Event()
+    release = asyncio.Event()
+
+    async def aadd_documents(**_):
+        adding.set()
+        await release.wait()
+        events.append("added")
+
+    memory_repo.vector_store.aadd_documents = aadd_documents
+    for i in range(2):
+        await memory_repo.add_memory(Message(content=f"Request {i}"), Message(content=f"Response {i}"))
+
+    add_task = asyncio.create_task(memory_repo.add_memory(Message(content="Request"), Message(content="Response")))
+    await adding.wait()
+    load_task = asyncio.create_task(memory_repo.aload_memory_from_folder(str(tmp_path)))
+    await asyncio.sleep(0.05)
+    assert not loaded_store.merge_from.called
+    release.set()
+    await asyncio.gather(add_task, load_task)
+
+    assert events == ["added", "merged"]
+    assert memory_repo.vector_store is loaded_store
+    assert memory_repo.long_term_memory_count == 1
@@ -0,0 +1,54 @@
+import hashlib
+
+import pytest
+
+from galadriel.proof.merkle import build_merkle_tree
+from galadriel.proof.merkle import hash_node
+from galadriel.proof.merkle import verify_inclusion
+
+
+def _leaves(count: int):
+    return [hashlib.sha256(f"line_{i}".encode()).digest() for i in range(count)]
+
+
+def test_single_leaf_is_root():
+    leaves = _leaves(1)
+
+    root, proofs = build_merkle_tree(leaves)
+
+    assert root == leaves[0]
+    assert proofs == [[]]
+
+
+def test_two_leaves():
+    leaves = _leaves(2)
+
+    root, proofs = build_merkle_tree(leaves)
+
+    assert root == hash_node(leaves[0], leaves[1])
+    assert proofs[0] == [{"position": "right", "hash": leaves[1].hex()}]
+    assert proofs[1] == [{"position": "left", "hash": leaves[0].hex()}]
+
+
+@pytest.mark.parametrize("count", [2, 3, 5, 8, 13])
+def test_every_leaf_verifies(count):
+    leaves = _leaves(count)
+
+    root, proofs = build_merkle_tree(leaves)
+
+    for leaf, proof in zip(leaves, proofs):
+        assert verify_inclusion(leaf, proof, root)
+
+
+def test_tampered_leaf_does_not_verify():
+    leaves = _leaves(5)
+
+    root, proofs = build_merkle_tree(leaves)
+
+    assert not verify_inclusion(hashlib.sha256(b"tampered").digest(), proofs[2], root)
+    assert not verify_inclusion(leaves[2], proofs[3], root)
+
+
+def test_no_leaves():
+    with pytest.raises(ValueError):
+        build_merkle_tree([])
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from galadriel.domain.spent_signature_store import InMemorySpentSignatureStore
+from galadriel.domain.spent_signature_store import SNAPSHOT_FILE_NAME
+from galadriel.state.checkpoint_scheduler import CheckpointScheduler
+
+
+@pytest.fixture
+def memory_store():
+    store = MagicMock()
+    store.long_term_memory_count = 0
+    return store
+
+
+@pytest.fixture
+def agent_state_repository():
+    repository = MagicMock()
+    repository.upload_agent_state = AsyncMock(return_value="20240226_150000")
+    return repository
+
+
+def _saved_folders(memory_store):
+    return [call.args[0] for call in memory_store.snapshot.return_value.save_data_locally.call_args_list]
+
+
+async def test_checkpoint_skipped_without_new_memories(memory_store, agent_state_repository):
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository)
+
+    result = await scheduler.checkpoint()
+
+    assert result is None
+    memory_store.snapshot.assert_not_called()
+    agent_state_repository.upload_agent_state.assert_not_called()
+
+
+async def test_checkpoint_uploads_snapshot(memory_store, agent_state_repository):
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository)
+    memory_store.long_term_memory_count = 3
+
+    result = await scheduler.checkpoint()
+
+    assert result == "20240226_150000"
+    memory_store.snapshot.assert_called_once()
+    memory_store.save_data_locally.assert_not_called()
+    folder = _saved_folders(memory_store)[0]
+    agent_state_repository.upload_agent_state.assert_called_once_with(folder)
+    # Temporary checkpoint folder is cleaned up after the upload
+    assert not os.path.exists(folder)
+    assert not scheduler.is_dirty()
+
+
+async def test_failed_upload_keeps_state_dirty(memory_store, agent_state_repository):
+    agent_state_repository.upload_agent_state.return_value = None
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository)
+    memory_store.long_term_memory_count = 1
+
+    result = await scheduler.checkpoint()
+
+    assert result is None
+    assert scheduler.is_dirty()
+
+
+async def test_memory_threshold_triggers_checkpoint(memory_store, agent_state_repository):
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository, interval_minutes=60, memory_threshold=2)
+    scheduler.start()
+
+    memory_store.long_term_memory_count = 1
+    scheduler.on_memory_added()
+    await asyncio.sleep(0.05)
+    agent_state_repository.upload_agent_state.assert_not_called()
+
+    memory_store.long_term_memory_count = 2
+    scheduler.on_memory_added()
+    await asyncio.sleep(0.05)
+    await scheduler.stop()
+
+    agent_state_repository.upload_agent_state.assert_called_once()
+    assert not scheduler.is_dirty()
+
+
+async def test_interval_triggers_checkpoint(memory_store, agent_state_repository):
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository, interval_minutes=0.001)
+    memory_store.long_term_memory_count = 1
+    scheduler.start()
+
+    await asyncio.sleep(0.2)
+    await scheduler.stop()
+
+    agent_state_repository.upload_agent_state.assert_called_once()
+
+
+async def test_checkpoint_includes_spent_signatures(memory_store, agent_state_repository):
+    spent_signature_store = InMemorySpentSignatureStore()
+    scheduler = CheckpointScheduler(memory_store, agent_state_repository, spent_signature_store=spent_signature_store)
+    saved_files = []
+
+    async def upload_agent_state(folder_path):
+        saved_files.extend(os.listdir(folder_path))
+        return "20240226_150000"
+
+    agent_state_repository.upload_agent_state = upload_agent_state
+    await spent_signature_store.add("signature")
+
+    # New spent signatures alone make the state dirty
+    assert scheduler.is_dirty()
+    await scheduler.checkpoint()
+
+    assert saved_files == [SNAPSHOT_FILE_NAME]
+    assert not scheduler.is_dirty()
@@ -0,0 +1,49 @@
+import pytest
+
+from galadriel.storage.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path / "storage"))
+
+
+async def test_put_and_get_object(storage):
+    await storage.put_object("agents/a/latest.state", b"state_1")
+
+    assert await storage.get_object("agents/a/latest.state") == b"state_1"
+
+
+async def test_get_missing_object(storage):
+    assert await storage.get_object("agents/a/latest.state") is None
+
+
+async def test_list_keys_by_prefix(storage):
+    await storage.put_object("agents/a/state_1/index.faiss", b"1")
+    await storage.put_object("agents/a/state_1/sub/index.pkl", b"2")
+    await storage.put_object("agents/a/state_2/index.faiss", b"3")
+
+    assert await storage.list_keys("agents/a/state_1/") == [
+        "agents/a/state_1/index.faiss",
+        "agents/a/state_1/sub/index.pkl",
+    ]
+    assert len(await storage.list_keys("agents/a/state_")) == 3
+    assert await storage.list_keys("agents/b/") == []
+
+
+async def test_folder_round_trip(storage, tmp_path):
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "index.faiss").write_bytes(b"index")
+    (source / "sub/index.pkl").write_bytes(b"docstore")
+
+    await storage.upload_folder(str(source), "agents/a/state_1")
+    await storage.download_folder("agents/a/state_1/", str(tmp_path / "destination"))
+
+    assert (tmp_path / "destination/index.faiss").read_bytes() == b"index"
+    assert (tmp_path / "destination/sub/index.pkl").read_bytes() == b"docstore"
+
+
+async def test_rejects_keys_outside_root(storage):
+    with pytest.raises(ValueError):
+        await storage.get_object("../outside")
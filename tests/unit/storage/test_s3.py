@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock, call
+
+import pytest
+from botocore.exceptions import ClientError
+
+from galadriel.storage.s3 import S3Storage
+
+BUCKET_NAME = "test-bucket"
+
+
+@pytest.fixture
+def mock_s3_client():
+    return MagicMock()
+
+
+@pytest.fixture
+def storage(mock_s3_client):
+    return S3Storage(BUCKET_NAME, client=mock_s3_client)
+
+
+async def test_get_object(storage, mock_s3_client):
+    mock_s3_client.get_object.return_value = {"Body": MagicMock(read=lambda: b"content")}
+
+    result = await storage.get_object("agents/a/latest.state")
+
+    assert result == b"content"
+    mock_s3_client.get_object.assert_called_once_with(Bucket=BUCKET_NAME, Key="agents/a/latest.state")
+
+
+async def test_get_missing_object(storage, mock_s3_client):
+    mock_s3_client.get_object.side_effect = ClientError(
+        error_response={"Error": {"Code": "NoSuchKey"}}, operation_name="GetObject"
+    )
+
+    assert await storage.get_object("agents/a/latest.state") is None
+
+
+async def test_get_object_error(storage, mock_s3_client):
+    mock_s3_client.get_object.side_effect = ClientError(
+        error_response={"Error": {"Code": "AccessDenied"}}, operation_name="GetObject"
+    )
+
+    with pytest.raises(ClientError):
+        await storage.get_object("agents/a/latest.state")
+
+
+async def test_upload_folder(storage, mock_s3_client, tmp_path):
+    """Test upload_folder uploads all files while preserving structure"""
+    local_folder = tmp_path / "test_upload"
+    local_folder.mkdir()
+    (local_folder / "file1.txt").write_text("content1")
+    (local_folder / "file2.txt").write_text("content2")
+    (local_folder / "subdir").mkdir()
+    (local_folder / "subdir/file3.txt").write_text("content3")
+    remote_folder = "agents/test-instance/state_20240226/"
+
+    keys = await storage.upload_folder(str(local_folder), remote_folder)
+
+    expected_calls = [
+        call(str(local_folder / "file1.txt"), BUCKET_NAME, f"{remote_folder}file1.txt"),
+        call(str(local_folder / "file2.txt"), BUCKET_NAME, f"{remote_folder}file2.txt"),
+        call(str(local_folder / "subdir/file3.txt"), BUCKET_NAME, f"{remote_folder}subdir/file3.txt"),
+    ]
+    mock_s3_client.upload_file.assert_has_calls(expected_calls, any_order=True)
+    assert mock_s3_client.upload_file.call_count == 3
+    assert sorted(keys) == [
+        f"{remote_folder}file1.txt",
+        f"{remote_folder}file2.txt",
+        f"{remote_folder}subdir/file3.txt",
+    ]
+
+
+async def test_download_folder(storage, mock_s3_client, tmp_path):
+    """Test download_folder downloads all objects while preserving structure"""
+    mock_s3_client.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [{"Key": "agents/test-instance/state_20240226/file1.txt"}]},
+        {"Contents": [{"Key": "agents/test-instance/state_20240226/subdir/file2.txt"}]},
+    ]
+    local_folder = tmp_path / "test_download"
+    remote_folder = "agents/test-instance/state_20240226/"
+
+    def mock_download_file(bucket, s3_key, local_path):
+        with open(local_path, "w") as f:
+            f.write("mock_data")
+
+    mock_s3_client.download_file.side_effect = mock_download_file
+
+    keys = await storage.download_folder(remote_folder, str(local_folder))
+
+    assert len(keys) == 2
+    assert (local_folder / "file1.txt").exists()
+    assert (local_folder / "subdir/file2.txt").exists()
+    mock_s3_client.get_paginator.return_value.paginate.assert_called_once_with(Bucket=BUCKET_NAME, Prefix=remote_folder)
+    mock_s3_client.download_file.assert_any_call(
+        BUCKET_NAME,
+        "agents/test-instance/state_20240226/subdir/file2.txt",
+        str(local_folder / "subdir/file2.txt"),
+    )
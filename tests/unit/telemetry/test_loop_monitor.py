@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from galadriel.telemetry import metrics
+from galadriel.telemetry.loop_monitor import EventLoopMonitor
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+async def test_reports_blocking_call():
+    monitor = EventLoopMonitor(threshold_seconds=0.1, sample_interval_seconds=0.01)
+    blocks_count = metrics.EVENT_LOOP_BLOCKS.get()
+    monitor.start()
+    await asyncio.sleep(0.05)
+
+    blocking_call()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    report = monitor.get_report()
+    assert len(report) == 1
+    assert report[0]["count"] == 1
+    assert report[0]["max_ms"] >= 150
+    assert "in blocking_call" in report[0]["stack"][-1]
+    assert metrics.EVENT_LOOP_BLOCKS.get() == blocks_count + 1
+
+
+async def test_no_report_without_blocking():
+    monitor = EventLoopMonitor(threshold_seconds=0.1, sample_interval_seconds=0.01)
+    monitor.start()
+
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+    await monitor.stop()
+
+    assert monitor.get_report() == []
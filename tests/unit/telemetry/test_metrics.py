@@ -0,0 +1,80 @@
+import pytest
+
+from galadriel.telemetry.metrics import Metric
+from galadriel.telemetry.metrics import MetricsRegistry
+from galadriel.telemetry.metrics import MetricsSpanExporter
+from galadriel.telemetry.metrics import TOOL_CALL_DURATION
+from galadriel.telemetry.tracing import Span
+
+
+def test_metric_needs_samples():
+    with pytest.raises(TypeError):
+        Metric("metric", "Metric")  # type: ignore
+
+
+def test_renders_counter_and_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("payments_total", "Payments", ["outcome"])
+    gauge = registry.gauge("queue_depth", "Queue depth")
+    counter.inc(outcome="valid")
+    counter.inc(2, outcome="invalid")
+    gauge.set_function(lambda: 3)
+
+    assert registry.render() == (
+        "# HELP payments_total Payments\n"
+        "# TYPE payments_total counter\n"
+        'payments_total{outcome="invalid"} 2.0\n'
+        'payments_total{outcome="valid"} 1.0\n'
+        "# HELP queue_depth Queue depth\n"
+        "# TYPE queue_depth gauge\n"
+        "queue_depth 3.0\n"
+    )
+
+
+def test_renders_histogram():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1.0])
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(5)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.15",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_escapes_label_values():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ["tool"])
+    counter.inc(tool='say "hi"\n')
+
+    assert 'calls_total{tool="say \\"hi\\"\\n"} 1.0' in registry.render()
+
+
+def test_rejects_wrong_labels():
+    counter = MetricsRegistry().counter("calls_total", "Calls", ["tool"])
+
+    with pytest.raises(ValueError):
+        counter.inc(status="ok")
+
+
+def test_rejects_duplicate_metrics():
+    registry = MetricsRegistry()
+    registry.gauge("queue_depth", "Queue depth")
+
+    with pytest.raises(ValueError):
+        registry.gauge("queue_depth", "Queue depth")
+
+
+def test_tool_spans_feed_tool_metrics():
+    count = TOOL_CALL_DURATION.get_count(tool="metrics_test_tool", status="ok")
+    span = Span("tool.metrics_test_tool", "trace", attributes={"tool.name": "metrics_test_tool"})
+    span.end()
+
+    MetricsSpanExporter().export(span)
+
+    assert TOOL_CALL_DURATION.get_count(tool="metrics_test_tool", status="ok") == count + 1
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from galadriel.telemetry.metrics import MetricsRegistry
+from galadriel.telemetry.server import TelemetryServer
+from galadriel.telemetry.tracing import Tracer
+
+
+def test_latency_route():
+    tracer = Tracer()
+    tracer.record_span("memory.get", 1000.0, 1000.5)
+    server = TelemetryServer(tracer=tracer)
+
+    status, content_type, body = server.handle_get("/latency")
+
+    assert status == 200
+    assert content_type == "application/json"
+    assert json.loads(body)["memory.get"]["p99"] == 500
+
+
+def test_metrics_route():
+    registry = MetricsRegistry()
+    registry.counter("galadriel_test_total", "Test counter").inc()
+    server = TelemetryServer(registry=registry)
+
+    status, content_type, body = server.handle_get("/metrics")
+
+    assert status == 200
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert b"galadriel_test_total 1.0" in body
+
+
+def test_trace_route():
+    tracer = Tracer()
+    with tracer.start_span("agent.request", trace_id="message-id"):
+        pass
+    server = TelemetryServer(tracer=tracer)
+
+    assert json.loads(server.handle_get("/traces")[2]) == ["message-id"]
+    status, _, body = server.handle_get("/traces/message-id")
+    assert status == 200
+    assert json.loads(body)[0]["name"] == "agent.request"
+    assert server.handle_get("/traces/unknown")[0] == 404
+
+
+async def test_serves_http():
+    tracer = Tracer()
+    tracer.record_span("agent.step", 1000.0, 1001.0)
+    server = TelemetryServer(port=0, tracer=tracer)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /latency HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        await server.stop()
+
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert json.loads(body)["agent.step"]["count"] == 1
+
+
+def test_host_defaults_to_environment(monkeypatch):
+    monkeypatch.delenv("TELEMETRY_HOST", raising=False)
+    assert TelemetryServer().host == "127.0.0.1"
+
+    monkeypatch.setenv("TELEMETRY_HOST", "0.0.0.0")
+
+    assert TelemetryServer().host == "0.0.0.0"
+    assert TelemetryServer(host="10.0.0.1").host == "10.0.0.1"
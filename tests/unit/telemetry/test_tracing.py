@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from galadriel.telemetry.tracing import STATUS_ERROR
+from galadriel.telemetry.tracing import Tracer
+from galadriel.telemetry.tracing import record_tool_calls
+from galadriel.telemetry.tracing import trace_tools
+from galadriel.telemetry import tracing
+
+
+@pytest.fixture
+def tracer(monkeypatch) -> Tracer:
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    return tracer
+
+
+def test_child_spans_share_trace(tracer):
+    with tracer.start_span("agent.request", trace_id="message-id") as root:
+        with tracer.start_span("memory.get") as child:
+            pass
+
+    assert child.trace_id == "message-id"
+    assert child.parent_span_id == root.span_id
+    assert root.parent_span_id is None
+    spans = tracer.recent_traces.get_trace("message-id")
+    assert [span["name"] for span in spans] == ["agent.request", "memory.get"]
+
+
+def test_span_records_exception(tracer):
+    with pytest.raises(ValueError):
+        with tracer.start_span("payment.validate"):
+            raise ValueError("Invalid signature")
+
+    stats = tracer.latency_stats.get_stats()["payment.validate"]
+    assert stats["count"] == 1
+    assert stats["errors"] == 1
+    span = tracer.recent_traces.get_trace(tracer.recent_traces.get_trace_ids()[0])[0]
+    assert span["status"] == STATUS_ERROR
+
+
+def test_latency_percentiles(tracer):
+    for duration_seconds in range(1, 101):
+        tracer.record_span("agent.step", 1000.0, 1000.0 + duration_seconds)
+
+    stats = tracer.latency_stats.get_stats()["agent.step"]
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(50_000)
+    assert stats["p95"] == pytest.approx(95_000)
+    assert stats["p99"] == pytest.approx(99_000)
+    assert stats["max"] == pytest.approx(100_000)
+
+
+async def test_traced_async_function(tracer):
+    @tracing.traced("proof.publish")
+    async def publish():
+        await asyncio.sleep(0)
+        return True
+
+    with tracer.start_span("agent.request", trace_id="message-id"):
+        assert await publish()
+
+    assert [span["name"] for span in tracer.recent_traces.get_trace("message-id")] == [
+        "agent.request",
+        "proof.publish",
+    ]
+
+
+def test_trace_tools(tracer):
+    class Tool:
+        def forward(self, query: str) -> str:
+            return query.upper()
+
+    tools = {"search": Tool()}
+    trace_tools(tools)
+    # Instrumenting twice does not nest spans
+    trace_tools(tools)
+
+    assert tools["search"].forward("query") == "QUERY"
+    stats = tracer.latency_stats.get_stats()
+    assert stats["tool.search"]["count"] == 1
+
+
+def test_recent_traces_are_bounded():
+    exporter = tracing.RecentTracesExporter(max_traces=2)
+    for trace_id in ["a", "b", "c"]:
+        exporter.export(tracing.Span("agent.request", trace_id))
+
+    assert exporter.get_trace_ids() == ["c", "b"]
+    assert exporter.get_trace("a") is None
+
+
+def test_record_tool_calls(tracer):
+    class Tool:
+        def forward(self) -> None:
+            pass
+
+    tools = {"search": Tool()}
+    trace_tools(tools)
+
+    tools["search"].forward()
+    with record_tool_calls() as outer:
+        tools["search"].forward()
+        with record_tool_calls() as inner:
+            tools["search"].forward()
+
+    assert [tool_call.tool_name for tool_call in outer] == ["search", "search"]
+    assert [tool_call.tool_name for tool_call in inner] == ["search"]
@@ -0,0 +1,71 @@
+from smolagents import ActionStep
+from smolagents.agent_types import AgentText
+
+from galadriel.telemetry import metrics
+from galadriel.telemetry.usage import AgentUsage
+
+
+def _step(step_number: int) -> ActionStep:
+    return ActionStep(step_number=step_number, start_time=0, end_time=2.0, duration=2.0)
+
+
+def test_sums_steps():
+    usage = AgentUsage(model="gpt-4o")
+    usage.add_step(_step(1), input_tokens=1000, output_tokens=100, tool_seconds=0.5)
+    usage.add_step(_step(2), input_tokens=1500, output_tokens=50, tool_seconds=0.0, cached_input_tokens=1000)
+    # The final answer is not a step of its own
+    usage.add_step(AgentText("42"), input_tokens=0, output_tokens=0, tool_seconds=0.0)
+
+    summary = usage.to_dict()
+
+    assert summary["input_tokens"] == 2500
+    assert summary["cached_input_tokens"] == 1000
+    assert summary["output_tokens"] == 150
+    assert summary["total_tokens"] == 2650
+    assert summary["tool_seconds"] == 0.5
+    assert summary["cost_usd"] > 0
+    assert summary["steps"][1] == {
+        "step_number": 2,
+        "input_tokens": 1500,
+        "output_tokens": 50,
+        "duration_seconds": 2.0,
+        "tool_seconds": 0.0,
+        "cached_input_tokens": 1000,
+    }
+
+
+def test_unknown_model_has_no_cost():
+    usage = AgentUsage(model="my-own-model")
+    usage.add_step(_step(1), input_tokens=1000, output_tokens=100, tool_seconds=0.0)
+
+    assert usage.cost_usd is None
+
+
+def test_records_metrics():
+    input_tokens = metrics.LLM_TOKENS.get(type="input")
+    usage = AgentUsage()
+    usage.add_step(_step(1), input_tokens=1000, output_tokens=100, tool_seconds=0.0)
+
+    usage.record_metrics()
+
+    assert metrics.LLM_TOKENS.get(type="input") == input_tokens + 1000
+
+
+def test_cached_input_tokens_are_cheaper():
+    usage = AgentUsage(model="gpt-4o")
+    usage.add_step(_step(1), input_tokens=10000, output_tokens=100, tool_seconds=0.0)
+    cached_usage = AgentUsage(model="gpt-4o")
+    cached_usage.add_step(_step(1), input_tokens=10000, output_tokens=100, tool_seconds=0.0, cached_input_tokens=8000)
+
+    assert cached_usage.cost_usd < usage.cost_usd
+
+
+def test_records_cached_input_share():
+    cached_input_tokens = metrics.LLM_TOKENS.get(type="cached_input")
+    usage = AgentUsage()
+    usage.add_step(_step(1), input_tokens=1000, output_tokens=100, tool_seconds=0.0, cached_input_tokens=750)
+
+    usage.record_metrics()
+
+    assert usage.steps[0].cached_input_share == 0.75
+    assert metrics.LLM_TOKENS.get(type="cached_input") == cached_input_tokens + 750
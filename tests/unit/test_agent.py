@@ -1,14 +1,22 @@
 import asyncio
+import threading
+import time
 from typing import AsyncGenerator, Optional
 from typing import List
 from unittest.mock import MagicMock, AsyncMock
 
 import pytest
+from smolagents import ActionStep
+from smolagents.agent_types import AgentText
 
 from galadriel import AgentRuntime, Agent, AgentInput, AgentOutput
+from galadriel import StreamingLiteLLMModel
 from galadriel import agent
+from galadriel.domain.response_cache import ResponseCache
 from galadriel.entities import Message, PushOnlyQueue, Pricing, Proof
 from galadriel.errors import PaymentValidationError
+from galadriel.telemetry import metrics
+from galadriel.telemetry import tracing
 
 CONVERSATION_ID = "ci1"
 RESPONSE_MESSAGE = Message(content="goodbye")
@@ -107,6 +115,20 @@ async def test_payment_validation():
     assert user_agent.called_messages[0].content == "validated task"
 
 
+async def test_request_is_traced(monkeypatch):
+    tracer = tracing.Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    runtime = AgentRuntime(inputs=[], outputs=[MockAgentOutput()], agent=MockAgent(), memory_store=None)
+    request = Message(content="hello", conversation_id=CONVERSATION_ID)
+
+    await runtime._run_request(request, stream=False)
+
+    spans = tracer.recent_traces.get_trace(request.id)
+    assert [span["name"] for span in spans] == ["agent.request", "agent.execute", "output.send"]
+    assert spans[2]["attributes"]["output"] == "MockAgentOutput"
+    assert "agent.request" in tracer.latency_stats.get_stats()
+
+
 async def test_payment_validation_failure():
     """Test payment validation failure."""
     user_agent = MockAgent()
@@ -120,18 +142,123 @@ async def test_payment_validation_failure():
     request = Message(content="test with invalid payment")
     await runtime._run_request(request, stream=False)
 
-    assert output_client.output_responses == []
+    # Rejected without running the agent
+    assert len(output_client.output_responses) == 1
+    assert output_client.output_responses[0].content == "Invalid payment"
+    assert output_client.output_responses[0].final
     assert len(user_agent.called_messages) == 0
 
 
+async def test_payment_validation_outcome_metrics():
+    pricing = Pricing(cost=0.1, wallet_address="HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH")
+    runtime = AgentRuntime(inputs=[], outputs=[], agent=MockAgent(), pricing=pricing)
+    runtime.solana_payment_validator.execute = AsyncMock(side_effect=PaymentValidationError("Invalid payment"))
+    invalid_count = metrics.PAYMENT_VALIDATIONS.get(outcome="invalid")
+
+    await runtime._run_request(Message(content="test with invalid payment"), stream=False)
+
+    assert metrics.PAYMENT_VALIDATIONS.get(outcome="invalid") == invalid_count + 1
+    assert metrics.REQUESTS_IN_FLIGHT.get() == 0
+
+
+async def test_payments_validated_while_agent_executes():
+    input_finished = asyncio.Event()
+    agent_released = asyncio.Event()
+    requests = [Message(content=f"task {i}", conversation_id=CONVERSATION_ID) for i in range(3)]
+
+    class QueueingAgentInput(AgentInput):
+        async def start(self, queue: PushOnlyQueue):
+            for request in requests:
+                await queue.put(request)
+            await input_finished.wait()
+
+    class BlockingAgent(MockAgent):
+        async def execute(self, request: Message, memory: Optional[str] = None, stream: bool = False):
+            self.called_messages.append(request)
+            await agent_released.wait()
+            yield RESPONSE_MESSAGE
+
+    async def validate(request):
+        if request.content == "task 1":
+            raise PaymentValidationError("Invalid payment")
+        return MagicMock(task=request.content)
+
+    pricing = Pricing(cost=0.1, wallet_address="HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH")
+    output_client = MockAgentOutput()
+    user_agent = BlockingAgent()
+    runtime = AgentRuntime(
+        inputs=[QueueingAgentInput()],
+        outputs=[output_client],
+        agent=user_agent,
+        pricing=pricing,
+        memory_store=None,
+    )
+    runtime.solana_payment_validator.execute = AsyncMock(side_effect=validate)
+
+    task = asyncio.create_task(runtime.run(stream=False))
+    await asyncio.sleep(0.1)
+    # All payments are validated while the agent executes the first request, the rejection is answered
+    assert runtime.solana_payment_validator.execute.await_count == 3
+    assert [message.content for message in user_agent.called_messages] == ["task 0"]
+    assert [response.content for response in output_client.output_responses] == ["Invalid payment"]
+
+    agent_released.set()
+    await asyncio.sleep(0.1)
+    assert [message.content for message in user_agent.called_messages] == ["task 0", "task 2"]
+
+    input_finished.set()
+    await task
+
+
+async def test_validated_requests_are_executed_on_shutdown():
+    agent_released = asyncio.Event()
+    requests = [Message(content=f"task {i}", conversation_id=CONVERSATION_ID) for i in range(4)]
+
+    class QueueingAgentInput(AgentInput):
+        async def start(self, queue: PushOnlyQueue):
+            for request in requests:
+                await queue.put(request)
+            await asyncio.Event().wait()
+
+    class BlockingAgent(MockAgent):
+        async def execute(self, request: Message, memory: Optional[str] = None, stream: bool = False):
+            self.called_messages.append(request)
+            await agent_released.wait()
+            yield RESPONSE_MESSAGE
+
+    pricing = Pricing(cost=0.1, wallet_address="HN7cABqLq46Es1jh92dQQisAq662SmxELLLsHHe4YWrH")
+    user_agent = BlockingAgent()
+    runtime = AgentRuntime(
+        inputs=[QueueingAgentInput()],
+        outputs=[MockAgentOutput()],
+        agent=user_agent,
+        pricing=pricing,
+        memory_store=None,
+        payment_validation_concurrency=2,
+    )
+    runtime.solana_payment_validator.execute = AsyncMock(side_effect=lambda request: MagicMock(task=request.content))
+
+    task = asyncio.create_task(runtime.run(stream=False))
+    await asyncio.sleep(0.1)
+    # The stage only takes as many requests ahead as it validates at the same time
+    assert runtime.solana_payment_validator.execute.await_count == 3
+
+    runtime.stop()
+    agent_released.set()
+    await task
+
+    # The requests with a validated, so spent, payment are served, the last one was never taken
+    assert [message.content for message in user_agent.called_messages] == ["task 0", "task 1", "task 2"]
+
+
 async def test_agent_state_download_on_start():
     mock_agent = MockAgent()
     memory_store = MagicMock(api_key="test-key", embedding_model="test-model", agent_name="test-agent")
     memory_store.vector_store = MagicMock()
-    memory_store.load_memory_from_folder = MagicMock()
+    memory_store.aload_memory_from_folder = AsyncMock()
 
     agent_state_repository = MagicMock()
-    agent_state_repository.download_agent_state = MagicMock()
+    agent_state_repository.download_agent_state = AsyncMock()
 
     input_client = MockAgentInput()
     runtime = AgentRuntime(
@@ -148,8 +275,8 @@ async def test_agent_state_download_on_start():
     runtime.stop()
     await task
 
-    agent_state_repository.download_agent_state.assert_called_once()
-    memory_store.load_memory_from_folder.assert_called()
+    agent_state_repository.download_agent_state.assert_awaited_once()
+    memory_store.aload_memory_from_folder.assert_awaited()
 
 
 async def test_agent_state_upload_on_shutdown():
@@ -161,8 +288,8 @@ async def test_agent_state_upload_on_shutdown():
     memory_store.save_data_locally = AsyncMock()
 
     agent_state_repository = MagicMock()
-    agent_state_repository.download_agent_state = MagicMock(return_value=None)
-    agent_state_repository.upload_agent_state = MagicMock()
+    agent_state_repository.download_agent_state = AsyncMock(return_value=None)
+    agent_state_repository.upload_agent_state = AsyncMock()
 
     input_client = MockAgentInput()
     runtime = AgentRuntime(
@@ -180,4 +307,224 @@ async def test_agent_state_upload_on_shutdown():
     await task
 
     memory_store.save_data_locally.assert_called()
-    agent_state_repository.upload_agent_state.assert_called()
+    agent_state_repository.upload_agent_state.assert_awaited()
+
+
+async def test_requests_served_while_agent_state_restores():
+    input_finished = asyncio.Event()
+
+    class QueueingAgentInput(AgentInput):
+        async def start(self, queue: PushOnlyQueue):
+            await queue.put(Message(content="hello", conversation_id=CONVERSATION_ID))
+            await input_finished.wait()
+
+    restore_finished = asyncio.Event()
+
+    async def slow_download():
+        await restore_finished.wait()
+        return None
+
+    memory_store = MagicMock()
+    memory_store.vector_store = MagicMock()
+    memory_store.get_memories = AsyncMock(return_value=None)
+    memory_store.add_memory = AsyncMock()
+    agent_state_repository = MagicMock()
+    agent_state_repository.download_agent_state = AsyncMock(side_effect=slow_download)
+
+    output_client = MockAgentOutput()
+    runtime = AgentRuntime(
+        inputs=[QueueingAgentInput()],
+        outputs=[output_client],
+        agent=MockAgent(),
+        memory_store=memory_store,
+    )
+    runtime.agent_state_repository = agent_state_repository
+
+    task = asyncio.create_task(runtime.run(stream=False))
+    await asyncio.sleep(0.2)
+    # Response is sent before the agent state download has finished
+    assert output_client.output_responses == [RESPONSE_MESSAGE]
+    assert runtime.checkpoint_scheduler is None
+
+    restore_finished.set()
+    input_finished.set()
+    await task
+    agent_state_repository.download_agent_state.assert_called_once()
+
+
+async def test_state_backend_not_created_without_long_term_memory():
+    runtime = AgentRuntime(inputs=[], outputs=[], agent=MockAgent(), memory_store=None)
+
+    await runtime._load_agent_state()
+    await runtime._save_agent_state()
+
+    assert runtime._state_backend is None
+
+
+def test_telemetry_server_binds_given_host():
+    runtime = AgentRuntime(inputs=[], outputs=[], agent=MockAgent(), telemetry_port=0, telemetry_host="0.0.0.0")
+
+    assert runtime.telemetry_server.host == "0.0.0.0"
+
+
+async def test_uses_given_state_backend():
+    state_backend = MagicMock()
+    runtime = AgentRuntime(inputs=[], outputs=[], agent=MockAgent(), state_backend=state_backend)
+
+    assert runtime.agent_state_repository is state_backend
+
+
+async def test_stream_agent_response_streams_model_output():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+
+    def agent_run():
+        for delta in ["Thought: look", " it up\nCode:\n```py\nprint(1)\n", "```<end_code>"]:
+            model.delta_callback(delta)
+        yield ActionStep(step_number=1, model_output="Thought: look it up", start_time=0, end_time=1.0)
+        yield AgentText("42")
+
+    messages = [
+        message
+        async for message in agent.stream_agent_response(agent_run(), CONVERSATION_ID, model=model, coalesce_seconds=60)
+    ]
+
+    deltas = [message.content for message in messages if message.additional_kwargs["type"] == "delta"]
+    # The first delta is sent right away, the rest once the step is complete
+    assert deltas == ["Thought: look", " it up\n"]
+    # The streamed thinking is not repeated once the step is complete
+    assert all("Thought" not in message.content for message in messages[2:])
+    assert messages[-1].final
+    assert messages[-1].additional_kwargs["usage"]["model"] == "gpt-4o"
+    assert model.delta_callback is None
+
+
+async def test_stream_agent_response_waits_for_agent_when_stopped_early():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+    step_finished = threading.Event()
+
+    def agent_run():
+        model.delta_callback("Thought: look")
+        time.sleep(0.2)
+        step_finished.set()
+        yield ActionStep(step_number=1, model_output="Thought: look", start_time=0, end_time=1.0)
+        yield AgentText("42")
+
+    messages = agent.stream_agent_response(agent_run(), CONVERSATION_ID, model=model)
+    await messages.__anext__()
+    await messages.aclose()
+
+    # The worker thread finished its step before the next run could start
+    assert step_finished.is_set()
+    assert model.delta_callback is None
+
+
+async def test_stream_agent_response_keeps_callback_of_next_run():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+
+    def next_run_callback(_delta):
+        pass
+
+    def agent_run():
+        model.delta_callback = next_run_callback
+        yield AgentText("42")
+
+    async for _ in agent.stream_agent_response(agent_run(), CONVERSATION_ID, model=model):
+        pass
+
+    assert model.delta_callback is next_run_callback
+
+
+async def test_stream_agent_response_raises_agent_error():
+    model = StreamingLiteLLMModel(model_id="gpt-4o")
+
+    def agent_run():
+        model.delta_callback("Thought:")
+        raise ValueError("model failed")
+        yield  # pylint: disable=W0101
+
+    with pytest.raises(ValueError):
+        async for _ in agent.stream_agent_response(agent_run(), CONVERSATION_ID, model=model):
+            pass
+
+
+def test_run_agent_accounts_usage():
+    model = MagicMock(model_id="gpt-4o", last_input_token_count=0, last_output_token_count=0)
+
+    def agent_run():
+        for step_number, input_tokens in [(1, 1000), (2, 1200)]:
+            model.last_input_token_count, model.last_output_token_count = input_tokens, 50
+            yield ActionStep(step_number=step_number, start_time=0, end_time=1.0, duration=1.0)
+        yield AgentText("42")
+
+    answer, usage = agent.run_agent(agent_run(), model)
+
+    assert str(answer) == "42"
+    assert [step.input_tokens for step in usage.steps] == [1000, 1200]
+    assert usage.output_tokens == 100
+
+
+def test_run_agent_accounts_cached_input_tokens():
+    model = MagicMock(model_id="gpt-4o", last_input_token_count=1000, last_output_token_count=50)
+    model.last_cached_input_token_count = 800
+
+    def agent_run():
+        yield ActionStep(step_number=1, start_time=0, end_time=1.0, duration=1.0)
+        yield AgentText("42")
+
+    _, usage = agent.run_agent(agent_run(), model)
+
+    assert usage.cached_input_tokens == 800
+    assert usage.to_dict()["steps"][0]["cached_input_tokens"] == 800
+
+
+def test_code_agent_system_prompt_lists_imports_in_stable_order():
+    code_agent = agent.CodeAgent(tools=[], model=MagicMock(), additional_authorized_imports=["numpy", "json"])
+
+    assert code_agent.authorized_imports == sorted(code_agent.authorized_imports)
+    assert str(code_agent.authorized_imports) in code_agent.initialize_system_prompt()
+
+
+def test_default_prompt_template_starts_with_static_instructions():
+    static_prefix = agent.DEFAULT_PROMPT_TEMPLATE.split("{{")[0]
+
+    assert "final_answer" in static_prefix
+    assert static_prefix.index("final_answer") < agent.DEFAULT_PROMPT_TEMPLATE.index("{{chat_history}}")
+
+
+async def test_cached_response_skips_agent_execution():
+    class AnsweringAgent(MockAgent):
+        async def execute(
+            self, request: Message, memory: Optional[str] = None, stream: bool = False
+        ) -> AsyncGenerator[Message, None]:
+            self.called_messages.append(request)
+            yield Message(content="42", conversation_id=request.conversation_id, final=True)
+
+    user_agent = AnsweringAgent()
+    output_client = MockAgentOutput()
+    memory_store = MagicMock()
+    memory_store.get_memories = AsyncMock(return_value=None)
+    memory_store.add_memory = AsyncMock()
+    runtime = AgentRuntime(
+        inputs=[],
+        outputs=[output_client],
+        agent=user_agent,
+        memory_store=memory_store,
+        response_cache=ResponseCache(),
+    )
+    runtime.prover = MagicMock()
+    runtime.prover.generate_proof = AsyncMock(return_value="proof")
+    runtime.prover.publish_proof = AsyncMock(return_value=True)
+
+    await runtime._run_request(Message(content="What is the answer?", conversation_id="c1"), stream=False)
+    await runtime._run_request(Message(content="what is the answer?", conversation_id="c2"), stream=False)
+
+    assert len(user_agent.called_messages) == 1
+    cached_response = output_client.output_responses[1]
+    assert cached_response.content == "42"
+    assert cached_response.conversation_id == "c2"
+    assert cached_response.additional_kwargs["cached"]
+    # A cached response still gets its proof and memory
+    assert runtime.prover.generate_proof.await_count == 2
+    assert runtime.prover.publish_proof.await_count == 2
+    assert memory_store.add_memory.await_count == 2
+    assert memory_store.get_memories.await_count == 1
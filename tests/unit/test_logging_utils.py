@@ -0,0 +1,70 @@
+import logging
+import queue
+
+from galadriel.logging_utils import BoundedQueueHandler
+from galadriel.logging_utils import SizedTimedRotatingFileHandler
+from galadriel.telemetry import metrics
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("root", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_queue_handler_merges_args_without_formatting():
+    log_queue: queue.Queue = queue.Queue()
+    handler = BoundedQueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter("formatted %(message)s"))
+    values = ["a"]
+
+    handler.emit(make_record("values: %s", values))
+    values.append("b")
+
+    record = log_queue.get_nowait()
+    assert record.getMessage() == "values: ['a']"
+    assert record.args is None
+
+
+def test_queue_handler_drops_records_when_full():
+    log_queue: queue.Queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue)
+
+    dropped_count = metrics.LOG_RECORDS_DROPPED.get()
+
+    for i in range(5):
+        handler.emit(make_record(f"msg_{i}"))
+
+    assert log_queue.qsize() == 2
+    assert handler.dropped_records_count == 3
+    assert metrics.LOG_RECORDS_DROPPED.get() == dropped_count + 3
+
+
+def test_queue_handler_reports_dropped_records_once_there_is_room():
+    log_queue: queue.Queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue)
+    for i in range(4):
+        handler.emit(make_record(f"msg_{i}"))
+    log_queue.get_nowait()
+    log_queue.get_nowait()
+
+    handler.emit(make_record("msg_4"))
+    handler.emit(make_record("msg_5"))
+
+    records = [log_queue.get_nowait() for _ in range(log_queue.qsize())]
+    assert [record.getMessage() for record in records] == [
+        "msg_4",
+        "Log queue is full, dropped 2 log records (2 in total)",
+    ]
+    assert records[1].levelno == logging.WARNING
+
+
+def test_file_rotates_on_size(tmp_path):
+    log_file = tmp_path / "logs.log"
+    handler = SizedTimedRotatingFileHandler(str(log_file), max_bytes=100, when="H", backupCount=1)
+
+    for i in range(10):
+        handler.emit(make_record("x" * 30))
+    handler.close()
+
+    rotated_files = [path for path in tmp_path.iterdir() if path.name != "logs.log"]
+    assert len(rotated_files) == 1
+    assert log_file.stat().st_size <= 100